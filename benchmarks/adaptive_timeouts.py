@@ -0,0 +1,144 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Replays roll calls of users pressing the buttons at different paces through
+    color_changer.handler, with the fixed and the adaptive input handler
+    timeouts, and counts the timeouts and extra round trips each one costs.
+
+    Each user presses the buttons at their own pace, which varies a little from one
+    press to the next. The Game Engine is simulated from the timeout of each
+    StartInputHandler directive: presses that happen before it report check-ins,
+    otherwise the input handler times out with the presses so far, the user says
+    yes to more time and starts over, up to --attempts times.
+
+    Usage: python benchmarks/adaptive_timeouts.py [--sessions N] [--buttons N] [--attempts N]
+"""
+import argparse
+import datetime
+import os
+import random
+
+import envelopes
+
+# (name, seconds until the first press of the first roll call, seconds between presses).
+# The first roll call starts while Alexa is still reading the introduction.
+PROFILES = [
+    ("fast", (20, 30), (1, 3)),
+    ("average", (25, 40), (5, 12)),
+    ("slow", (30, 45), (15, 30)),
+]
+# seconds between the "more time" prompt and the first press of a retry
+RETRY_FIRST_PRESS = (3, 8)
+# seconds for Alexa to ask whether the user wants more time and for them to say yes
+QUESTION_SECONDS = 6
+START = datetime.datetime(2018, 6, 1, 12, 0, 0)
+
+
+def timestamp(ms):
+    moment = START + datetime.timedelta(milliseconds=ms)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + "{0:03d}Z".format(moment.microsecond // 1000)
+
+
+def input_handler_timeout(response):
+    for directive in response.get("response", {}).get("directives") or []:
+        if directive["type"] == "GameEngine.StartInputHandler":
+            return directive["timeout"]
+    return None
+
+
+def roll_call(handler, rng, profile, button_count, attempts):
+    """ returns (completed, timeouts, requests, seconds until the roll call completed or was given up) """
+    _, first_press, interval = profile
+    counter = [0]
+
+    def request_id():
+        counter[0] += 1
+        return envelopes.new_request_id()
+
+    def send(request, attributes, new=False):
+        response = handler(envelopes.envelope(request, attributes, new=new), None)
+        return response, response.get("sessionAttributes") or attributes
+
+    buttons = [envelopes.gadget_id(rng) for _ in range(button_count)]
+    request = envelopes.launch_request(request_id())
+    response, attributes = send(request, {}, new=True)
+    clock = 0
+    delay = rng.uniform(*first_press)
+    timeouts = 0
+    for attempt in range(attempts):
+        handler_id = request["requestId"]
+        timeout = input_handler_timeout(response)
+        presses = []
+        pressed = delay
+        while len(presses) < button_count and pressed * 1000 <= timeout:
+            presses.append((buttons[len(presses)], clock + int(pressed * 1000)))
+            if len(presses) < button_count:
+                pressed += rng.uniform(*interval)
+        if len(presses) == button_count:
+            for number in range(1, button_count + 1):
+                request = envelopes.input_handler_event_request(request_id(), handler_id, [(
+                    "button_{0}_checked_in".format(number),
+                    [envelopes.input_event(gadget, timestamp=timestamp(ms)) for gadget, ms in presses[:number]])])
+                response, attributes = send(request, attributes)
+            return True, timeouts, counter[0], presses[-1][1] / 1000.0
+
+        history = []
+        for gadget, ms in presses:
+            history.append(envelopes.input_event(gadget, "down", timestamp(ms)))
+            history.append(envelopes.input_event(gadget, "up", timestamp(ms + 200)))
+        request = envelopes.input_handler_event_request(request_id(), handler_id, [("timeout", history)])
+        response, attributes = send(request, attributes)
+        timeouts += 1
+        clock += timeout + QUESTION_SECONDS * 1000
+        if attempt + 1 == attempts:
+            break
+        request = envelopes.intent_request(request_id(), "AMAZON.YesIntent")
+        response, attributes = send(request, attributes)
+        delay = rng.uniform(*RETRY_FIRST_PRESS)
+    return False, timeouts, counter[0], clock / 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll call timeouts with fixed and adaptive input handler durations")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--buttons", type=int, default=2)
+    parser.add_argument("--attempts", type=int, default=4)
+    args = parser.parse_args()
+
+    os.environ["BUTTON_COUNT"] = str(args.buttons)
+    import color_changer
+    from util import timeouts
+
+    print("{0:<8} {1:<9} {2:>9} {3:>9} {4:>9} {5:>12}".format(
+        "user", "mode", "completed", "timeouts", "requests", "mean secs"))
+    for profile in PROFILES:
+        results = {}
+        for adaptive in (False, True):
+            timeouts.ADAPTIVE_TIMEOUTS = adaptive
+            # the same users, pressing at the same pace, for both
+            runs = [roll_call(color_changer.handler, random.Random(2018 + index), profile,
+                              args.buttons, args.attempts)
+                    for index in range(args.sessions)]
+            completed = sum(1 for run in runs if run[0])
+            timed_out = sum(run[1] for run in runs)
+            requests = sum(run[2] for run in runs)
+            seconds = sum(run[3] for run in runs if run[0]) / max(1, completed)
+            results[adaptive] = (completed, timed_out, requests)
+            print("{0:<8} {1:<9} {2:>9} {3:>9} {4:>9} {5:>12.1f}".format(
+                profile[0], "adaptive" if adaptive else "fixed", completed, timed_out, requests, seconds))
+        print("{0:<8} {1} round trips saved, {2} more roll calls completed".format(
+            "", results[False][2] - results[True][2], results[True][0] - results[False][0]))
+
+
+if __name__ == "__main__":
+    main()
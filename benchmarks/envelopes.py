@@ -0,0 +1,199 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Builds synthetic request envelopes, in the same shape Alexa sends them,
+    so the skill can be exercised without a device or a network.
+"""
+import itertools
+import os
+import sys
+
+# make the skill source importable when running the benchmarks from the repository root
+SKILL_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "lambda", "py")
+if SKILL_DIR not in sys.path:
+    sys.path.insert(0, SKILL_DIR)
+
+TIMESTAMP = "2018-06-01T12:00:00Z"
+
+_request_numbers = itertools.count(1)
+
+
+def new_request_id():
+    """ a request ID no other request of this process has, as Alexa's are unique """
+    return "amzn1.echo-api.request.{0}-{1}".format(os.getpid(), next(_request_numbers))
+
+
+def envelope(request, session_attributes=None, new=False):
+    return {
+        "version": "1.0",
+        "session": {
+            "new": new,
+            "sessionId": "amzn1.echo-api.session.benchmark",
+            "application": {"applicationId": "amzn1.ask.skill.benchmark"},
+            "user": {"userId": "amzn1.ask.account.benchmark"},
+            "attributes": session_attributes or {}
+        },
+        "context": {
+            "System": {
+                "application": {"applicationId": "amzn1.ask.skill.benchmark"},
+                "user": {"userId": "amzn1.ask.account.benchmark"},
+                "device": {"deviceId": "amzn1.ask.device.benchmark",
+                           "supportedInterfaces": {}},
+                "apiEndpoint": "https://api.amazonalexa.com"
+            }
+        },
+        "request": request
+    }
+
+
+def launch_request(request_id):
+    return {"type": "LaunchRequest", "requestId": request_id,
+            "timestamp": TIMESTAMP, "locale": "en-US"}
+
+
+def intent_request(request_id, intent_name, slots=None):
+    return {"type": "IntentRequest", "requestId": request_id,
+            "timestamp": TIMESTAMP, "locale": "en-US",
+            "intent": {"name": intent_name, "confirmationStatus": "NONE",
+                       "slots": slots or {}}}
+
+
+def color_intent_request(request_id, color):
+    return intent_request(request_id, "colorIntent", {
+        "color": {"name": "color", "value": color, "confirmationStatus": "NONE"}})
+
+
+def session_ended_request(request_id):
+    return {"type": "SessionEndedRequest", "requestId": request_id,
+            "timestamp": TIMESTAMP, "locale": "en-US", "reason": "USER_INITIATED"}
+
+
+def input_event(gadget_id, action="down", timestamp=TIMESTAMP):
+    return {"gadgetId": gadget_id, "timestamp": timestamp, "action": action,
+            "color": "0000FF", "feature": "press"}
+
+
+def input_handler_event_request(request_id, originating_request_id, events):
+    """ events is a list of (event name, [input events]) pairs """
+    return {"type": "GameEngine.InputHandlerEvent", "requestId": request_id,
+            "timestamp": TIMESTAMP, "locale": "en-US",
+            "originatingRequestId": originating_request_id,
+            "events": [{"name": name, "inputEvents": inputs}
+                       for name, inputs in events]}
+
+
+def gadget_id(rng):
+    return "amzn1.ask.gadget." + "".join(rng.choice("0123456789ABCDEF") for _ in range(48))
+
+
+def button_session(rng, presses=20, colors=("red", "blue", "green"), button_count=2):
+    """ generator for one Echo Button session, yielding (kind, request) pairs.
+
+    The ID of the request that started the current input handler must be sent back with send()
+    after each response, so that input handler events carry the right originatingRequestId. """
+    request_id = new_request_id
+    buttons = [gadget_id(rng) for _ in range(button_count)]
+
+    handler_id = yield "LaunchRequest", launch_request(request_id())
+    if rng.random() < 0.1:
+        # nobody pressed a button in time; ask for more time
+        handler_id = yield "timeout", input_handler_event_request(
+            request_id(), handler_id, [("timeout", [])])
+        handler_id = yield "AMAZON.YesIntent", intent_request(
+            request_id(), "AMAZON.YesIntent")
+
+    for number in range(1, button_count + 1):
+        # each check-in reports the presses of every button checked in so far
+        name = "button_{0}_checked_in".format(number)
+        handler_id = yield "button_checked_in", input_handler_event_request(
+            request_id(), handler_id,
+            [(name, [input_event(button) for button in buttons[:number]])])
+
+    keep_going = True
+    while keep_going:
+        handler_id = yield "colorIntent", color_intent_request(
+            request_id(), rng.choice(colors))
+        history = []
+        for _ in range(presses):
+            button = rng.choice(buttons)
+            history.append(input_event(button, "down"))
+            history.append(input_event(button, "up"))
+            if rng.random() < 0.05:
+                # a late event from an input handler that was already replaced
+                yield "stale_event", input_handler_event_request(
+                    request_id(), "amzn1.echo-api.request.stale",
+                    [("button_down_event", [input_event(button)])])
+            if rng.random() < 0.1:
+                # a burst of presses that the Game Engine batched into one request
+                other = rng.choice(buttons)
+                history.append(input_event(other, "down"))
+                history.append(input_event(other, "up"))
+                handler_id = yield "button_down_batch", input_handler_event_request(
+                    request_id(), handler_id,
+                    [("button_down_event", [input_event(button)]),
+                     ("button_down_event", [input_event(other)])])
+                continue
+            handler_id = yield "button_down_event", input_handler_event_request(
+                request_id(), handler_id,
+                [("button_down_event", [input_event(button)])])
+        handler_id = yield "timeout", input_handler_event_request(
+            request_id(), handler_id, [("timeout", history)])
+        keep_going = rng.random() < 0.3
+        if keep_going:
+            handler_id = yield "AMAZON.NoIntent", intent_request(
+                request_id(), "AMAZON.NoIntent")
+
+    if rng.random() < 0.5:
+        yield "AMAZON.YesIntent", intent_request(request_id(), "AMAZON.YesIntent")
+    else:
+        yield "AMAZON.StopIntent", intent_request(request_id(), "AMAZON.StopIntent")
+
+
+def replay(handler, session):
+    """ drives a button_session generator through a Lambda handler, yielding (kind, event, response).
+
+    Like Alexa, it sends the session attributes of each response back with the next request, and
+    remembers which request started the current input handler. """
+    attributes = {}
+    handler_id = None
+    kind, request = next(session)
+    new = True
+    while True:
+        event = envelope(request, attributes, new=new)
+        response = handler(event, None)
+        new = False
+        attributes = response.get("sessionAttributes") or attributes
+        for directive in response.get("response", {}).get("directives") or []:
+            if directive["type"] == "GameEngine.StartInputHandler":
+                handler_id = request["requestId"]
+        yield kind, event, response
+        try:
+            kind, request = session.send(handler_id)
+        except StopIteration:
+            return
+
+
+def handler_input(event):
+    """ deserializes an envelope into the HandlerInput the SDK passes to handlers """
+    import json
+    from ask_sdk_core.handler_input import HandlerInput
+    from ask_sdk_core.attributes_manager import AttributesManager
+    from ask_sdk_core.serialize import DefaultSerializer
+    from ask_sdk_model import RequestEnvelope
+
+    request_envelope = DefaultSerializer().deserialize(
+        json.dumps(event), RequestEnvelope)
+    return HandlerInput(
+        request_envelope=request_envelope,
+        attributes_manager=AttributesManager(request_envelope=request_envelope))
@@ -0,0 +1,99 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Checks that every response of the button press fast path is byte-identical
+    to the one the SDK builds for the same request, then compares their latency.
+    Exits with a non-zero status on the first mismatch.
+
+    Usage: python benchmarks/fast_path.py [--sessions N] [--iterations N]
+"""
+import argparse
+import json
+import random
+import sys
+import timeit
+
+import envelopes
+
+import color_changer
+from util import fast_path, session_codec
+
+sdk_handler = color_changer.sb.lambda_handler()
+
+
+def edge_cases(event):
+    """ variations of a button press the fast path must answer exactly like the SDK """
+    attributes = session_codec.codec.decode(dict(event["session"]["attributes"]))
+
+    def variant(attributes, gadget_id=None):
+        varied = json.loads(json.dumps(event))
+        varied["session"]["attributes"] = attributes
+        if gadget_id is not None:
+            varied["request"]["events"][0]["inputEvents"][0]["gadgetId"] = gadget_id
+        return varied
+
+    yield "plain session attributes", variant(attributes)
+    legacy = dict(attributes)
+    legacy["device_ids"] = [None] + legacy.pop("gadget_ids")
+    yield "legacy device_ids", variant(legacy)
+    yield "unregistered button", variant(event["session"]["attributes"], "amzn1.ask.gadget.unknown")
+    yield "gadget without prefix", variant(event["session"]["attributes"], "G1")
+
+
+def check(name, event):
+    expected = json.dumps(sdk_handler(json.loads(json.dumps(event)), None))
+    actual = json.dumps(fast_path.respond(event))
+    if actual != expected:
+        print("Fast path mismatch for " + name)
+        print("  sdk:       " + expected)
+        print("  fast path: " + actual)
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast path parity and latency")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(2018)
+    checked = fallbacks = 0
+    sample = None
+    for _ in range(args.sessions):
+        session = envelopes.button_session(rng)
+        for kind, event, _ in envelopes.replay(color_changer.handler, session):
+            if fast_path.respond(event) is None:
+                fallbacks += 1
+                continue
+            check(kind, event)
+            checked += 1
+            if sample is None:
+                sample = event
+                for name, varied in edge_cases(event):
+                    check(name, varied)
+                    checked += 1
+    print("{0} fast path responses identical to the SDK's, {1} requests left to the SDK".format(
+        checked, fallbacks))
+
+    sdk = timeit.timeit(lambda: sdk_handler(sample, None), number=args.iterations)
+    # the same event again and again would be rejected as a duplicate, see util/stale_events.py
+    fast_handler = fast_path.lambda_handler(sdk_handler)
+    fast = timeit.timeit(lambda: fast_handler(sample, None), number=args.iterations)
+    print("{0:<26}{1:>14}{2:>14}{3:>10}".format("request", "sdk (us)", "fast (us)", "speedup"))
+    print("{0:<26}{1:>14.1f}{2:>14.1f}{3:>9.1f}x".format(
+        "button_down_event", sdk / args.iterations * 1e6,
+        fast / args.iterations * 1e6, sdk / fast))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Fleet benchmark: many Lambda containers at once, and one host running the
+    handler on several threads.
+
+    Process mode starts --processes workers side by side, each a fresh process
+    that imports color_changer itself, like a new Lambda container. Each worker
+    measures its cold start (importing the skill, then its first request) and its
+    warm throughput replaying sessions serially, and the runner aggregates them
+    across the fleet.
+
+    Thread mode imports the skill once, replays the same sessions serially and
+    then spread over thread pools of each size in --threads, checks that every
+    response is the same as in the serial replay, and reports how throughput
+    scales. Under the GIL it shouldn't scale; it is there to catch shared state
+    that isn't safe, and to measure free-threaded builds.
+    Exits with a non-zero status if a threaded response differs or a request fails.
+
+    Usage: python benchmarks/fleet.py [--processes N] [--sessions N] [--threads 1,2,4,8]
+                                      [--start-method fork|spawn|forkserver] [--output FILE]
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import time
+
+import envelopes
+import load_test
+
+# seconds to wait for a worker's results before giving up on it
+WORKER_TIMEOUT = 600
+
+
+def replay_session(handler, seed, presses, button_count, normalize=False):
+    """ replays one session; returns the latency of each request in ms and, if asked, its responses
+    with the request IDs replaced by their order of appearance, so that replays can be compared """
+    session = envelopes.button_session(random.Random(seed), presses, button_count=button_count)
+    latencies = []
+    responses = []
+    timer = time.perf_counter
+    replay = envelopes.replay(handler, session)
+    while True:
+        before = timer()
+        try:
+            _, _, response = next(replay)
+        except StopIteration:
+            break
+        latencies.append((timer() - before) * 1000)
+        if normalize:
+            responses.append(json.dumps(response, sort_keys=True))
+    if normalize:
+        # request IDs come from a counter shared by every session, see envelopes.new_request_id
+        names = {}
+        pattern = re.compile(r"\b{0}-\d+\b".format(os.getpid()))
+        responses = [pattern.sub(lambda match: names.setdefault(match.group(0), "R{0}".format(len(names))),
+                                 response) for response in responses]
+    return latencies, responses
+
+
+def process_worker(queue, index, seed, sessions, presses, button_count):
+    """ one container: a cold start, then warm requests """
+    load_test.configure_logging()
+    started = time.perf_counter()
+    import color_changer
+    imported = time.perf_counter()
+    first = envelopes.launch_request(envelopes.new_request_id())
+    color_changer.handler(envelopes.envelope(first, new=True), None)
+    first_request = time.perf_counter()
+
+    latencies = []
+    for number in range(sessions):
+        latencies.extend(replay_session(color_changer.handler, seed + number, presses, button_count)[0])
+    queue.put({
+        "worker": index,
+        "import_ms": (imported - started) * 1000,
+        "first_request_ms": (first_request - imported) * 1000,
+        "warm_seconds": time.perf_counter() - first_request,
+        "latencies": latencies,
+    })
+
+
+def run_processes(context, processes, sessions, presses, button_count, seed):
+    queue = context.Queue()
+    workers = [context.Process(target=process_worker, args=(
+        queue, index, seed + index * sessions, sessions, presses, button_count))
+        for index in range(processes)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    results = [queue.get(timeout=WORKER_TIMEOUT) for _ in workers]
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - started
+    if any(worker.exitcode != 0 for worker in workers):
+        raise SystemExit("A worker process failed")
+
+    latencies = [value for result in results for value in result["latencies"]]
+    import_ms = sorted(result["import_ms"] for result in results)
+    first_request_ms = sorted(result["first_request_ms"] for result in results)
+    return {
+        "processes": processes,
+        "requests": len(latencies),
+        # every container is busy for its own warm time; the fleet serves all of them at once
+        "fleet_requests_per_second": round(sum(
+            len(result["latencies"]) / result["warm_seconds"] for result in results), 1),
+        "wall_seconds": round(wall, 2),
+        "cold_start": {
+            "import_ms": load_test.summarize(import_ms),
+            "first_request_ms": load_test.summarize(first_request_ms),
+        },
+        "warm_latency": load_test.summarize(latencies),
+    }
+
+
+def thread_worker(queue, thread_counts, sessions, presses, button_count, seed):
+    """ runs the thread pool sweep in a process of its own, so the runner never imports the skill """
+    load_test.configure_logging()
+    import color_changer
+
+    seeds = [seed + number for number in range(sessions)]
+    serial = {session_seed: replay_session(color_changer.handler, session_seed, presses, button_count, True)[1]
+              for session_seed in seeds}
+    rows = []
+    for threads in thread_counts:
+        errors = []
+        mismatches = 0
+        requests = 0
+        started = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = {executor.submit(replay_session, color_changer.handler, session_seed, presses,
+                                       button_count, True): session_seed for session_seed in seeds}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    latencies, responses = future.result()
+                except Exception as exception:
+                    # reported with the results, and the run fails
+                    errors.append(repr(exception))
+                    continue
+                requests += len(latencies)
+                mismatches += sum(1 for expected, actual in zip(serial[futures[future]], responses)
+                                  if expected != actual)
+        elapsed = time.perf_counter() - started
+        rows.append({"threads": threads, "requests": requests,
+                     "requests_per_second": round(requests / elapsed, 1),
+                     "mismatches": mismatches, "errors": errors[:5]})
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    queue.put({"gil": is_gil_enabled() if is_gil_enabled else True, "pools": rows})
+
+
+def run_threads(context, thread_counts, sessions, presses, button_count, seed):
+    queue = context.Queue()
+    worker = context.Process(target=thread_worker, args=(
+        queue, thread_counts, sessions, presses, button_count, seed))
+    worker.start()
+    result = queue.get(timeout=WORKER_TIMEOUT)
+    worker.join()
+    baseline = result["pools"][0]["requests_per_second"]
+    for row in result["pools"]:
+        row["scaling"] = round(row["requests_per_second"] / baseline, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet and thread pool benchmark for the color changer skill")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--sessions", type=int, default=20, help="sessions per worker, and per thread pool")
+    parser.add_argument("--presses", type=int, default=20, help="button presses per color selection")
+    parser.add_argument("--buttons", type=int, default=2)
+    parser.add_argument("--threads", default="1,2,4,8", help="thread pool sizes, 0 to skip thread mode")
+    parser.add_argument("--seed", type=int, default=2018)
+    parser.add_argument("--start-method", choices=multiprocessing.get_all_start_methods(),
+                        default="fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+
+    # the skill reads the number of buttons to register when it is imported
+    os.environ["BUTTON_COUNT"] = str(args.buttons)
+    context = multiprocessing.get_context(args.start_method)
+    report = {"commit": load_test.git_commit(), "python": sys.version.split()[0],
+              "start_method": args.start_method}
+
+    report["fleet"] = fleet = run_processes(
+        context, args.processes, args.sessions, args.presses, args.buttons, args.seed)
+    print("{0} containers, {1} requests: {2} requests/s across the fleet".format(
+        fleet["processes"], fleet["requests"], fleet["fleet_requests_per_second"]))
+    print("{0:<24}{1:>10}{2:>10}{3:>10}".format("", "p50 ms", "p95 ms", "p99 ms"))
+    for name, summary in (("cold start: import", fleet["cold_start"]["import_ms"]),
+                          ("cold start: 1st request", fleet["cold_start"]["first_request_ms"]),
+                          ("warm request", fleet["warm_latency"])):
+        print("{0:<24}{1:>10.2f}{2:>10.2f}{3:>10.2f}".format(
+            name, summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]))
+
+    thread_counts = [int(count) for count in args.threads.split(",") if int(count) > 0]
+    failed = False
+    if thread_counts:
+        report["threads"] = threads = run_threads(
+            context, thread_counts, args.sessions, args.presses, args.buttons, args.seed)
+        print("thread pools ({0}):".format("GIL" if threads["gil"] else "free-threaded"))
+        print("{0:<10}{1:>14}{2:>10}{3:>12}{4:>8}".format(
+            "threads", "requests/s", "scaling", "mismatches", "errors"))
+        for row in threads["pools"]:
+            print("{0:<10}{1:>14}{2:>10}{3:>12}{4:>8}".format(
+                row["threads"], row["requests_per_second"], row["scaling"],
+                row["mismatches"], len(row["errors"])))
+            for error in row["errors"]:
+                print("  " + error)
+            failed = failed or row["mismatches"] or row["errors"]
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+            output_file.write("\n")
+        print("Results written to " + args.output)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    A local stand-in for the Game Engine, so that the recognizers and events of the
+    skill's input handlers can be exercised without Alexa's cloud.
+
+    It takes the StartInputHandler directive of a response, in its serialized form,
+    and a stream of raw button input events, and returns the GameEngine.InputHandlerEvent
+    requests the Game Engine would send, ready for envelopes.envelope. It evaluates pattern
+    recognizers (anchor, fuzzy, gadgetIds and actions filters, repeat, proxies), deviation
+    and progress recognizers, the built-in "timed out" recognizer, and the meets, fails,
+    reports, maximumInvocations, triggerTimeMilliseconds and shouldEndInputHandler of events.
+    See: https://developer.amazon.com/docs/echo-button-skills/define-echo-button-events.html
+
+    Recognizers are evaluated incrementally, a constant amount of work per input event,
+    rather than by matching the whole history again, so long streams are cheap.
+
+    Where the documentation leaves the behavior open, the simulator:
+    - binds a proxy to a gadget the first time a pattern step matches the gadget through it
+    - fires an event only on the input event that makes one of its recognizers match
+    - sends the events fired by one input event in one request, as the Game Engine batches them
+    - reports, for "matches", the input events that matched the recognizers the event meets,
+      in the order they happened, and the earliest ones for fuzzy patterns
+"""
+import collections
+import itertools
+import time
+
+import envelopes
+
+TIMED_OUT = "timed out"
+# the Game Engine notifies the skill of an event once, unless the event says otherwise
+DEFAULT_MAXIMUM_INVOCATIONS = 1
+START_MS = 1527854400000  # envelopes.TIMESTAMP
+
+# A raw button input event: milliseconds since the input handler started, the gadget ID,
+# "down" or "up", and the color the button showed, as upper case hex
+ButtonEvent = collections.namedtuple("ButtonEvent", ["ms", "gadget_id", "action", "color"])
+
+_seconds = {}
+
+
+def timestamp(ms):
+    # type: (int) -> str
+    """ the timestamp of an input event, e.g. 2018-06-01T12:00:00.250Z, for milliseconds since START_MS """
+    second, milli = divmod(START_MS + ms, 1000)
+    prefix = _seconds.get(second)
+    if prefix is None:
+        if len(_seconds) > 4096:
+            _seconds.clear()
+        prefix = _seconds[second] = time.strftime("%Y-%m-%dT%H:%M:%S.", time.gmtime(second))
+    return prefix + "{0:03d}Z".format(milli)
+
+
+def serialized_input_event(event):
+    # type: (ButtonEvent) -> Dict[str, str]
+    return {"gadgetId": event.gadget_id, "timestamp": timestamp(event.ms),
+            "color": event.color, "feature": "press", "action": event.action}
+
+
+class Bindings(object):
+    """ The gadgets bound to the proxies of an input handler, shared by all its recognizers """
+
+    __slots__ = ("proxies", "gadgets")
+
+    def __init__(self, proxies):
+        self.proxies = {proxy: None for proxy in proxies or []}
+        self.gadgets = set()
+
+
+def _step(step, bindings):
+    """ compiles a pattern step into a predicate on input events, which binds proxies as they match """
+    action = step.get("action")
+    colors = frozenset(color.upper() for color in step["colors"]) if step.get("colors") else None
+    gadget_ids = step.get("gadgetIds")
+    literal = frozenset(gadget_id for gadget_id in gadget_ids or [] if gadget_id not in bindings.proxies)
+    proxies = [gadget_id for gadget_id in gadget_ids or [] if gadget_id in bindings.proxies]
+
+    if not gadget_ids:
+        if colors is None:
+            if action is None:
+                return lambda event: True
+            return lambda event: event[2] == action
+        return lambda event: (action is None or event[2] == action) and event[3] in colors
+
+    bound = bindings.proxies
+
+    def matches(event):
+        if action is not None and event[2] != action:
+            return False
+        if colors is not None and event[3] not in colors:
+            return False
+        gadget_id = event[1]
+        if gadget_id in literal:
+            return True
+        for proxy in proxies:
+            bound_gadget = bound[proxy]
+            if bound_gadget == gadget_id:
+                return True
+            if bound_gadget is None and gadget_id not in bindings.gadgets:
+                bound[proxy] = gadget_id
+                bindings.gadgets.add(gadget_id)
+                return True
+        return False
+    return matches
+
+
+class PatternMatcher(object):
+    """ Incremental evaluation of a pattern recognizer.
+
+    update() takes every input event, and returns whether the recognizer matches because of it.
+    matching is whether it matches after the latest input event, and matched holds the input
+    events of the match. update is picked once, for the anchor and fuzziness of the recognizer. """
+
+    __slots__ = ("steps", "gadget_ids", "actions", "matching", "matched", "progress", "deviated",
+                 "window", "greedy", "update", "_update")
+
+    def __init__(self, recognizer, bindings):
+        self.steps = [_step(step, bindings)
+                      for step in recognizer.get("pattern") or []
+                      for _ in range(step.get("repeat") or 1)]
+        self.gadget_ids = frozenset(recognizer["gadgetIds"]) if recognizer.get("gadgetIds") else None
+        self.actions = frozenset(recognizer["actions"]) if recognizer.get("actions") else None
+        self.matching = False
+        self.matched = []
+        # number of steps matched so far, for progress recognizers, and whether the
+        # recognizer can't match any more, for deviation recognizers
+        self.progress = 0
+        self.deviated = False
+        self.window = collections.deque(maxlen=len(self.steps))
+        # the earliest input events matching each step in turn, for fuzzy matching
+        self.greedy = []
+
+        anchor = recognizer.get("anchor") or "end"
+        fuzzy = bool(recognizer.get("fuzzy"))
+        if anchor == "end":
+            if fuzzy:
+                update = self._end_fuzzy
+            elif len(self.steps) == 1:
+                update = self._end_single
+            else:
+                update = self._end_window
+        elif anchor == "start":
+            update = self._start_fuzzy if fuzzy else self._start
+        else:
+            update = self._anywhere_fuzzy if fuzzy else self._anywhere
+        if self.gadget_ids is None and self.actions is None:
+            self.update = update
+        else:
+            self._update = update
+            self.update = self._filtered
+
+    def _filtered(self, event):
+        # input events the recognizer doesn't look at don't exist for it
+        if self.gadget_ids is not None and event[1] not in self.gadget_ids:
+            return False
+        if self.actions is not None and event[2] not in self.actions:
+            return False
+        return self._update(event)
+
+    def _end_single(self, event):
+        # the most common recognizer, a single step at the end, e.g. any button down
+        if self.steps[0](event):
+            self.matching = True
+            self.matched = [event]
+            return True
+        self.matching = False
+        return False
+
+    def _end_window(self, event):
+        window = self.window
+        window.append(event)
+        self.matching = (len(window) == len(self.steps)
+                         and all(step(windowed) for step, windowed in zip(self.steps, window)))
+        if self.matching:
+            self.matched = list(window)
+        return self.matching
+
+    def _end_fuzzy(self, event):
+        # the pattern matches at the end if the steps before the last were seen, in order and
+        # with anything in between, before this input event, and this one matches the last step
+        steps = self.steps
+        last = len(steps) - 1
+        self.matching = self.progress >= last and steps[last](event)
+        if self.matching:
+            self.matched = self.greedy[:last] + [event]
+        elif self.progress < len(steps) and steps[self.progress](event):
+            self.greedy.append(event)
+            self.progress += 1
+        return self.matching
+
+    def _start(self, event):
+        # a match at the start holds for the rest of the input handler
+        if self.matching or self.deviated:
+            return False
+        if not self.steps[self.progress](event):
+            self.deviated = True
+            return False
+        self.matched.append(event)
+        self.progress += 1
+        self.matching = self.progress == len(self.steps)
+        return self.matching
+
+    def _start_fuzzy(self, event):
+        if self.matching or self.deviated:
+            return False
+        if not self.greedy and not self.steps[0](event):
+            self.deviated = True
+            return False
+        return self._anywhere_fuzzy(event)
+
+    def _anywhere(self, event):
+        # a match anywhere holds for the rest of the input handler
+        if self.matching:
+            return False
+        return self._end_window(event)
+
+    def _anywhere_fuzzy(self, event):
+        if self.matching:
+            return False
+        steps = self.steps
+        if steps[self.progress](event):
+            self.greedy.append(event)
+            self.progress += 1
+            if self.progress == len(steps):
+                self.matching = True
+                self.matched = list(self.greedy)
+                return True
+        return False
+
+
+class RecognizerView(object):
+    """ A deviation or progress recognizer, reading the state of the pattern recognizer it refers to """
+
+    __slots__ = ("pattern", "deviation", "completion", "matched", "was_matching")
+
+    def __init__(self, recognizer, pattern):
+        self.pattern = pattern
+        self.deviation = recognizer["type"] == "deviation"
+        self.completion = recognizer.get("completion") or 0
+        self.matched = []
+        self.was_matching = False
+
+    def update(self):
+        """ returns whether the recognizer started matching since the last call """
+        matching = self.matching
+        started = matching and not self.was_matching
+        self.was_matching = matching
+        return started
+
+    @property
+    def matching(self):
+        if self.deviation:
+            return self.pattern.deviated
+        return self.pattern.progress * 100.0 >= self.completion * len(self.pattern.steps)
+
+
+class TimedOut(object):
+    """ The built-in "timed out" recognizer """
+
+    __slots__ = ("matching", "matched")
+
+    def __init__(self):
+        self.matching = False
+        self.matched = []
+
+
+class InputHandler(object):
+    """ One input handler, as started by a StartInputHandler directive.
+
+    feed() and time_out() return the events they fire as (event name, [ButtonEvent]) pairs;
+    serialized_events turns them into the events of an InputHandlerEvent request. """
+
+    def __init__(self, directive, originating_request_id, default_maximum_invocations=DEFAULT_MAXIMUM_INVOCATIONS):
+        # type: (Dict[str, object], str, int) -> None
+        self.originating_request_id = originating_request_id
+        self.timeout = directive["timeout"]
+        self.bindings = Bindings(directive.get("proxies"))
+        self.patterns = []
+        self.views = []
+        timed_out = TimedOut()
+        recognizers = {TIMED_OUT: timed_out}
+        for name, recognizer in (directive.get("recognizers") or {}).items():
+            if recognizer["type"] == "match":
+                recognizers[name] = PatternMatcher(recognizer, self.bindings)
+                self.patterns.append(recognizers[name])
+        for name, recognizer in (directive.get("recognizers") or {}).items():
+            if recognizer["type"] != "match":
+                recognizers[name] = RecognizerView(recognizer, recognizers[recognizer["recognizer"]])
+                self.views.append(recognizers[name])
+        self.recognizers = recognizers
+
+        # [name, meets, fails, reports, maximum invocations, trigger time, should end, invocations]
+        self.events = [[
+            name,
+            [recognizers[meets] for meets in event.get("meets") or []],
+            [recognizers[fails] for fails in event.get("fails") or []],
+            event.get("reports") or "nothing",
+            event.get("maximumInvocations") or default_maximum_invocations,
+            event.get("triggerTimeMilliseconds") or 0,
+            bool(event.get("shouldEndInputHandler")),
+            0,
+        ] for name, event in (directive.get("events") or {}).items()]
+        # the events that meet nothing but the timeout can't fire on an input event
+        self.input_events = [event for event in self.events
+                             if event[1] and any(recognizer is not timed_out for recognizer in event[1])]
+        self.history = []
+        self.ended = False
+        self._select_feed()
+
+    def _select_feed(self):
+        # the general feed() works for any input handler, the others skip what this one doesn't need
+        if not self.patterns and not self.views:
+            self.feed = self._feed_history
+        elif len(self.patterns) == 1 and not self.views:
+            self._update = self.patterns[0].update
+            self.feed = self._feed_one
+        else:
+            self.feed = self._feed
+
+    def _prune(self):
+        # stops evaluating the recognizers that no event can fire on any more
+        self.input_events = [event for event in self.input_events if event[7] < event[4]]
+        needed = set()
+        for event in self.input_events:
+            needed.update(event[1])
+            needed.update(event[2])
+        self.views = [view for view in self.views if view in needed]
+        needed.update(view.pattern for view in self.views)
+        self.patterns = [pattern for pattern in self.patterns if pattern in needed]
+        self._select_feed()
+
+    def feed(self, event):
+        # type: (ButtonEvent) -> List[Tuple[str, List[ButtonEvent]]]
+        """ returns the events fired by one input event; replaced by the variant for this input handler """
+        return self._feed(event)
+
+    def _feed(self, event):
+        if self.ended:
+            return []
+        if event[0] >= self.timeout:
+            return self.time_out()
+        self.history.append(event)
+        updated = [pattern for pattern in self.patterns if pattern.update(event)]
+        if self.views:
+            updated.extend(view for view in self.views if view.update())
+        if not updated:
+            return []
+        return self._fire(self.input_events, updated, event[0])
+
+    def _feed_one(self, event):
+        # feed() for an input handler with a single pattern recognizer
+        if self.ended:
+            return []
+        if event[0] >= self.timeout:
+            return self.time_out()
+        self.history.append(event)
+        if not self._update(event):
+            return []
+        return self._fire(self.input_events, self.patterns, event[0])
+
+    def _feed_history(self, event):
+        # feed() once no event but the timeout can fire
+        if self.ended:
+            return []
+        if event[0] >= self.timeout:
+            return self.time_out()
+        self.history.append(event)
+        return []
+
+    def time_out(self):
+        # type: () -> List[Tuple[str, List[ButtonEvent]]]
+        """ returns the events fired when the input handler times out """
+        if self.ended:
+            return []
+        timed_out = self.recognizers[TIMED_OUT]
+        timed_out.matching = True
+        fired = self._fire(self.events, [timed_out], self.timeout)
+        self.ended = True
+        return fired
+
+    def _fire(self, events, updated, ms):
+        fired = []
+        exhausted = False
+        for event in events:
+            name, meets, fails, reports, maximum_invocations, trigger_time, should_end, invocations = event
+            if invocations >= maximum_invocations or ms < trigger_time:
+                continue
+            if len(meets) == 1:
+                if meets[0] not in updated:
+                    continue
+            elif (not all(recognizer.matching for recognizer in meets)
+                  or not any(recognizer in updated for recognizer in meets)):
+                continue
+            if fails and any(recognizer.matching for recognizer in fails):
+                continue
+            event[7] = invocations + 1
+            exhausted = exhausted or event[7] >= maximum_invocations
+            if reports == "matches":
+                if len(meets) == 1:
+                    input_events = meets[0].matched
+                else:
+                    input_events = sorted(set(itertools.chain.from_iterable(
+                        recognizer.matched for recognizer in meets)))
+            elif reports == "history":
+                input_events = list(self.history)
+            else:
+                input_events = []
+            fired.append((name, input_events))
+            if should_end:
+                self.ended = True
+                break
+        if exhausted and not self.ended:
+            self._prune()
+        return fired
+
+
+def serialized_events(fired):
+    # type: (List[Tuple[str, List[ButtonEvent]]]) -> List[Tuple[str, List[Dict[str, str]]]]
+    """ the (event name, input events) pairs of an InputHandlerEvent request, see envelopes """
+    return [(name, [serialized_input_event(input_event) for input_event in input_events])
+            for name, input_events in fired]
+
+
+class GameEngine(object):
+    """ Follows the input handlers the skill starts and stops, and turns a stream of button input
+    events into the GameEngine.InputHandlerEvent requests for the skill """
+
+    def __init__(self, default_maximum_invocations=DEFAULT_MAXIMUM_INVOCATIONS):
+        self.default_maximum_invocations = default_maximum_invocations
+        self.input_handler = None
+        # when the current input handler started, in milliseconds of the event stream
+        self.started_ms = 0
+
+    @property
+    def listening(self):
+        return self.input_handler is not None and not self.input_handler.ended
+
+    def handle_response(self, request, response, now_ms=0):
+        # type: (Dict[str, object], Dict[str, object], int) -> None
+        """ starts or stops input handlers as the directives of the skill's response say """
+        for directive in (response.get("response") or {}).get("directives") or []:
+            if directive["type"] == "GameEngine.StartInputHandler":
+                self.input_handler = InputHandler(
+                    directive, request["requestId"], self.default_maximum_invocations)
+                self.started_ms = now_ms
+            elif directive["type"] == "GameEngine.StopInputHandler":
+                if self.input_handler is not None and \
+                        directive["originatingRequestId"] == self.input_handler.originating_request_id:
+                    self.input_handler.ended = True
+
+    def request(self, fired):
+        # type: (List[Tuple[str, List[ButtonEvent]]]) -> Dict[str, object]
+        return envelopes.input_handler_event_request(
+            envelopes.new_request_id(), self.input_handler.originating_request_id, serialized_events(fired))
+
+    def feed(self, gadget_id, action, ms, color="FFFFFF"):
+        # type: (str, str, int, str) -> Dict[str, object]
+        """ returns the request for a button input event at ms in the event stream, or None if it fires nothing """
+        if not self.listening:
+            return None
+        fired = self.input_handler.feed(ButtonEvent(ms - self.started_ms, gadget_id, action, color))
+        return self.request(fired) if fired else None
+
+    def advance(self, ms):
+        # type: (int) -> Dict[str, object]
+        """ returns the request for the timeout of the input handler if it ends by ms, or None """
+        if not self.listening or ms - self.started_ms < self.input_handler.timeout:
+            return None
+        fired = self.input_handler.time_out()
+        return self.request(fired) if fired else None
+
+
+def run(directive, input_events, default_maximum_invocations=DEFAULT_MAXIMUM_INVOCATIONS):
+    # type: (Dict[str, object], Iterable[ButtonEvent], int) -> List[List[Tuple[str, List[ButtonEvent]]]]
+    """ evaluates one input handler over a stream of input events, then its timeout if it is still
+    running, and returns the events fired for each request it would send """
+    input_handler = InputHandler(directive, "amzn1.echo-api.request.simulated", default_maximum_invocations)
+    requests = []
+    for event in input_events:
+        fired = input_handler.feed(event)
+        if fired:
+            requests.append(fired)
+        if input_handler.ended:
+            return requests
+    fired = input_handler.time_out()
+    if fired:
+        requests.append(fired)
+    return requests
@@ -0,0 +1,179 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Stress test of the skill end to end through the Game Engine simulator in
+    game_engine.py: users press buttons at random, the simulator evaluates the
+    input handlers the skill starts and sends it the events they fire, and the
+    users answer the skill's questions. It reports the requests by kind and any
+    error responses, then the simulator's own throughput on long streams of
+    input events, for the input handlers the skill started.
+    Exits with a non-zero status if the skill answered with an error.
+
+    Usage: python benchmarks/game_engine_stress.py [--sessions N] [--rounds N] [--events N]
+                                                   [--buttons N] [--maximum-invocations N]
+"""
+import argparse
+import collections
+import os
+import random
+import time
+
+import envelopes
+import game_engine
+
+ERROR_SPEECH = "Sorry, there was some problem"
+
+
+class User(object):
+    """ Plays one session: presses buttons while an input handler listens, and answers questions """
+
+    def __init__(self, rng, handler, engine, button_count, rounds):
+        self.rng = rng
+        self.handler = handler
+        self.engine = engine
+        self.buttons = [envelopes.gadget_id(rng) for _ in range(button_count)]
+        self.rounds = rounds
+        self.clock = 0
+        self.attributes = {}
+        self.kinds = collections.Counter()
+        self.presses = 0
+        self.errors = 0
+
+    def send(self, kind, request):
+        response = self.handler(envelopes.envelope(request, self.attributes, new=not self.kinds), None)
+        self.kinds[kind] += 1
+        self.attributes = response.get("sessionAttributes") or self.attributes
+        speech = ((response.get("response") or {}).get("outputSpeech") or {}).get("ssml") or ""
+        if ERROR_SPEECH in speech:
+            self.errors += 1
+        self.engine.handle_response(request, response, self.clock)
+        return response
+
+    def press(self, gadget_id):
+        self.presses += 1
+        for action, pause in (("down", 0), ("up", self.rng.randint(80, 400))):
+            self.clock += pause
+            request = self.engine.advance(self.clock) or self.engine.feed(gadget_id, action, self.clock)
+            if request is not None:
+                self.send(request["events"][0]["name"], request)
+
+    def play(self):
+        from util import session_codec, settings
+        response = self.send("LaunchRequest", envelopes.launch_request(envelopes.new_request_id()))
+        # roll call, in order, then any button; now and then the user wanders off
+        next_button = 0
+        for _ in range(1000):
+            if (response.get("response") or {}).get("shouldEndSession"):
+                return
+            if self.engine.listening:
+                self.clock += self.rng.choice([self.rng.randint(100, 3000)] * 19 + [60000])
+                timed_out = self.engine.advance(self.clock)
+                if timed_out is not None:
+                    response = self.send("timeout", timed_out)
+                    next_button = 0
+                    continue
+                self.press(self.buttons[next_button % len(self.buttons)] if next_button < len(self.buttons)
+                           else self.rng.choice(self.buttons))
+                next_button += 1
+                continue
+
+            attributes = session_codec.codec.decode(dict(self.attributes))
+            state = attributes.get("state")
+            if state == settings.SKILL_STATES["PLAY_MODE"] and self.rounds > 0:
+                self.rounds -= 1
+                response = self.send("colorIntent", envelopes.color_intent_request(
+                    envelopes.new_request_id(), self.rng.choice(settings.COLORS_ALLOWED)))
+            elif state == settings.SKILL_STATES["EXIT_MODE"] and self.rounds > 0:
+                response = self.send("AMAZON.NoIntent", envelopes.intent_request(
+                    envelopes.new_request_id(), "AMAZON.NoIntent"))
+            elif state == settings.SKILL_STATES["ROLL_CALL_MODE"] and self.rounds > 0:
+                self.rounds -= 1
+                response = self.send("AMAZON.YesIntent", envelopes.intent_request(
+                    envelopes.new_request_id(), "AMAZON.YesIntent"))
+            else:
+                response = self.send("AMAZON.StopIntent", envelopes.intent_request(
+                    envelopes.new_request_id(), "AMAZON.StopIntent"))
+
+
+def stream(rng, buttons, count, spacing_ms):
+    return [game_engine.ButtonEvent(index * spacing_ms // 2, rng.choice(buttons),
+                                    "down" if index % 2 == 0 else "up", "FFFFFF")
+            for index in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End to end stress test through the Game Engine simulator")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3, help="colors picked per session")
+    parser.add_argument("--events", type=int, default=1000000, help="input events per throughput run")
+    parser.add_argument("--buttons", type=int, default=2)
+    parser.add_argument("--maximum-invocations", type=int, default=game_engine.DEFAULT_MAXIMUM_INVOCATIONS,
+                        help="maximumInvocations of events that don't set it")
+    args = parser.parse_args()
+
+    os.environ["BUTTON_COUNT"] = str(args.buttons)
+    import color_changer
+
+    rng = random.Random(2018)
+    kinds = collections.Counter()
+    presses = errors = 0
+    directives = {}
+
+    def recording_handler(event, context):
+        response = color_changer.handler(event, context)
+        for directive in (response.get("response") or {}).get("directives") or []:
+            if directive["type"] == "GameEngine.StartInputHandler":
+                directives.setdefault(tuple(sorted(directive["events"])), directive)
+        return response
+
+    start = time.perf_counter()
+    for _ in range(args.sessions):
+        user = User(rng, recording_handler, game_engine.GameEngine(args.maximum_invocations),
+                    args.buttons, args.rounds)
+        user.play()
+        kinds.update(user.kinds)
+        presses += user.presses
+        errors += user.errors
+    elapsed = time.perf_counter() - start
+
+    print("{0} sessions, {1} button presses, {2} requests in {3:.1f} s ({4:.0f} requests/s), {5} errors".format(
+        args.sessions, presses, sum(kinds.values()), elapsed, sum(kinds.values()) / elapsed, errors))
+    for kind, count in kinds.most_common():
+        print("  {0:<26}{1:>8}".format(kind, count))
+
+    print("{0:<32}{1:>10}{2:>16}".format("input handler", "requests", "events/s"))
+    buttons = ["amzn1.ask.gadget.stress{0}".format(number) for number in range(args.buttons)]
+    for _, directive in sorted(directives.items()):
+        name = "roll call" if directive.get("proxies") else "play"
+        # the last button never checks in, so roll call recognizers are evaluated to the end
+        pool = buttons[:-1] if directive.get("proxies") and len(buttons) > 1 else buttons
+        input_events = stream(random.Random(2018), pool, args.events, 10)
+        # as long as it takes, so that the whole stream is evaluated
+        directive = dict(directive, timeout=args.events * 10)
+        runs = [(name, args.maximum_invocations)]
+        if any("maximumInvocations" not in event and event["meets"] != [game_engine.TIMED_OUT]
+               for event in directive["events"].values()):
+            # and with every button press reported, the most work the simulator can have
+            runs.append((name + ", every event reported", args.events))
+        for label, maximum_invocations in runs:
+            started = time.perf_counter()
+            requests = game_engine.run(directive, input_events, maximum_invocations)
+            elapsed = time.perf_counter() - started
+            print("{0:<32}{1:>10}{2:>16,.0f}".format(label, len(requests), args.events / elapsed))
+
+    if errors:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
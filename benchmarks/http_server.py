@@ -0,0 +1,264 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    HTTP server benchmark: the skill hosted by lambda/py/util/http_server.py,
+    with each worker count in --workers.
+
+    First checks that a session replayed over HTTP gets the same responses as
+    color_changer.handler called in process. Then --clients processes replay
+    synthetic Echo Button sessions, each over a keep-alive connection of its
+    own, and the requests per second of the server, per worker, and the
+    latency seen by the clients are reported next to one process calling the
+    handler serially, as a Lambda container does. With --reload the server is
+    sent SIGHUP every RELOAD_INTERVAL seconds of each run, which must not fail
+    a request.
+    Exits with a non-zero status if a response differs or a request fails.
+
+    Usage: python benchmarks/http_server.py [--workers 1,2,4] [--clients N] [--sessions N] [--reload]
+                                            [--output FILE]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import envelopes
+import fleet
+import load_test
+
+# seconds to wait for the server to answer its health check
+STARTUP_TIMEOUT = 30
+# seconds between the SIGHUPs of --reload
+RELOAD_INTERVAL = 1.0
+
+
+class HttpHandler(object):
+    """ a Lambda handler that POSTs the event to the server over one keep-alive connection """
+
+    def __init__(self, port):
+        self.port = port
+        self.connection = http.client.HTTPConnection("127.0.0.1", port)
+        self.reconnects = 0
+
+    def __call__(self, event, context):
+        body = json.dumps(event).encode("utf-8")
+        try:
+            return self.post(body)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # the server closed the idle connection as the request went out; like a load balancer,
+            # retry once on a new one
+            self.reconnects += 1
+            self.connection.close()
+            return self.post(body)
+
+    def post(self, body):
+        self.connection.request("POST", "/", body, {"Content-Type": "application/json"})
+        response = self.connection.getresponse()
+        payload = response.read()
+        if response.status != 200:
+            raise RuntimeError("HTTP " + str(response.status) + ": " + payload.decode("utf-8"))
+        return json.loads(payload.decode("utf-8"))
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(workers, button_count, log_file):
+    port = free_port()
+    environment = dict(os.environ, BUTTON_COUNT=str(button_count))
+    # the skill's INFO records are formatted, as on Lambda, but into log_file
+    server = subprocess.Popen(
+        [sys.executable, "-m", "util.http_server", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers)],
+        cwd=envelopes.SKILL_DIR, env=environment, stdout=subprocess.DEVNULL, stderr=log_file)
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("The server exited with status " + str(server.returncode))
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/ping")
+            if connection.getresponse().status == 200:
+                connection.close()
+                return server, port
+        except OSError:
+            pass
+        time.sleep(0.1)
+    server.kill()
+    raise SystemExit("The server didn't start within " + str(STARTUP_TIMEOUT) + " seconds")
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def client_worker(results_queue, port, seed, sessions, presses, button_count):
+    """ one client: replays sessions over a keep-alive connection of its own """
+    handler = HttpHandler(port)
+    latencies = []
+    errors = []
+    started = time.perf_counter()
+    for number in range(sessions):
+        try:
+            latencies.extend(fleet.replay_session(handler, seed + number, presses, button_count)[0])
+        except Exception as exception:
+            errors.append(repr(exception))
+            handler.connection.close()
+    results_queue.put({"latencies": latencies, "seconds": time.perf_counter() - started,
+               "errors": errors, "reconnects": handler.reconnects})
+
+
+def run_clients(context, port, server, clients, sessions, presses, button_count, seed, reload):
+    results_queue = context.Queue()
+    workers = [context.Process(target=client_worker, args=(
+        results_queue, port, seed + index * sessions, sessions, presses, button_count))
+        for index in range(clients)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    results = []
+    reloads = 0
+    while len(results) < len(workers):
+        if not reload:
+            results.append(results_queue.get(timeout=fleet.WORKER_TIMEOUT))
+            continue
+        try:
+            results.append(results_queue.get(timeout=RELOAD_INTERVAL))
+        except queue.Empty:
+            if time.perf_counter() - started > fleet.WORKER_TIMEOUT:
+                raise
+            server.send_signal(signal.SIGHUP)
+            reloads += 1
+    wall = time.perf_counter() - started
+    for worker in workers:
+        worker.join()
+    latencies = [value for result in results for value in result["latencies"]]
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / wall, 1),
+        "latency": load_test.summarize(latencies),
+        "reloads": reloads,
+        "reconnects": sum(result["reconnects"] for result in results),
+        "errors": [error for result in results for error in result["errors"]][:5],
+    }
+
+
+def lambda_worker(results_queue, seed, sessions, presses, button_count):
+    """ one Lambda container, warm: the handler called serially, in process """
+    load_test.configure_logging()
+    import color_changer
+    color_changer.handler(envelopes.envelope(envelopes.launch_request(envelopes.new_request_id()), new=True), None)
+    latencies = []
+    started = time.perf_counter()
+    for number in range(sessions):
+        latencies.extend(fleet.replay_session(color_changer.handler, seed + number, presses, button_count)[0])
+    results_queue.put({"requests_per_second": round(len(latencies) / (time.perf_counter() - started), 1),
+               "latency": load_test.summarize(latencies)})
+
+
+def parity_worker(results_queue, port, seed, presses, button_count):
+    """ replays one session in process and over HTTP; returns the number of responses that differ """
+    load_test.configure_logging()
+    import color_changer
+    expected = fleet.replay_session(color_changer.handler, seed, presses, button_count, True)[1]
+    actual = fleet.replay_session(HttpHandler(port), seed, presses, button_count, True)[1]
+    results_queue.put(sum(1 for left, right in zip(expected, actual) if left != right) +
+                      abs(len(expected) - len(actual)))
+
+
+def run_in_process(context, target, *args):
+    results_queue = context.Queue()
+    worker = context.Process(target=target, args=(results_queue,) + args)
+    worker.start()
+    result = results_queue.get(timeout=fleet.WORKER_TIMEOUT)
+    worker.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP server benchmark for the color changer skill")
+    parser.add_argument("--workers", default="1,2,4", help="server worker processes, one run each")
+    parser.add_argument("--clients", type=int, default=8, help="client processes, one connection each")
+    parser.add_argument("--sessions", type=int, default=10, help="sessions per client")
+    parser.add_argument("--presses", type=int, default=20, help="button presses per color selection")
+    parser.add_argument("--buttons", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=2018)
+    parser.add_argument("--reload", action="store_true", help="keep sending the server SIGHUP during each run")
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+
+    # the skill reads the number of buttons to register when it is imported
+    os.environ["BUTTON_COUNT"] = str(args.buttons)
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    report = {"commit": load_test.git_commit(), "python": sys.version.split()[0], "cpus": os.cpu_count(),
+              "clients": args.clients, "reload": args.reload, "runs": []}
+
+    report["lambda"] = run_in_process(context, lambda_worker, args.seed, args.sessions, args.presses, args.buttons)
+    print("{0} CPUs, {1} clients{2}".format(
+        report["cpus"], args.clients, ", reloading every {0}s".format(RELOAD_INTERVAL) if args.reload else ""))
+    print("{0:<22}{1:>14}{2:>16}{3:>10}{4:>10}{5:>12}{6:>8}".format(
+        "", "requests/s", "per worker/s", "p50 ms", "p99 ms", "reconnects", "errors"))
+    print("{0:<22}{1:>14}{2:>16}{3:>10.2f}{4:>10.2f}{5:>12}{6:>8}".format(
+        "Lambda container", report["lambda"]["requests_per_second"], report["lambda"]["requests_per_second"],
+        report["lambda"]["latency"]["p50_ms"], report["lambda"]["latency"]["p99_ms"], "-", "-"))
+
+    failed = False
+    with tempfile.TemporaryFile() as log_file:
+        for workers in [int(count) for count in args.workers.split(",")]:
+            server, port = start_server(workers, args.buttons, log_file)
+            try:
+                mismatches = run_in_process(context, parity_worker, port, args.seed, args.presses, args.buttons)
+                run = run_clients(context, port, server, args.clients, args.sessions, args.presses,
+                                  args.buttons, args.seed, args.reload)
+            finally:
+                stop_server(server)
+            run.update({"workers": workers, "mismatches": mismatches,
+                        "requests_per_second_per_worker": round(run["requests_per_second"] / workers, 1)})
+            report["runs"].append(run)
+            print("{0:<22}{1:>14}{2:>16}{3:>10.2f}{4:>10.2f}{5:>12}{6:>8}".format(
+                "HTTP, {0} worker{1}".format(workers, "s" if workers > 1 else ""), run["requests_per_second"],
+                run["requests_per_second_per_worker"], run["latency"]["p50_ms"], run["latency"]["p99_ms"],
+                run["reconnects"], len(run["errors"])))
+            for error in run["errors"]:
+                print("  " + error)
+            if mismatches:
+                print("  {0} responses differ from the handler's".format(mismatches))
+            failed = failed or mismatches or run["errors"]
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+            output_file.write("\n")
+        print("Results written to " + args.output)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Profiles the cold start of the Lambda entry point. Each run imports
+    color_changer in a fresh interpreter with `-X importtime`, then handles a
+    LaunchRequest to record the models that are only loaded on first use.
+    Reports the median over all runs for color_changer, each util module and
+    each ask_sdk_core / ask_sdk_model subpackage.
+
+    Usage: python benchmarks/import_profile.py [--runs N] [--save] [--compare]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import envelopes
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "baselines", "import_time.json")
+
+# Runs in the child interpreter: import the entry point, then handle one request
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import color_changer
+import_ms = (time.perf_counter() - start) * 1000
+sys.path.insert(0, {benchmarks!r})
+import envelopes
+start = time.perf_counter()
+color_changer.handler(envelopes.envelope(envelopes.launch_request("cold-start"), new=True), None)
+first_request_ms = (time.perf_counter() - start) * 1000
+from util import models
+print(json.dumps({{"import_ms": import_ms, "first_request_ms": first_request_ms,
+                   "lazy_ms": {{name: t * 1000 for name, t in models.load_times.items()}}}}))
+"""
+
+
+def is_reported(module):
+    if module == "color_changer" or module.startswith("util."):
+        return True
+    # SDK packages and subpackages, e.g. ask_sdk_model.services.game_engine, but not their modules
+    return module.startswith("ask_sdk_") and module.count(".") <= 2 and is_package(module)
+
+
+def is_package(module):
+    try:
+        spec = importlib.util.find_spec(module)
+    except ImportError:
+        return False
+    return spec is not None and spec.submodule_search_locations is not None
+
+
+def parse_importtime(stderr):
+    """ returns {module: cumulative ms} from `-X importtime` output """
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|")
+        module = module.strip()
+        if is_reported(module):
+            cumulative[module] = int(cumulative_us) / 1000.0
+    return cumulative
+
+
+def profile_once():
+    child = CHILD.format(benchmarks=os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", child],
+        cwd=envelopes.SKILL_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["modules_ms"] = parse_importtime(completed.stderr)
+    return result
+
+
+def median_of(runs, key):
+    names = sorted(set(name for run in runs for name in run[key]))
+    return {name: round(statistics.median(run[key].get(name, 0.0) for run in runs), 3)
+            for name in names}
+
+
+def profile(runs):
+    results = [profile_once() for _ in range(runs)]
+    return {
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "import_ms": round(statistics.median(r["import_ms"] for r in results), 3),
+        "first_request_ms": round(statistics.median(r["first_request_ms"] for r in results), 3),
+        "lazy_ms": median_of(results, "lazy_ms"),
+        "modules_ms": median_of(results, "modules_ms"),
+    }
+
+
+def compare(report, baseline):
+    print("{0:<58}{1:>12}{2:>12}".format("", "baseline ms", "current ms"))
+    for key in ("import_ms", "first_request_ms"):
+        print("{0:<58}{1:>12.3f}{2:>12.3f}".format(key, baseline[key], report[key]))
+    for key in ("modules_ms", "lazy_ms"):
+        for name in sorted(set(baseline[key]) | set(report[key])):
+            print("{0:<58}{1:>12}{2:>12}".format(
+                name, baseline[key].get(name, "-"), report[key].get(name, "-")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-1])
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--save", action="store_true",
+                        help="store the report as the regression baseline")
+    parser.add_argument("--compare", action="store_true",
+                        help="compare the report with the stored baseline")
+    args = parser.parse_args()
+
+    report = profile(args.runs)
+    if args.compare:
+        with open(BASELINE) as baseline_file:
+            compare(report, json.load(baseline_file))
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    if args.save:
+        with open(BASELINE, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Compares the SDK's deserialization of the request envelope with the lazy
+    one in util/lazy_envelope.py, on input handler timeout events that report
+    the whole history of button presses (reports=history), during play and
+    during roll call. For each history length it checks that the response and
+    the serialized envelope are identical both ways, then reports the time to
+    deserialize the envelope and to answer the event.
+    Exits with a non-zero status on the first mismatch.
+
+    Usage: python benchmarks/lazy_envelope.py [--lengths 10,100,1000,5000] [--iterations N]
+"""
+import argparse
+import copy
+import json
+import random
+import sys
+import timeit
+
+import envelopes
+import game_engine
+
+import color_changer
+from ask_sdk_core.serialize import DefaultSerializer
+from ask_sdk_model import RequestEnvelope
+from util import lazy_envelope, metrics
+
+sdk_handler = color_changer.sb.lambda_handler()
+lazy_handler = metrics.sdk_lambda_handler(color_changer.sb, lazy_envelope.deserialize)
+serializer = DefaultSerializer()
+
+
+def sdk_deserialize(event):
+    return serializer.deserialize(payload=json.dumps(event), obj_type=RequestEnvelope)
+
+
+def lazy_deserialize(event):
+    return lazy_envelope.deserialize(serializer, event)
+
+
+def timeout_events(rng, button_count=2):
+    """ a roll call timeout and a play timeout, as (name, event with an empty history) pairs """
+    roll_call = None
+    session = envelopes.button_session(rng, button_count=button_count)
+    for kind, event, _ in envelopes.replay(color_changer.handler, session):
+        if kind == "LaunchRequest":
+            roll_call = event
+        elif kind == "colorIntent":
+            play = event
+            break
+    launched = color_changer.handler(roll_call, None)
+    play_response = color_changer.handler(play, None)
+    events = []
+    for name, origin, response in (("roll call", roll_call, launched), ("play", play, play_response)):
+        events.append((name, envelopes.envelope(envelopes.input_handler_event_request(
+            envelopes.new_request_id(), origin["request"]["requestId"], [("timeout", [])]),
+            response["sessionAttributes"])))
+    return events
+
+
+def with_history(rng, event, length, button_count=2):
+    buttons = ["amzn1.ask.gadget.history{0}".format(number) for number in range(button_count)]
+    history = []
+    ms = 0
+    for index in range(length):
+        ms += rng.randint(80, 400) if index % 2 else rng.randint(100, 3000)
+        history.append(game_engine.serialized_input_event(game_engine.ButtonEvent(
+            ms, buttons[index // 2 % button_count], "down" if index % 2 == 0 else "up", "FFFFFF")))
+    event = copy.deepcopy(event)
+    event["request"]["events"][0]["inputEvents"] = history
+    return event
+
+
+def check(name, length, event):
+    expected = json.dumps(sdk_handler(copy.deepcopy(event), None), sort_keys=True)
+    actual = json.dumps(lazy_handler(copy.deepcopy(event), None), sort_keys=True)
+    if actual != expected:
+        print("Response mismatch for the {0} timeout with {1} input events".format(name, length))
+        print("  sdk:  " + expected)
+        print("  lazy: " + actual)
+        sys.exit(1)
+    if serializer.serialize(lazy_deserialize(event)) != serializer.serialize(sdk_deserialize(event)):
+        print("Envelope mismatch for the {0} timeout with {1} input events".format(name, length))
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lazy request envelope deserialization")
+    parser.add_argument("--lengths", default="10,100,1000,5000", help="input events in the timeout history")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(2018)
+    print("{0:<12}{1:>8}{2:>14}{3:>14}{4:>14}{5:>14}{6:>10}".format(
+        "timeout", "events", "sdk deser us", "lazy deser us", "sdk total us", "lazy total us", "speedup"))
+    for name, event in timeout_events(rng):
+        for length in [int(length) for length in args.lengths.split(",")]:
+            event = with_history(rng, event, length)
+            check(name, length, event)
+            iterations = max(1, args.iterations * 10 // max(length, 10))
+            timings = [timeit.timeit(lambda: step(event), number=iterations) / iterations * 1e6
+                       for step in (sdk_deserialize, lazy_deserialize)]
+            timings += [timeit.timeit(lambda: step(event, None), number=iterations) / iterations * 1e6
+                        for step in (sdk_handler, lazy_handler)]
+            print("{0:<12}{1:>8}{2:>14.1f}{3:>14.1f}{4:>14.1f}{5:>14.1f}{6:>9.1f}x".format(
+                name, length, timings[0], timings[1], timings[2], timings[3], timings[2] / timings[3]))
+
+
+if __name__ == "__main__":
+    main()
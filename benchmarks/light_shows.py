@@ -0,0 +1,62 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Times building procedural light shows, the first time and from the animation
+    cache, and checks that they fit what an Echo Button accepts.
+
+    Usage: python benchmarks/light_shows.py [iterations]
+"""
+import json
+import sys
+import timeit
+
+import envelopes  # noqa: F401 (makes the skill importable)
+from util import animations, light_shows
+Colors = animations.Colors
+
+# name: (animation spec, steps the directive can hold)
+SHOWS = {
+    "rainbow, 38 steps": (
+        (light_shows.rainbow_animation, 1, 6000, light_shows.MAX_STEPS), light_shows.MAX_STEPS),
+    "rgb gradient, 3 stops": (
+        (light_shows.gradient_animation, 2, (Colors.red, Colors.yellow, Colors.blue), 3000),
+        light_shows.MAX_STEPS),
+    "hsv gradient, 2 gadgets": (
+        (light_shows.gradient_animation, 1, (Colors.red, Colors.blue), 3000, 200, "hsv",
+         light_shows.max_steps(2)), light_shows.max_steps(2)),
+    "600-step sequence, fitted": (
+        (light_shows.sequence_animation, 1, tuple(
+            (40, "{0:06x}".format(index // 4 * 0x010101), True) for index in range(600))),
+        light_shows.MAX_STEPS),
+}
+
+
+def main(iterations):
+    print("{0:<26}{1:>8}{2:>10}{3:>12}{4:>14}".format(
+        "show", "steps", "bytes", "build (us)", "cached (us)"))
+    for name, (spec, limit) in SHOWS.items():
+        builder, args = spec[0], spec[1:]
+        animation = builder(*args)
+        sequence = animation["sequence"]
+        if len(sequence) > limit or any(step["durationMs"] > light_shows.MAX_STEP_DURATION_MS
+                                        for step in sequence):
+            raise AssertionError(name + " doesn't fit on an Echo Button")
+        build = timeit.timeit(lambda: builder(*args), number=iterations)
+        cached = timeit.timeit(lambda: animations.serialized_animation(spec), number=iterations)
+        print("{0:<26}{1:>8}{2:>10}{3:>12.1f}{4:>14.2f}".format(
+            name, len(sequence), len(json.dumps(animation, separators=(",", ":"))),
+            build / iterations * 1e6, cached / iterations * 1e6))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
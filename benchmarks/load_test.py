@@ -0,0 +1,217 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Offline load test: replays synthetic Echo Button sessions (launch, roll call,
+    color selection, button presses, timeouts, yes/no/stop) through
+    color_changer.handler and reports per-request latency percentiles, peak
+    memory allocated per request and requests per second, across one or more
+    processes. Results are written as JSON so runs can be compared across commits.
+
+    Usage: python benchmarks/load_test.py [--sessions N] [--processes N] [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import envelopes
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(sorted_values, fraction):
+    """ nearest-rank percentile of an already sorted list """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1,
+                      int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies), 4),
+        "p50_ms": round(percentile(latencies, 0.50), 4),
+        "p95_ms": round(percentile(latencies, 0.95), 4),
+        "p99_ms": round(percentile(latencies, 0.99), 4),
+    }
+
+
+def configure_logging():
+    # Lambda ships every INFO record the skill logs, so format them, but into /dev/null
+    root = logging.getLogger()
+    root.handlers = [logging.StreamHandler(open(os.devnull, "w"))]
+
+
+def run_worker(args):
+    """ replays sessions in one process; returns latencies per request kind, the elapsed time and
+    the timings of the state machine transitions """
+    seed, sessions, presses, button_count = args
+    configure_logging()
+    import color_changer
+
+    rng = random.Random(seed)
+    latencies = {}
+    timer = time.perf_counter
+    start = timer()
+    for _ in range(sessions):
+        session = envelopes.button_session(rng, presses, button_count=button_count)
+        replay = envelopes.replay(color_changer.handler, session)
+        while True:
+            before = timer()
+            try:
+                kind, _, _ = next(replay)
+            except StopIteration:
+                break
+            latencies.setdefault(kind, []).append((timer() - before) * 1000)
+    return latencies, timer() - start, color_changer.transitions.report()
+
+
+def measure_allocations(seed, sessions, presses, button_count):
+    """ peak bytes traced by tracemalloc while handling each request, averaged per request kind """
+    configure_logging()
+    import color_changer
+
+    rng = random.Random(seed)
+    peaks = {}
+    tracemalloc.start()
+    for _ in range(sessions):
+        replay = envelopes.replay(
+            color_changer.handler, envelopes.button_session(rng, presses, button_count=button_count))
+        while True:
+            if hasattr(tracemalloc, "reset_peak"):
+                # Python 3.9+; on older versions the peak covers the session so far
+                tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            try:
+                kind, _, _ = next(replay)
+            except StopIteration:
+                break
+            peaks.setdefault(kind, []).append(
+                tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return {kind: round(sum(values) / len(values) / 1024.0, 2)
+            for kind, values in sorted(peaks.items())}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], universal_newlines=True,
+            stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sessions, processes, presses, seed, allocations, button_count=2):
+    # the skill reads the number of buttons to register when it is imported
+    os.environ["BUTTON_COUNT"] = str(button_count)
+    per_process = max(1, sessions // processes)
+    work = [(seed + index, per_process, presses, button_count)
+            for index in range(processes)]
+    if processes == 1:
+        results = [run_worker(work[0])]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(run_worker, work)
+
+    latencies = {}
+    transitions = {}
+    for worker_latencies, _, worker_transitions in results:
+        for kind, values in worker_latencies.items():
+            latencies.setdefault(kind, []).extend(values)
+        for row in worker_transitions:
+            name = "{0} in {1!r}{2}".format(
+                row["event"], row["state"], " (confirming)" if row["confirming"] else "")
+            total = transitions.setdefault(name, {"count": 0, "total_ms": 0.0})
+            total["count"] += row["count"]
+            total["total_ms"] = round(total["total_ms"] + row["total_ms"], 3)
+    all_latencies = [value for values in latencies.values() for value in values]
+    wall = max(elapsed for _, elapsed, _ in results)
+
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "processes": processes,
+        "buttons": button_count,
+        "sessions": per_process * processes,
+        "requests": len(all_latencies),
+        "requests_per_second": round(len(all_latencies) / wall, 1),
+        "latency": summarize(all_latencies),
+        "latency_by_kind": {kind: summarize(values)
+                            for kind, values in sorted(latencies.items())},
+        # time spent in each state machine transition, summed over the workers
+        "transitions": transitions,
+    }
+    if allocations:
+        report["peak_kib_by_kind"] = measure_allocations(
+            seed, min(per_process, 20), presses, button_count)
+    return report
+
+
+def compare(report, other):
+    print("{0:<28}{1:>14}{2:>14}".format("", "other", "current"))
+    print("{0:<28}{1:>14}{2:>14}".format(
+        "requests/s", other["requests_per_second"], report["requests_per_second"]))
+    for kind in sorted(report["latency_by_kind"]):
+        for key in ("p50_ms", "p99_ms"):
+            print("{0:<28}{1:>14}{2:>14}".format(
+                kind + " " + key,
+                other["latency_by_kind"].get(kind, {}).get(key, "-"),
+                report["latency_by_kind"][kind][key]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the color changer skill")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--presses", type=int, default=20,
+                        help="button presses per color selection")
+    parser.add_argument("--buttons", type=int, default=2,
+                        help="Echo Buttons per session")
+    parser.add_argument("--seed", type=int, default=2018)
+    parser.add_argument("--no-allocations", action="store_true",
+                        help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="where to write the JSON results "
+                        "(default: benchmarks/results/load_test-<commit>.json)")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    report = run(args.sessions, args.processes, args.presses, args.seed,
+                 not args.no_allocations, args.buttons)
+    output = args.output or os.path.join(
+        RESULTS_DIR, "load_test-{0}.json".format(report["commit"] or "local"))
+    if not os.path.isdir(os.path.dirname(os.path.abspath(output))):
+        os.makedirs(os.path.dirname(os.path.abspath(output)))
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=2, sort_keys=True)
+        output_file.write("\n")
+
+    if args.compare:
+        with open(args.compare) as other_file:
+            compare(report, json.load(other_file))
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    print("Results written to " + output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Checks that shipping more locales costs nothing: for each count in
+    --locales, copies the skill with that many extra locale files next to
+    en-US and en-GB, and in a fresh process measures the import of
+    color_changer, the first request, and the time per request of replayed
+    sessions, with only en-US loaded and again once every locale is loaded.
+    The median of --repeats processes is reported for each count.
+
+    Usage: python benchmarks/locales.py [--locales 0,10,100] [--repeats N] [--sessions N]
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+
+import envelopes
+
+CHILD = """
+import json, random, sys, time
+sys.path.insert(0, {benchmarks!r})
+import envelopes
+sys.path.insert(0, {skill!r})
+started = time.perf_counter()
+import color_changer
+imported = time.perf_counter()
+color_changer.handler(envelopes.envelope(envelopes.launch_request(envelopes.new_request_id()), new=True), None)
+first_request = time.perf_counter()
+from util import prompts
+
+
+def per_request_us():
+    requests = 0
+    started = time.perf_counter()
+    for seed in range({sessions}):
+        for _ in envelopes.replay(color_changer.handler, envelopes.button_session(random.Random(seed))):
+            requests += 1
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+default_only = per_request_us()
+for locale in {locales!r}:
+    prompts.catalog(locale)
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (first_request - imported) * 1000,
+    "request_us": default_only,
+    "request_all_loaded_us": per_request_us(),
+}}))
+"""
+
+
+def extra_locales(count):
+    """ locale names that match prompts.LOCALE_PATTERN and no real locale """
+    return ["{0}{1}-ZZ".format(first, second) for first, second in
+            itertools.islice(itertools.product(string.ascii_lowercase, repeat=2), count)]
+
+
+def skill_copy(directory, locales):
+    skill = os.path.join(directory, "skill")
+    shutil.copytree(envelopes.SKILL_DIR, skill, ignore=shutil.ignore_patterns("__pycache__"))
+    default = os.path.join(skill, "locales", "en-US.json")
+    for locale in locales:
+        shutil.copyfile(default, os.path.join(skill, "locales", locale + ".json"))
+    return skill
+
+
+def measure(count, repeats, sessions):
+    locales = extra_locales(count)
+    directory = tempfile.mkdtemp(prefix="locales-")
+    try:
+        skill = skill_copy(directory, locales)
+        script = CHILD.format(benchmarks=os.path.dirname(os.path.abspath(__file__)), skill=skill,
+                              sessions=sessions, locales=locales)
+        runs = []
+        for _ in range(repeats):
+            output = subprocess.check_output([sys.executable, "-c", script], stderr=subprocess.DEVNULL)
+            runs.append(json.loads(output.decode("utf-8").strip().splitlines()[-1]))
+    finally:
+        shutil.rmtree(directory)
+    return dict((key, statistics.median(run[key] for run in runs)) for key in runs[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of shipping more prompt locales")
+    parser.add_argument("--locales", default="0,10,100", help="extra locale files to ship")
+    parser.add_argument("--repeats", type=int, default=5, help="processes per count")
+    parser.add_argument("--sessions", type=int, default=20, help="sessions replayed per measurement")
+    args = parser.parse_args()
+
+    print("{0:<10}{1:>12}{2:>18}{3:>14}{4:>26}".format(
+        "locales", "import ms", "1st request ms", "request us", "all loaded, request us"))
+    for count in [int(count) for count in args.locales.split(",")]:
+        result = measure(count, args.repeats, args.sessions)
+        print("{0:<10}{1:>12.1f}{2:>18.2f}{3:>14.1f}{4:>26.1f}".format(
+            2 + count, result["import_ms"], result["first_request_ms"],
+            result["request_us"], result["request_all_loaded_us"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Compares routing a request through the color_changer routing table with
+    walking the equivalent chain of can_handle predicates.
+
+    Usage: python benchmarks/routing.py [iterations]
+"""
+import sys
+import timeit
+
+import envelopes
+from ask_sdk_core.utils import is_request_type, is_intent_name
+
+import color_changer
+
+# The can_handle predicates, in registration order, that the skill used before the routing table
+PREDICATE_CHAIN = [
+    (is_request_type("LaunchRequest"), color_changer.launch_request_handler),
+    (is_intent_name("AMAZON.HelpIntent"), color_changer.help_intent_handler),
+    (lambda handler_input:
+        is_intent_name("AMAZON.CancelIntent")(handler_input) or
+        is_intent_name("AMAZON.StopIntent")(handler_input),
+     color_changer.stop_and_cancel_intent_handler),
+    (is_request_type("GameEngine.InputHandlerEvent"),
+     color_changer.game_engine_input_handler),
+    (is_intent_name("AMAZON.YesIntent"), color_changer.yes_handler),
+    (is_intent_name("AMAZON.NoIntent"), color_changer.no_handler),
+    (is_request_type("SessionEndedRequest"),
+     color_changer.session_ended_request_handler),
+    (lambda handler_input: True, color_changer.default_handler),
+]
+
+
+def resolve_with_chain(handler_input):
+    for can_handle, handle_func in PREDICATE_CHAIN:
+        if can_handle(handler_input):
+            return handle_func
+
+
+def sample_requests():
+    button_down = [("button_down_event", [envelopes.input_event("gadget-1")])]
+    requests = {
+        "LaunchRequest": envelopes.launch_request("r1"),
+        "InputHandlerEvent": envelopes.input_handler_event_request(
+            "r2", "r1", button_down),
+        "AMAZON.StopIntent": envelopes.intent_request("r3", "AMAZON.StopIntent"),
+        "AMAZON.NoIntent": envelopes.intent_request("r4", "AMAZON.NoIntent"),
+        "colorIntent (unmatched)": envelopes.color_intent_request("r5", "red"),
+        "SessionEndedRequest": envelopes.session_ended_request("r6"),
+    }
+    samples = {}
+    for name, request in requests.items():
+        handler_input = envelopes.handler_input(envelopes.envelope(
+            request, {"state": color_changer.settings.SKILL_STATES["PLAY_MODE"]}))
+        samples[name] = handler_input
+    return samples
+
+
+def main(iterations):
+    routes = color_changer.routes
+    print("{0:<26}{1:>14}{2:>14}{3:>10}".format(
+        "request", "chain (us)", "table (us)", "speedup"))
+    for name, handler_input in sample_requests().items():
+        if resolve_with_chain(handler_input) is not routes.resolve(handler_input):
+            raise AssertionError("Routing mismatch for " + name)
+        chain = timeit.timeit(
+            lambda: resolve_with_chain(handler_input), number=iterations)
+        table = timeit.timeit(
+            lambda: routes.resolve(handler_input), number=iterations)
+        print("{0:<26}{1:>14.3f}{2:>14.3f}{3:>9.1f}x".format(
+            name, chain / iterations * 1e6, table / iterations * 1e6, chain / table))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,75 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Measures how many bytes the session attributes add to each response, and
+    to the request that carries them back, with and without the compact
+    session codec.
+
+    Usage: python benchmarks/session_size.py [--sessions N] [--buttons N]
+"""
+import argparse
+import json
+import os
+import random
+
+import envelopes
+
+
+def size(payload):
+    return len(json.dumps(payload, separators=(",", ":")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session attribute payload sizes")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--buttons", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ["BUTTON_COUNT"] = str(args.buttons)
+    import color_changer
+    from util import session_codec
+    plain = session_codec.JsonSessionCodec()
+    compact = session_codec.CompactSessionCodec()
+
+    totals = {}
+    rng = random.Random(2018)
+    for _ in range(args.sessions):
+        session = envelopes.button_session(rng, button_count=args.buttons)
+        for kind, _, response in envelopes.replay(color_changer.handler, session):
+            attributes = session_codec.codec.decode(response.get("sessionAttributes") or {})
+            before = plain.encode(attributes)
+            after = compact.encode(attributes)
+            envelope_before = dict(response, sessionAttributes=before)
+            envelope_after = dict(response, sessionAttributes=after)
+            row = totals.setdefault(kind, [0, 0, 0, 0, 0])
+            row[0] += 1
+            row[1] += size(before)
+            row[2] += size(after)
+            row[3] += size(envelope_before)
+            row[4] += size(envelope_after)
+
+    print("{0:<26}{1:>8}{2:>12}{3:>12}{4:>16}{5:>16}".format(
+        "request", "count", "attrs B", "compact B", "response B", "compact resp B"))
+    overall = [0, 0, 0, 0, 0]
+    for kind, row in sorted(totals.items()):
+        overall = [total + value for total, value in zip(overall, row)]
+        print("{0:<26}{1:>8}{2:>12.0f}{3:>12.0f}{4:>16.0f}{5:>16.0f}".format(
+            kind, row[0], *[value / row[0] for value in row[1:]]))
+    print("{0:<26}{1:>8}{2:>12.0f}{3:>12.0f}{4:>16.0f}{5:>16.0f}".format(
+        "mean", overall[0], *[value / overall[0] for value in overall[1:]]))
+    print("Session attributes shrink by {0:.0%}; every request carries them back as well.".format(
+        1 - overall[2] / float(overall[1])))
+
+
+if __name__ == "__main__":
+    main()
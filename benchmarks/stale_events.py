@@ -0,0 +1,83 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Checks that every stale input handler event rejected by util/stale_events.py
+    gets a response byte-identical to the one the SDK builds, replays duplicate
+    deliveries of the events of each session, which must get the response of
+    their first delivery again, reports the rejection rate, then
+    compares the latency of rejecting a stale event with and without the SDK.
+    Exits with a non-zero status on the first mismatch.
+
+    Usage: python benchmarks/stale_events.py [--sessions N] [--duplicates F] [--iterations N]
+"""
+import argparse
+import json
+import random
+import sys
+import timeit
+
+import envelopes
+
+import color_changer
+from util import stale_events
+
+sdk_handler = color_changer.sb.lambda_handler()
+
+
+def check(event):
+    expected = json.dumps(sdk_handler(json.loads(json.dumps(event)), None))
+    actual = json.dumps(stale_events.reject(event))
+    if actual != expected:
+        print("Stale event mismatch for " + event["request"]["requestId"])
+        print("  sdk:          " + expected)
+        print("  stale_events: " + actual)
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stale and duplicate event rejection")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--duplicates", type=float, default=0.02,
+                        help="fraction of input handler events delivered twice")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(2018)
+    checked = 0
+    sample = None
+    for _ in range(args.sessions):
+        session = envelopes.button_session(rng)
+        for kind, event, response in envelopes.replay(color_changer.handler, session):
+            if kind == "stale_event":
+                check(event)
+                checked += 1
+                sample = sample or event
+            elif event["request"]["type"] == "GameEngine.InputHandlerEvent" and rng.random() < args.duplicates:
+                if color_changer.handler(event, None) != response:
+                    print("Duplicate of " + event["request"]["requestId"] + " didn't get the first response")
+                    sys.exit(1)
+    print("{0} stale event responses identical to the SDK's".format(checked))
+    print("input handler events: {0} accepted, {1} stale, {2} duplicate, {3:.1%} rejected".format(
+        stale_events.counts["accepted"], stale_events.counts["stale"], stale_events.counts["duplicate"],
+        stale_events.rejection_rate()))
+
+    sdk = timeit.timeit(lambda: sdk_handler(sample, None), number=args.iterations)
+    early = timeit.timeit(lambda: color_changer.handler(sample, None), number=args.iterations)
+    print("{0:<26}{1:>14}{2:>14}{3:>10}".format("request", "sdk (us)", "early (us)", "speedup"))
+    print("{0:<26}{1:>14.1f}{2:>14.1f}{3:>9.1f}x".format(
+        "stale_event", sdk / args.iterations * 1e6,
+        early / args.iterations * 1e6, sdk / early))
+
+
+if __name__ == "__main__":
+    main()
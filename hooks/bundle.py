@@ -0,0 +1,383 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Adds the dependencies of the skill to its Lambda bundle, for the pre-deploy
+    hooks, instead of the whole site-packages of the virtualenv.
+
+    The skill is imported from SOURCE_DIR in a fresh interpreter that only sees
+    the site-packages, and answers the requests of synthetic sessions (see
+    benchmarks/envelopes.py), once with its default settings and once with
+    each of PROBE_ENVIRONMENTS, which switch on the code paths the defaults
+    leave out, such as the persistence backends. Every module it imported along
+    the way is kept. So are every module of the skill, the modules of
+    KEPT_MODULES and --keep, which only errors or requests Alexa rarely sends
+    import, and every ask_sdk_model module that deserializing some request
+    Alexa might send would import. Packages of the SDK are pruned to those
+    modules. Other packages the skill reaches are kept whole, and packages it
+    never reaches are left out.
+
+    Dependencies are shipped as sourceless .pyc files, which Python loads
+    without looking for their source or checking timestamps. The SDK packages
+    are compiled with --optimize, default 2. The skill's own modules in
+    UPLOAD_DIR keep their source, so that tracebacks show it, and get
+    precompiled bytecode that isn't checked against the source timestamps,
+    where the Python version supports it (3.7 and later). Run this script with
+    the Python of the Lambda runtime, as the hooks do with the virtualenv's.
+
+    The bundle is then zipped and extracted again, as Lambda does, next to the
+    old bundle (the source and the whole site-packages). Fresh interpreters
+    that can't write bytecode, as on Lambda, answer the synthetic sessions from
+    each, and their cold start is measured. The new bundle also answers them
+    with each of PROBE_ENVIRONMENTS, and imports the modules that were kept
+    without being reached, to check it works. It prints the size and cold start
+    of both bundles, and with --report, writes them as JSON. Exits with a
+    non-zero status if the new bundle fails a request or an import, and the
+    hooks then ship the whole site-packages instead.
+
+    Usage: python hooks/bundle.py SOURCE_DIR UPLOAD_DIR [--site-packages DIR] [--optimize N]
+                                  [--keep MODULE]... [--repeats N] [--report FILE]
+"""
+import argparse
+import json
+import os
+import py_compile
+import shutil
+import statistics
+import subprocess
+import sys
+import sysconfig
+import tempfile
+import time
+import zipfile
+
+# Packages pruned to the modules the skill reaches; the others it reaches are kept whole
+PRUNED_PACKAGES = ("ask_sdk_core", "ask_sdk_model", "ask_sdk_runtime")
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+
+# Modules kept although the synthetic sessions don't import them, with the modules they import
+KEPT_MODULES = (
+    # raised and handled when a request fails
+    "ask_sdk_core.exceptions",
+    "ask_sdk_runtime.exceptions",
+    # the clients of the Alexa service APIs, and the errors they raise
+    "ask_sdk_core.api_client",
+    "ask_sdk_model.services",
+    "ask_sdk_core.utils.viewport",
+    "ask_sdk_runtime.__version__",
+)
+
+# Settings of the skill the synthetic sessions are also answered with, besides the defaults
+PROBE_ENVIRONMENTS = (
+    {"PERSISTENCE_BACKEND": "sqlite"},
+    {"PERSISTENCE_BACKEND": "file"},
+    {"LAZY_ENVELOPE": "off", "FAST_PATH": "off", "STALE_EVENTS": "off", "ADAPTIVE_TIMEOUTS": "off",
+     "SESSION_CODEC": "json", "METRICS_FLUSH_EVERY": "1"},
+)
+
+# the speech of the skill's error handler
+ERROR_SPEECH = "Sorry, there was some problem"
+
+
+def model_modules():
+    """ the ask_sdk_model modules that deserializing the envelope of any request would import """
+    import importlib
+    import re
+    from ask_sdk_model import Request
+
+    class_path = re.compile(r"ask_sdk_model(?:\.\w+)+")
+    pending = ["ask_sdk_model.request_envelope.RequestEnvelope"] + list(Request.discriminator_value_class_map.values())
+    seen = set()
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        module_name, _, class_name = path.rpartition(".")
+        model = getattr(importlib.import_module(module_name), class_name)
+        for obj_type in (getattr(model, "deserialized_types", None) or {}).values():
+            pending.extend(class_path.findall(obj_type))
+        pending.extend((getattr(model, "discriminator_value_class_map", None) or {}).values())
+    return sorted(set(path.rpartition(".")[0] for path in seen))
+
+
+def exercise(handler, sessions):
+    """ answers the requests of synthetic sessions in every locale, and raises on an error response """
+    import random
+    import envelopes
+
+    requests = []
+    for seed in range(sessions):
+        session = envelopes.button_session(random.Random(seed))
+        requests.extend(event for _, event, _ in envelopes.replay(handler, session))
+    for request in (envelopes.intent_request(envelopes.new_request_id(), "AMAZON.HelpIntent"),
+                    envelopes.intent_request(envelopes.new_request_id(), "AMAZON.FallbackIntent"),
+                    envelopes.session_ended_request(envelopes.new_request_id())):
+        requests.append(envelopes.envelope(request))
+    # de-DE has no prompts of its own, and falls back to the default locale
+    for locale in ("en-US", "en-GB", "de-DE"):
+        request = envelopes.launch_request(envelopes.new_request_id())
+        request["locale"] = locale
+        requests.append(envelopes.envelope(request, new=True))
+
+    for event in requests:
+        response = handler(event, None)
+        speech = ((response.get("response") or {}).get("outputSpeech") or {}).get("ssml") or ""
+        if ERROR_SPEECH in speech:
+            raise RuntimeError("The skill failed to answer " + json.dumps(event["request"]))
+
+
+def skill_modules(directory):
+    """ the names of the modules of the skill in directory """
+    names = []
+    for root, directories, files in os.walk(directory):
+        # packages only, which leaves out lambda_upload in SOURCE_DIR
+        directories[:] = sorted(name for name in directories
+                                if os.path.isfile(os.path.join(root, name, "__init__.py")))
+        package = os.path.relpath(root, directory)
+        package = "" if package == os.curdir else package.replace(os.sep, ".")
+        for name in sorted(files):
+            if name == "__init__.py":
+                names.append(package)
+            elif name.endswith(".py"):
+                names.append(package + "." + name[:-3] if package else name[:-3])
+    return [name for name in names if name]
+
+
+def probe(paths, sessions, keep):
+    """ run in a fresh interpreter: the cold start of the skill from paths, then the modules it reaches """
+    import importlib
+    sys.path.insert(0, BENCHMARKS_DIR)
+    import envelopes
+    # nothing but paths and the standard library
+    if envelopes.SKILL_DIR in sys.path:
+        sys.path.remove(envelopes.SKILL_DIR)
+    sys.path[0:0] = paths
+    launch = envelopes.envelope(envelopes.launch_request(envelopes.new_request_id()), new=True)
+
+    started = time.perf_counter()
+    import color_changer
+    imported = time.perf_counter()
+    color_changer.handler(launch, None)
+    first_request = time.perf_counter()
+
+    exercise(color_changer.handler, sessions)
+    model_modules()
+    for name in keep:
+        importlib.import_module(name)
+    modules = dict((name, module.__file__) for name, module in list(sys.modules.items())
+                   if getattr(module, "__file__", None))
+    return {"import_ms": (imported - started) * 1000,
+            "first_request_ms": (first_request - imported) * 1000,
+            "modules": modules}
+
+
+def run_probe(paths, sessions, keep, environment=None):
+    """ the probe of the skill from paths, with the settings of environment on top of this process' """
+    # -S: no site-packages but the ones in paths, -B: Lambda can't write bytecode next to the code
+    command = [sys.executable, "-S", "-B", os.path.abspath(__file__), "--probe", "--sessions", str(sessions)]
+    for path in paths:
+        command.extend(["--path", path])
+    for name in keep:
+        command.extend(["--keep", name])
+    data_dir = tempfile.mkdtemp(prefix="bundle-probe-")
+    try:
+        probe_environment = dict(os.environ, PERSISTENCE_PATH=os.path.join(data_dir, "attributes"))
+        probe_environment.update(environment or {})
+        output = subprocess.check_output(command, stderr=subprocess.PIPE, env=probe_environment)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    # metrics, when they are on, are written to stdout before the result
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def top_level(site, path):
+    """ the file or directory of site that a module file belongs to, or None if it isn't in site """
+    relative = os.path.relpath(os.path.realpath(path), os.path.realpath(site))
+    if relative.startswith(os.pardir):
+        return None
+    return relative.split(os.sep)[0]
+
+
+def add_module(source, upload_dir, relative, optimize):
+    """ adds one file of a package to the bundle; Python source as a sourceless .pyc """
+    destination = os.path.join(upload_dir, relative)
+    if not os.path.isdir(os.path.dirname(destination)):
+        os.makedirs(os.path.dirname(destination))
+    if source.endswith(".py"):
+        py_compile.compile(source, cfile=destination + "c", dfile=relative, doraise=True, optimize=optimize)
+    else:
+        shutil.copy2(source, destination)
+
+
+def add_dependencies(site, upload_dir, modules, optimize):
+    """ adds the modules of site the skill reached to the bundle; returns the top level names kept """
+    kept = set()
+    for name, path in modules.items():
+        top = top_level(site, path)
+        if top is None:
+            continue
+        kept.add(top)
+        if top.split(".")[0] in PRUNED_PACKAGES:
+            relative = os.path.relpath(os.path.realpath(path), os.path.realpath(site))
+            add_module(path, upload_dir, relative, optimize)
+
+    for top in kept:
+        if top.split(".")[0] in PRUNED_PACKAGES:
+            continue
+        source = os.path.join(site, top)
+        if not os.path.isdir(source):
+            add_module(source, upload_dir, top, 0)
+            continue
+        for directory, directories, files in os.walk(source):
+            directories[:] = [name for name in directories if name != "__pycache__"]
+            for name in files:
+                if not name.endswith(".pyc"):
+                    path = os.path.join(directory, name)
+                    add_module(path, upload_dir, os.path.relpath(path, site), 0)
+    return sorted(kept)
+
+
+def compile_skill(upload_dir):
+    """ precompiles the skill's own modules, keeping their source """
+    import compileall
+    for directory, directories, _ in os.walk(upload_dir):
+        if "__pycache__" in directories:
+            shutil.rmtree(os.path.join(directory, "__pycache__"))
+    options = {}
+    if hasattr(py_compile, "PycInvalidationMode"):
+        # a zip doesn't keep timestamps exactly, and Lambda can't rewrite bytecode it finds stale
+        options["invalidation_mode"] = py_compile.PycInvalidationMode.UNCHECKED_HASH
+    if not compileall.compile_dir(upload_dir, quiet=1, **options):
+        raise SystemExit("Could not compile the skill in " + upload_dir)
+
+
+def zipped(directory, zip_path):
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                bundle.write(path, os.path.relpath(path, directory))
+    return os.path.getsize(zip_path)
+
+
+def extracted(zip_path, directory):
+    """ extracts a bundle as unzip does, with the timestamps of the archive """
+    with zipfile.ZipFile(zip_path) as bundle:
+        for info in bundle.infolist():
+            path = bundle.extract(info, directory)
+            moment = time.mktime(info.date_time + (0, 0, -1))
+            os.utime(path, (moment, moment))
+    return directory
+
+
+def measure(name, paths, work_dir, sessions, repeats, keep, environments=()):
+    """ zips a bundle made of paths, extracts it, then measures its size and cold start, and checks it
+    also answers with the settings of environments """
+    bundle_dir = os.path.join(work_dir, name)
+    os.makedirs(bundle_dir)
+    for path in paths:
+        for entry in os.listdir(path):
+            if entry in ("lambda_upload", "__pycache__"):
+                continue
+            source = os.path.join(path, entry)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(bundle_dir, entry), symlinks=True)
+            else:
+                shutil.copy2(source, os.path.join(bundle_dir, entry))
+    files = 0
+    size = 0
+    for root, _, names in os.walk(bundle_dir):
+        for file_name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, file_name))
+    zip_size = zipped(bundle_dir, bundle_dir + ".zip")
+    shutil.rmtree(bundle_dir)
+    target = extracted(bundle_dir + ".zip", bundle_dir)
+
+    runs = [run_probe([target], sessions, keep) for _ in range(repeats)]
+    for environment in environments:
+        run_probe([target], sessions, keep, environment)
+    return {
+        "files": files,
+        "bytes": size,
+        "zip_bytes": zip_size,
+        "import_ms": statistics.median(run["import_ms"] for run in runs),
+        "first_request_ms": statistics.median(run["first_request_ms"] for run in runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pruned, precompiled Lambda bundle for the skill")
+    parser.add_argument("source_dir", nargs="?")
+    parser.add_argument("upload_dir", nargs="?")
+    parser.add_argument("--site-packages", default=sysconfig.get_paths()["purelib"])
+    parser.add_argument("--optimize", type=int, default=2, choices=(0, 1, 2),
+                        help="optimization level of the SDK's bytecode")
+    parser.add_argument("--keep", action="append", default=[], metavar="MODULE",
+                        help="a module to keep, with the modules it imports, besides those of KEPT_MODULES")
+    parser.add_argument("--sessions", type=int, default=10, help="synthetic sessions the skill answers")
+    parser.add_argument("--repeats", type=int, default=5, help="cold starts measured per bundle")
+    parser.add_argument("--report", help="where to write the sizes and cold starts as JSON")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--path", action="append", default=[], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(args.path, args.sessions, args.keep)))
+        return
+    if not args.source_dir or not args.upload_dir:
+        parser.error("SOURCE_DIR and UPLOAD_DIR are required")
+
+    site = os.path.abspath(args.site_packages)
+    source_dir = os.path.abspath(args.source_dir)
+    upload_dir = os.path.abspath(args.upload_dir)
+    keep = KEPT_MODULES + tuple(args.keep) + tuple(skill_modules(source_dir))
+    modules = {}
+    try:
+        for environment in ({},) + PROBE_ENVIRONMENTS:
+            modules.update(run_probe([source_dir, site], args.sessions, keep, environment)["modules"])
+    except subprocess.CalledProcessError as error:
+        raise SystemExit("The skill in " + source_dir + " failed to answer the synthetic sessions:\n" +
+                         error.stderr.decode("utf-8", "replace").strip())
+    compile_skill(upload_dir)
+    kept = add_dependencies(site, upload_dir, modules, args.optimize)
+    print("Kept " + ", ".join(kept) + " of " + site)
+
+    work_dir = tempfile.mkdtemp(prefix="bundle-")
+    try:
+        report = {"python": sys.version.split()[0],
+                  "before": measure("before", [site, source_dir], work_dir, args.sessions, args.repeats, keep),
+                  "after": measure("after", [upload_dir], work_dir, args.sessions, args.repeats, keep,
+                                   PROBE_ENVIRONMENTS)}
+    except subprocess.CalledProcessError as error:
+        raise SystemExit("The bundle in " + upload_dir + " failed to answer the synthetic sessions:\n" +
+                         error.stderr.decode("utf-8", "replace").strip())
+    finally:
+        shutil.rmtree(work_dir)
+
+    print("{0:<8}{1:>8}{2:>14}{3:>14}{4:>12}{5:>18}".format(
+        "bundle", "files", "size KB", "zipped KB", "import ms", "1st request ms"))
+    for name in ("before", "after"):
+        row = report[name]
+        print("{0:<8}{1:>8}{2:>14,.0f}{3:>14,.0f}{4:>12.1f}{5:>18.2f}".format(
+            name, row["files"], row["bytes"] / 1024.0, row["zip_bytes"] / 1024.0,
+            row["import_ms"], row["first_request_ms"]))
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(report, report_file, indent=2, sort_keys=True)
+            report_file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
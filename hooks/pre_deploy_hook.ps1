@@ -10,7 +10,8 @@
 # The script does the following:
 #  - Create a temporary 'lambda_upload' directories under each SOURCE_DIR folder
 #  - Copy the contents of '<SKILL_NAME>/SOURCE_DIR' folder into '<SKILL_NAME>/SOURCE_DIR/lambda_upload'
-#  - Copy the contents of site packages in $VIRTUALENV created in <SKILL_NAME>/.venv/ folder
+#  - Add the packages the skill imports from the site packages in $VIRTUALENV created in <SKILL_NAME>/.venv/ folder,
+#    precompiled, see hooks/bundle.py; or all of them if that fails
 #  - Update the location of this 'lambda_upload' folder to skill.json for zip and upload
  
 param( 
@@ -45,9 +46,12 @@ if ($TARGET -eq "all" -Or $TARGET -eq "lambda") {
         $EXCLUDE_PATH = Resolve-Path -Path ((pwd).Path + "/" + $UPLOAD_DIR_PATH)
         robocopy $CODE_PATH $UPLOAD_DIR_PATH /s /e /ndl /XD $EXCLUDE_PATH 2>&1 | Out-Null
  
-        # Step 4: Find virtual environment site packages, copy contents to lambda_upload
+        # Step 4: Find virtual environment site packages, add the ones the skill imports to lambda_upload
         $SITE = $(.venv\skill_env\Scripts\python -c "from distutils.sysconfig import get_python_lib; print(get_python_lib())")
-        Copy-Item "$SITE\*" -Destination $UPLOAD_DIR_PATH -Recurse 
+        .venv\skill_env\Scripts\python hooks\bundle.py $CODE_PATH $UPLOAD_DIR_PATH --site-packages $SITE
+        if ($LASTEXITCODE -ne 0) {
+            Copy-Item "$SITE\*" -Destination $UPLOAD_DIR_PATH -Recurse 
+        }
  
         # Step 5: Update the "manifest.apis.custom.endpoint.sourceDir" value in skill.json if necessary
         if (!$FILTER_SOURCE_DIR.endsWith("/lambda_upload")) {
@@ -11,7 +11,8 @@
 # The script does the following:
 #  - Create a temporary 'lambda_upload' directories under each SOURCE_DIR folder
 #  - Copy the contents of '<SKILL_NAME>/SOURCE_DIR' folder into '<SKILL_NAME>/SOURCE_DIR/lambda_upload'
-#  - Copy the contents of site packages in $VIRTUALENV created in <SKILL_NAME>/.venv/ folder
+#  - Add the packages the skill imports from the site packages in $VIRTUALENV created in <SKILL_NAME>/.venv/ folder,
+#    precompiled, see hooks/bundle.py; or all of them if that fails
 #  - Update the location of this 'lambda_upload' folder to skill.json for zip and upload
  
 SKILL_NAME=$1
@@ -47,10 +48,13 @@ if [[ $TARGET == "all" || $TARGET == "lambda" ]]; then
         echo "Copying source code in $SKILL_NAME/$ADJUSTED_SOURCE_DIR folder to $SKILL_NAME/$UPLOAD_DIR"
         rsync -avzq --exclude '*lambda_upload' $ADJUSTED_SOURCE_DIR/* $UPLOAD_DIR
  
-        # Step 4: Find virtual environment site packages, copy contents to lambda_upload
-        echo "Copying dependencies installed in $SKILL_NAME/.venv/$SKILL_ENV_NAME to $SKILL_NAME/$UPLOAD_DIR"
+        # Step 4: Find virtual environment site packages, add the ones the skill imports to lambda_upload
+        echo "Bundling dependencies installed in $SKILL_NAME/.venv/$SKILL_ENV_NAME into $SKILL_NAME/$UPLOAD_DIR"
         SITE=$(.venv/$SKILL_ENV_NAME/bin/python -c 'from distutils.sysconfig import get_python_lib; print(get_python_lib())')
-        cp -r $SITE/* $UPLOAD_DIR
+        if ! .venv/$SKILL_ENV_NAME/bin/python hooks/bundle.py $ADJUSTED_SOURCE_DIR $UPLOAD_DIR --site-packages $SITE; then
+            echo "Bundling failed, copying all dependencies installed in $SKILL_NAME/.venv/$SKILL_ENV_NAME instead"
+            cp -r $SITE/* $UPLOAD_DIR
+        fi
  
         # Step 4: Update the "manifest.apis.custom.endpoint.sourceDir" value in skill.json if necessary
         if ! [[ $SOURCE_DIR == */lambda_upload ]]; then
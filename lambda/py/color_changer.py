@@ -12,36 +12,29 @@
     permissions and limitations under the License.
 """
 import logging
-import json
 
-from ask_sdk_core.skill_builder import SkillBuilder
-from ask_sdk_core.utils import is_request_type, is_intent_name
+from ask_sdk_core.skill_builder import CustomSkillBuilder
+from ask_sdk_core.utils import is_intent_name
 from ask_sdk_core.handler_input import HandlerInput
-from ask_sdk_core.serialize import DefaultSerializer
-
-from ask_sdk_model import Response, SessionEndedRequest
-from ask_sdk_model.interfaces.gadget_controller import SetLightDirective
-from ask_sdk_model.interfaces.game_engine import (
-    StartInputHandlerDirective, StopInputHandlerDirective)
-from ask_sdk_model.services.game_engine import (
-    Event, EventReportingType, PatternRecognizer, PatternRecognizerAnchorType,
-    Pattern, InputEventActionType, InputEvent
-)
-from ask_sdk_model.services.gadget_controller import (
-    AnimationStep, LightAnimation, SetLightParameters, TriggerEventType
-)
-
-from util import rollcall, game, settings, directives
+
+from ask_sdk_model import SessionEndedRequest
+
+from util import (
+    rollcall, game, settings, logs, routing, session_codec, persistence, fast_path, state_machine, metrics,
+    animation_compiler, timeouts, stale_events, lazy_envelope, prompts)
+from util.models import game_engine_directives
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-serializer = DefaultSerializer()
+# The persistence adapter is None, and persistence is off, unless PERSISTENCE_BACKEND is set
+sb = CustomSkillBuilder(persistence_adapter=persistence.adapter)
 
-sb = SkillBuilder()
+# Requests are routed through a table indexed by request type, intent name and skill state
+routes = routing.RoutingTable(settings.SKILL_STATES.values())
 
 
-@sb.request_handler(can_handle_func=is_request_type("LaunchRequest"))
+@routes.route("LaunchRequest")
 def launch_request_handler(handler_input):
     """Handler for Skill Launch."""
     # type: (HandlerInput) -> Response
@@ -63,7 +56,7 @@ def error_handler(handler_input, exception):
     return handler_input.response_builder.response
 
 
-@sb.request_handler(can_handle_func=is_intent_name("AMAZON.HelpIntent"))
+@routes.route("IntentRequest", "AMAZON.HelpIntent")
 def help_intent_handler(handler_input):
     """Handler for Help Intent."""
     # type: (HandlerInput) -> Response
@@ -83,39 +76,24 @@ def help_response(handler_input):
         # if there is an active input handler, stop it so it doesn't interrup Alexa speaking the Help prompt
         # see: https://developer.amazon.com/docs/echo-button-skills/receive-echo-button-events.html#stop
         ctx["directives"].append(
-            StopInputHandlerDirective(
+            game_engine_directives.StopInputHandlerDirective(
                 originating_request_id=session_attributes["current_input_handler_id"]
             )
         )
 
     if "is_roll_call_complete" in session_attributes and session_attributes["is_roll_call_complete"]:
-        ctx["output_speech"] = ["Now that you have registered two buttons, "]
-        ctx["output_speech"].append(
-            "you can pick a color to show when the buttons are pressed. ")
-        ctx["output_speech"].append(
-            "Select one of the following colors: red, blue, or green. ")
-        ctx["output_speech"].append(
-            "If you do not wish to continue, you can say exit. ")
-        ctx["reprompt"] = ["Pick a color to test your buttons: red, blue, or green. "]
-        ctx["reprompt"].append(" Or say cancel or exit to quit. ")
+        ctx["output_speech"] = prompts.render(handler_input, "HELP_PLAY")
+        ctx["reprompt"] = prompts.render(handler_input, "HELP_PLAY_REPROMPT")
     else:
-        ctx["output_speech"] = [
-            "You will need two Echo buttons to to use this skill. "]
-        ctx["output_speech"].append("Each of the two buttons you plan to use ")
-        ctx["output_speech"].append(
-            "must be pressed for the skill to register them. ")
-        ctx["output_speech"].append(
-            "Would you like to continue and register two Echo buttons? ")
-        ctx["reprompt"] = ["You can say yes to continue, or no or exit to quit."]
+        ctx["output_speech"] = prompts.render(handler_input, "HELP_ROLL_CALL")
+        ctx["reprompt"] = prompts.render(handler_input, "HELP_ROLL_CALL_REPROMPT")
         session_attributes["expecting_skill_confirmation"] = True
 
     return handler_input.response_builder.response
 
 
-@sb.request_handler(
-    can_handle_func=lambda handler_input:
-        is_intent_name("AMAZON.CancelIntent")(handler_input) or
-        is_intent_name("AMAZON.StopIntent")(handler_input))
+@routes.route("IntentRequest", "AMAZON.CancelIntent")
+@routes.route("IntentRequest", "AMAZON.StopIntent")
 def stop_and_cancel_intent_handler(handler_input):
     """Single handler for Stop and Cancel Intent."""
     # type: (HandlerInput) -> Response
@@ -129,12 +107,12 @@ def stop_response(handler_input):
     logger.info("stop_response")
 
     ctx = handler_input.attributes_manager.request_attributes
-    ctx["output_speech"] = ["Good Bye!"]
+    ctx["output_speech"] = prompts.render(handler_input, "STOP")
 
     return end_session(handler_input)
 
 
-@sb.request_handler(can_handle_func=is_request_type("GameEngine.InputHandlerEvent"))
+@routes.route("GameEngine.InputHandlerEvent")
 def game_engine_input_handler(handler_input):
     """Handler for all game engine events."""
     # type: (HandlerInput) -> Response
@@ -146,93 +124,103 @@ def game_engine_input_handler(handler_input):
 
     if ("current_input_handler_id" in session_attributes
             and request.originating_request_id != session_attributes["current_input_handler_id"]):
-        logger.warn("Stale input received -> received event from " + request.originating_request_id +
-                    "(was expecting " + session_attributes["current_input_handler_id"] + ")")
+        logger.warning("Stale input received -> received event from " + request.originating_request_id +
+                      "(was expecting " + session_attributes["current_input_handler_id"] + ")")
         ctx["open_microphone"] = False
         return handler_input.response_builder.response
 
+    # The Game Engine may batch several events into one request, so we handle all of them
+    # and fold the results into a single response rather than stopping at the first one.
     game_engine_events = request.events if request.events else []
+    output_speech = []
+    reprompt = []
+    coalesced = 0
+    waiting = False
     for evt in game_engine_events:
-        # In this request type, we'll see one or more incoming events
-        # that correspond to the StartInputHandler we sent above.
-        if evt.name == "first_button_checked_in":
-            ctx["game_input_events"] = evt.input_events
-            return rollcall.handle_first_button_check_in(handler_input)
-        elif evt.name == "second_button_checked_in":
-            ctx["game_input_events"] = evt.input_events
-            return rollcall.handle_second_button_check_in(handler_input)
-        elif evt.name == "button_down_event":
-            if session_attributes["state"] == settings.SKILL_STATES["PLAY_MODE"]:
-                ctx["game_input_events"] = evt.input_events
-                return game.handle_button_pressed(handler_input)
-        elif evt.name == "timeout":
-            if session_attributes["state"] == settings.SKILL_STATES["PLAY_MODE"]:
-                ctx["game_input_events"] = evt.input_events
-                return game.handle_timeout(handler_input)
-            else:
-                return rollcall.handle_timeout(handler_input)
-
+        ctx["output_speech"] = []
+        ctx["reprompt"] = []
+        if handle_game_engine_event(handler_input, evt):
+            coalesced += 1
+            output_speech.extend(ctx["output_speech"])
+            reprompt = ctx["reprompt"] or reprompt
+            waiting = settings.WAITING_AUDIO in ctx["output_speech"]
+
+    if coalesced > 1:
+        logger.info("Coalesced " + str(coalesced) +
+                    " game engine events into one response")
+        # play the waiting audio once, at the end, if the last event still waits for button presses
+        output_speech = [
+            part for part in output_speech if part != settings.WAITING_AUDIO]
+        if waiting:
+            output_speech.append(settings.WAITING_AUDIO)
+
+    ctx["output_speech"] = output_speech
+    ctx["reprompt"] = reprompt
+    ctx["coalesced_events"] = coalesced
     return handler_input.response_builder.response
 
 
-@sb.request_handler(can_handle_func=is_intent_name("AMAZON.YesIntent"))
+def handle_game_engine_event(handler_input, evt):
+    """Handles one game engine event, returns whether it was recognized."""
+    # type: (HandlerInput, InputHandlerEvent) -> bool
+    ctx = handler_input.attributes_manager.request_attributes
+
+    # the check-in events of all the buttons are one event for the state machine
+    event = CHECK_IN_EVENT if evt.name.endswith(rollcall.CHECK_IN_EVENT_SUFFIX) else evt.name
+    if event not in transitions.events:
+        return False
+    ctx["game_input_events"] = evt.input_events
+    handled, _ = transitions.dispatch(handler_input, event)
+    return handled
+
+
+@routes.route("IntentRequest", "AMAZON.YesIntent")
 def yes_handler(handler_input):
     """Handler for all other unhandled requests."""
     # type: (HandlerInput) -> Response
     logger.info("color_changer.yes_handler: handling request")
 
-    ctx = handler_input.attributes_manager.request_attributes
-    session_attributes = handler_input.attributes_manager.session_attributes
+    _, response = transitions.dispatch(handler_input, "AMAZON.YesIntent")
+    return response
 
-    if (session_attributes["state"] == settings.SKILL_STATES["ROLL_CALL_MODE"]
-        and "expecting_end_skill_confirmation" in session_attributes
-            and session_attributes["expecting_end_skill_confirmation"]):
-        ctx["output_speech"] = [
-            "Ok. Press the first button, wait for confirmation,"]
-        ctx["output_speech"].append("then press the second button.")
-        ctx["output_speech"].append(settings.WAITING_AUDIO)
-        ctx["timeout"] = 30000
-        return rollcall.start_roll_call(handler_input)
-    elif session_attributes["state"] == settings.SKILL_STATES["EXIT_MODE"]:
-        if ("expecting_end_skill_confirmation" in session_attributes
-                and session_attributes["expecting_end_skill_confirmation"]):
-
-            return end_session(handler_input)
-        else:
-            return catch_all(handler_input)
-    else:
-        return help_response(handler_input)
+
+def restart_roll_call(handler_input):
+    """User wants more time to press the buttons."""
+    # type: (HandlerInput) -> Response
+    logger.info("restart_roll_call")
+
+    ctx = handler_input.attributes_manager.request_attributes
+    ctx["output_speech"] = prompts.render(handler_input, "RESTART_ROLL_CALL")
+    ctx["timeout"] = timeouts.roll_call_retry_timeout(handler_input)
+    return rollcall.start_roll_call(handler_input)
 
 
-@sb.request_handler(can_handle_func=is_intent_name("AMAZON.NoIntent"))
+@routes.route("IntentRequest", "AMAZON.NoIntent")
 def no_handler(handler_input):
     """Handler for all other unhandled requests."""
     # type: (HandlerInput) -> Response
     logger.info("color_changer.no_handler: handling request")
 
+    _, response = transitions.dispatch(handler_input, "AMAZON.NoIntent")
+    return response
+
+
+def keep_playing(handler_input):
+    """User doesn't want to quit after the input handler timed out."""
+    # type: (HandlerInput) -> Response
+    logger.info("keep_playing")
+
     ctx = handler_input.attributes_manager.request_attributes
     session_attributes = handler_input.attributes_manager.session_attributes
 
-    if (session_attributes["state"] == settings.SKILL_STATES["ROLL_CALL_MODE"]
-        and "expecting_end_skill_confirmation" in session_attributes
-            and session_attributes["expecting_end_skill_confirmation"]):
-        return stop_response(handler_input)
-    elif session_attributes["state"] == settings.SKILL_STATES["EXIT_MODE"]:
-        if ("expecting_end_skill_confirmation" in session_attributes
-                and session_attributes["expecting_end_skill_confirmation"]):
-            ctx["reprompt"] = ["Pick a different color, red, blue, or green."]
-            ctx["output_speech"] = ["Ok, let's keep going."]
-            ctx["output_speech"].append(ctx["reprompt"][0])
-            ctx["open_microphone"] = True
-            session_attributes["state"] = settings.SKILL_STATES["PLAY_MODE"]
-            return handler_input.response_builder.response
-        else:
-            return catch_all(handler_input)
-    else:
-        return help_response(handler_input)
+    ctx["reprompt"] = prompts.render(handler_input, "KEEP_PLAYING_REPROMPT")
+    ctx["output_speech"] = prompts.render(handler_input, "KEEP_PLAYING")
+    ctx["open_microphone"] = True
+    session_attributes["state"] = settings.SKILL_STATES["PLAY_MODE"]
+    return handler_input.response_builder.response
 
 
-@sb.request_handler(can_handle_func=is_request_type("SessionEndedRequest"))
+@routes.route("SessionEndedRequest")
 def session_ended_request_handler(handler_input):
     """Handler for Session End."""
     # type: (HandlerInput) -> Response
@@ -254,12 +242,12 @@ def end_session(handler_input):
             logger.info("Session ended with error: " + request.error.to_str())
 
     ctx = handler_input.attributes_manager.request_attributes
-    ctx["output_speech"] = ["Good bye!"]
+    ctx["output_speech"] = prompts.render(handler_input, "GOOD_BYE")
     handler_input.response_builder.set_should_end_session(True)
     return handler_input.response_builder.response
 
 
-@sb.request_handler(can_handle_func=lambda input: True)
+@routes.fallback
 def default_handler(handler_input):
     """Handler for all other unhandled requests."""
     # type: (HandlerInput) -> Response
@@ -275,27 +263,60 @@ def catch_all(handler_input):
         return game.color_intent_handler(handler_input)
 
     ctx = handler_input.attributes_manager.request_attributes
-    ctx["reprompt"] = ["Please say again, or say help if you're not sure what to do."]
-    ctx["output_speech"] = ["Sorry, I didn't get that. " + ctx["reprompt"][0]]
+    ctx["reprompt"] = prompts.render(handler_input, "NOT_UNDERSTOOD_REPROMPT")
+    ctx["output_speech"] = prompts.render(handler_input, "NOT_UNDERSTOOD")
     ctx["open_microphone"] = True
 
     return handler_input.response_builder.response
 
 
+# What yes, no and the game engine events do depends on the skill state, and on whether we asked
+# the user to confirm ending the skill. Each row is: event, state, expecting end skill confirmation,
+# handler. The most specific row wins; the table is compiled, and checked for gaps, at import.
+CHECK_IN_EVENT = "button_checked_in"
+ANY = state_machine.ANY
+ROLL_CALL_MODE = settings.SKILL_STATES["ROLL_CALL_MODE"]
+PLAY_MODE = settings.SKILL_STATES["PLAY_MODE"]
+EXIT_MODE = settings.SKILL_STATES["EXIT_MODE"]
+
+transitions = state_machine.StateMachine(
+    settings.SKILL_STATES.values(),
+    ["AMAZON.YesIntent", "AMAZON.NoIntent", CHECK_IN_EVENT, "button_down_event", "timeout"],
+    [
+        ("AMAZON.YesIntent", ROLL_CALL_MODE, True, restart_roll_call),
+        ("AMAZON.YesIntent", EXIT_MODE, True, end_session),
+        ("AMAZON.YesIntent", EXIT_MODE, False, catch_all),
+        ("AMAZON.YesIntent", ANY, ANY, help_response),
+
+        ("AMAZON.NoIntent", ROLL_CALL_MODE, True, stop_response),
+        ("AMAZON.NoIntent", EXIT_MODE, True, keep_playing),
+        ("AMAZON.NoIntent", EXIT_MODE, False, catch_all),
+        ("AMAZON.NoIntent", ANY, ANY, help_response),
+
+        (CHECK_IN_EVENT, ANY, ANY, rollcall.handle_button_check_in),
+        ("button_down_event", PLAY_MODE, ANY, game.handle_button_pressed),
+        ("button_down_event", ANY, ANY, state_machine.IGNORE),
+        ("timeout", PLAY_MODE, ANY, game.handle_timeout),
+        ("timeout", ANY, ANY, rollcall.handle_timeout),
+    ])
+
+
 @sb.global_request_interceptor()
+@metrics.timed()
 def request_interceptor(handler_input):
     """Request Interceptor"""
     # type: (HandlerInput) -> None
-    logger.info("==Request==")
-    serialized = serializer.serialize(handler_input.request_envelope)
-    logger.info(json.dumps(serialized, indent=4))
-    logger.info("==Session Attributes==")
-    logger.info(json.dumps(
-        handler_input.attributes_manager.session_attributes, indent=4))
+    # Session attributes arrive in their compact form, see util/session_codec.py
+    session_codec.decode(handler_input)
 
     ctx = handler_input.attributes_manager.request_attributes
     session_attributes = handler_input.attributes_manager.session_attributes
 
+    # Payload dumps are expensive, so only build them when they will be emitted
+    ctx["log_payloads"] = logs.should_log_payloads(handler_input)
+    if ctx["log_payloads"]:
+        logs.log_request(handler_input)
+
     # Assign ROLL_CALL_MODE if we don't have a state
     if "state" not in session_attributes or session_attributes["state"] is None:
         session_attributes["state"] = settings.SKILL_STATES["ROLL_CALL_MODE"]
@@ -306,6 +327,7 @@ def request_interceptor(handler_input):
 
 
 @sb.global_response_interceptor()
+@metrics.timed()
 def response_interceptor(handler_input, response):
     """Response Interceptor."""
     # type: (HandlerInput, Response) -> None
@@ -313,15 +335,16 @@ def response_interceptor(handler_input, response):
     ctx = handler_input.attributes_manager.request_attributes
     response_builder = handler_input.response_builder
 
+    # the prompts fit Alexa's limits on their own, see util/prompts.py; coalesced events may not
     if len(ctx["output_speech"]) > 0:
         logger.info(
             "Adding " + str(len(ctx["output_speech"])) + " speech parts.")
-        speech_text = " ".join(ctx["output_speech"])
+        speech_text = " ".join(prompts.budget(ctx["output_speech"]))
         response_builder.speak(speech_text)
 
     if len(ctx["reprompt"]) > 0:
         logger.info("Adding " + str(len(ctx["reprompt"])) + " reprompt parts.")
-        reprompt = " ".join(ctx["reprompt"])
+        reprompt = " ".join(prompts.budget(ctx["reprompt"]))
         response_builder.ask(reprompt)
 
     if "open_microphone" in ctx:
@@ -336,18 +359,30 @@ def response_interceptor(handler_input, response):
             # see: https://developer.amazon.com/docs/echo-button-skills/keep-session-open.html
             response_builder.set_should_end_session(None)
 
+    # drop the SetLight directives the buttons don't need, see util/animation_compiler.py
+    ctx["directives"] = animation_compiler.compile_directives(handler_input, ctx["directives"])
     logger.info("Adding " + str(len(ctx["directives"])) + " directives")
     for directive in ctx["directives"]:
         response_builder.add_directive(directive)
 
-    logger.info("==Response==")
-    serialized = serializer.serialize(response)
-    logger.info(json.dumps(serialized, indent=4))
-    logger.info("==Session Attributes==")
-    logger.info(json.dumps(
-        handler_input.attributes_manager.session_attributes, indent=4))
+    if ctx.get("log_payloads"):
+        logs.log_response(handler_input, response)
+
+    session_codec.encode(handler_input)
 
     return response_builder.response
 
 
-handler = sb.lambda_handler()
+if metrics.ENABLED:
+    # time every handler, and every state machine transition, see util/metrics.py
+    routes.wrap(lambda handle_func: metrics.timed("handler." + handle_func.__name__)(handle_func))
+    transitions.wrap(lambda handle_func: metrics.timed(
+        "transition." + handle_func.__module__.split(".")[-1] + "." + handle_func.__name__)(handle_func))
+
+sb.add_request_handler(routes.request_handler())
+
+# Stale and duplicate input handler events are rejected, see util/stale_events.py, and plain
+# button presses during play are answered, see util/fast_path.py, without going through the SDK.
+# The SDK gets the other input handler events lazily deserialized, see util/lazy_envelope.py
+handler = metrics.lambda_handler(stale_events.lambda_handler(
+    fast_path.lambda_handler(metrics.sdk_lambda_handler(sb, lazy_envelope.deserializer()))))
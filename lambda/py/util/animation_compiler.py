@@ -0,0 +1,167 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import json
+import logging
+import zlib
+
+from . import directives, gadgets, light_shows
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SET_LIGHT = "GadgetController.SetLight"
+
+# Session attribute holding, per trigger, a fingerprint of the animation each button has.
+# "*" is the animation of every button that has none of its own.
+SESSION_KEY = "lights"
+
+# The animations for button presses stay on the buttons until they are replaced, so sending one a
+# button already has is redundant. An animation without a trigger plays as soon as it arrives,
+# so those are always sent.
+TRACKED_TRIGGERS = frozenset(["buttonDown", "buttonUp"])
+
+# fingerprints of the parameters of the cached directives, keyed by the id of the parameters
+# dict; the dict is kept alongside, so its id can't be reused while it is in here
+FINGERPRINT_CACHE_SIZE = 256
+_fingerprints = {}
+
+
+def fingerprint(parameters):
+    # type: (Dict[str, object]) -> str
+    """ returns a short, stable fingerprint of the parameters of a SetLight directive """
+    cached = _fingerprints.get(id(parameters))
+    if cached is not None and cached[0] is parameters:
+        return cached[1]
+    value = "{0:08x}".format(zlib.crc32(
+        json.dumps(parameters, sort_keys=True, separators=(",", ":")).encode("utf-8")))
+    if len(_fingerprints) >= FINGERPRINT_CACHE_SIZE:
+        _fingerprints.clear()
+    _fingerprints[id(parameters)] = (parameters, value)
+    return value
+
+
+def _is_set_light(directive):
+    # SetLight directives built as SDK models are left as they are
+    return isinstance(directive, dict) and directive.get("type") == SET_LIGHT
+
+
+def _retarget(directive, target_gadgets):
+    if list(target_gadgets) == directive["targetGadgets"]:
+        return directive
+    retargeted = directives.SerializedDirective(directive)
+    retargeted["targetGadgets"] = list(target_gadgets)
+    return retargeted
+
+
+def drop_overridden(directive_list):
+    """ removes, from every SetLight directive, the gadgets that a later directive with the same trigger
+    sets again, and drops the directives left without gadgets. An empty target list means every gadget. """
+    covered = {}
+    kept = []
+    for directive in reversed(directive_list):
+        if not _is_set_light(directive):
+            kept.append(directive)
+            continue
+        # None stands for "every gadget" in the covered sets
+        covered_gadgets = covered.setdefault(directive["parameters"]["triggerEvent"], set())
+        if None in covered_gadgets:
+            continue
+        target_gadgets = directive["targetGadgets"]
+        if not target_gadgets:
+            covered_gadgets.add(None)
+            kept.append(directive)
+            continue
+        remaining = [gadget_id for gadget_id in target_gadgets if gadget_id not in covered_gadgets]
+        if remaining:
+            covered_gadgets.update(remaining)
+            kept.append(_retarget(directive, remaining))
+    kept.reverse()
+    return kept
+
+
+def drop_redundant(directive_list, lights, registry):
+    """ removes the gadgets that already have the animation of a SetLight directive, according to the
+    lights kept in the session, and records the animations that are sent """
+    kept = []
+    for directive in directive_list:
+        trigger_event = directive["parameters"]["triggerEvent"] if _is_set_light(directive) else None
+        if trigger_event not in TRACKED_TRIGGERS:
+            kept.append(directive)
+            continue
+        animation = fingerprint(directive["parameters"])
+        current = lights.setdefault(trigger_event, {})
+        if not directive["targetGadgets"]:
+            if current.get("*") == animation and all(value == animation for value in current.values()):
+                continue
+            current.clear()
+            current["*"] = animation
+            kept.append(directive)
+            continue
+        remaining = []
+        for gadget_id in directive["targetGadgets"]:
+            button_number = registry.button_number(gadget_id)
+            if button_number is None:
+                # we can't keep track of buttons that aren't registered
+                remaining.append(gadget_id)
+                continue
+            button = str(button_number)
+            if current.get(button, current.get("*")) != animation:
+                current[button] = animation
+                remaining.append(gadget_id)
+        if remaining:
+            kept.append(_retarget(directive, remaining))
+    return kept
+
+
+def merge_identical(directive_list):
+    """ merges SetLight directives that set the same animation on different gadgets into one directive,
+    in the place of the first of them, as long as the merged directive can hold the steps of the animation
+    for all of its target gadgets """
+    merged = []
+    by_animation = {}
+    for directive in directive_list:
+        if not _is_set_light(directive) or not directive["targetGadgets"]:
+            merged.append(directive)
+            continue
+        animation = fingerprint(directive["parameters"])
+        first = by_animation.get(animation)
+        if first is not None and light_shows.directive_steps(first) <= light_shows.max_steps(
+                len(first["targetGadgets"]) + len(directive["targetGadgets"])):
+            first["targetGadgets"].extend(directive["targetGadgets"])
+            continue
+        first = directives.SerializedDirective(directive)
+        first["targetGadgets"] = list(directive["targetGadgets"])
+        by_animation[animation] = first
+        merged.append(first)
+    return merged
+
+
+def compile_directives(handler_input, directive_list):
+    # type: (HandlerInput, List[object]) -> List[object]
+    """ returns the directives of a response with overridden, redundant and duplicate SetLight directives
+    taken out, and keeps track of the animations on the buttons in the session attributes """
+    if not any(_is_set_light(directive) for directive in directive_list):
+        return directive_list
+    session_attributes = handler_input.attributes_manager.session_attributes
+    lights = session_attributes.setdefault(SESSION_KEY, {})
+
+    compiled = drop_overridden(directive_list)
+    compiled = drop_redundant(compiled, lights, gadgets.registry(handler_input))
+    # once the overridden gadgets are gone, every gadget gets at most one animation per trigger,
+    # so directives can be merged without changing which animation wins
+    compiled = merge_identical(compiled)
+
+    if len(compiled) != len(directive_list):
+        logger.info("Compiled " + str(len(directive_list)) + " directives into " + str(len(compiled)))
+    return compiled
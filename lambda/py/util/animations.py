@@ -14,14 +14,21 @@
     button two press she changes the color to blue. Then closes. This Skill
     demonstrates how to send directives to, and receive events from, Echo Buttons.
 """
+import functools
 import logging
 from enum import Enum
-from ask_sdk_model.services.gadget_controller import (
-    AnimationStep, LightAnimation)
+from ask_sdk_core.serialize import DefaultSerializer
+from .models import gadget_controller
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Animations are built from a small, fixed set of colors and durations, so the serialized
+# form of each one is kept and reused across requests, up to this many distinct animations.
+ANIMATION_CACHE_SIZE = 64
+
+serializer = DefaultSerializer()
+
 
 class Colors(Enum):
     white = "ffffff"
@@ -47,11 +54,11 @@ class Colors(Enum):
 
 
 def solid_animation(cycles, color, duration):
-    return LightAnimation(
+    return gadget_controller.LightAnimation(
         repeat=cycles,
         target_lights=["1"],
         sequence=[
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=duration,
                 blend=False,
                 color=color.value
@@ -61,11 +68,11 @@ def solid_animation(cycles, color, duration):
 
 
 def fade_animation(cycles, color, duration):
-    return LightAnimation(
+    return gadget_controller.LightAnimation(
         repeat=cycles,
         target_lights=["1"],
         sequence=[
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=duration,
                 blend=True,
                 color=color.value
@@ -75,16 +82,16 @@ def fade_animation(cycles, color, duration):
 
 
 def fade_in_animation(cycles, color, duration):
-    return LightAnimation(
+    return gadget_controller.LightAnimation(
         repeat=cycles,
         target_lights=["1"],
         sequence=[
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=1,
                 blend=True,
                 color=Colors.black.value
             ),
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=duration,
                 blend=False,
                 color=color.value
@@ -94,16 +101,16 @@ def fade_in_animation(cycles, color, duration):
 
 
 def fade_out_animation(cycles, color, duration):
-    return LightAnimation(
+    return gadget_controller.LightAnimation(
         repeat=cycles,
         target_lights=["1"],
         sequence=[
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=duration,
                 blend=True,
                 color=color.value
             ),
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=1,
                 blend=True,
                 color=Colors.black.value
@@ -113,16 +120,16 @@ def fade_out_animation(cycles, color, duration):
 
 
 def cross_fade_animation(cycles, color_one, color_two, duration_one, duration_two):
-    return LightAnimation(
+    return gadget_controller.LightAnimation(
         repeat=cycles,
         target_lights=["1"],
         sequence=[
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=duration_one,
                 blend=True,
                 color=color_one.value
             ),
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=duration_two,
                 blend=True,
                 color=color_two.value
@@ -132,26 +139,26 @@ def cross_fade_animation(cycles, color_one, color_two, duration_one, duration_tw
 
 
 def breathe_animation(cycles, color, duration):
-    return LightAnimation(
+    return gadget_controller.LightAnimation(
         repeat=cycles,
         target_lights=["1"],
         sequence=[
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=1,
                 blend=True,
                 color=Colors.black.value
             ),
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=duration,
                 blend=True,
                 color=color.value
             ),
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=300,
                 blend=True,
                 color=color.value
             ),
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=300,
                 blend=True,
                 color=Colors.black.value
@@ -161,16 +168,16 @@ def breathe_animation(cycles, color, duration):
 
 
 def blink_animation(cycles, color):
-    return LightAnimation(
+    return gadget_controller.LightAnimation(
         repeat=cycles,
         target_lights=["1"],
         sequence=[
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=500,
                 blend=False,
                 color=color.value
             ),
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=500,
                 blend=False,
                 color=Colors.black.value
@@ -180,16 +187,16 @@ def blink_animation(cycles, color):
 
 
 def flip_animation(cycles, color_one, color_two, duration_one, duration_two):
-    return LightAnimation(
+    return gadget_controller.LightAnimation(
         repeat=cycles,
         target_lights=["1"],
         sequence=[
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=duration_one,
                 blend=False,
                 color=color_one.value
             ),
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=duration_two,
                 blend=False,
                 color=color_two.value
@@ -199,19 +206,31 @@ def flip_animation(cycles, color_one, color_two, duration_one, duration_two):
 
 
 def pulse_animation(cycles, color_one, color_two):
-    return LightAnimation(
+    return gadget_controller.LightAnimation(
         repeat=cycles,
         target_lights=["1"],
         sequence=[
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=500,
                 blend=True,
                 color=color_one.value
             ),
-            AnimationStep(
+            gadget_controller.AnimationStep(
                 duration_ms=1000,
                 blend=True,
                 color=color_two.value
             )
         ]
     )
+
+
+@functools.lru_cache(maxsize=ANIMATION_CACHE_SIZE)
+def serialized_animation(spec):
+    """ returns the serialized form of an animation spec, a (builder, *args) tuple such as
+    (breathe_animation, 30, Colors.red, 450). The result is shared, so it must not be modified. """
+    builder, args = spec[0], spec[1:]
+    animation = builder(*args)
+    # the procedural builders in light_shows.py return animations already serialized
+    if isinstance(animation, dict):
+        return animation
+    return serializer.serialize(animation)
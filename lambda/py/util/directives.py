@@ -14,22 +14,33 @@
     button two press she changes the color to blue. Then closes. This Skill
     demonstrates how to send directives to, and receive events from, Echo Buttons.
 """
-from ask_sdk_model.interfaces.gadget_controller import SetLightDirective
-from ask_sdk_model.interfaces.game_engine import (
-    StartInputHandlerDirective, StopInputHandlerDirective
-)
-from ask_sdk_model.services.gadget_controller import (
-    SetLightParameters, TriggerEventType
-)
+import functools
+from ask_sdk_core.serialize import DefaultSerializer
+from . import animations, light_shows
+from .models import gadget_controller, gadget_controller_directives
+
+# Number of distinct (trigger, animation) SetLight directives kept in serialized form
+DIRECTIVE_CACHE_SIZE = 64
+
+serializer = DefaultSerializer()
+
+
+class SerializedDirective(dict):
+    """ A directive already in its serialized (JSON dict) form. The SDK serializer copies dicts
+    as they are, and the response builder only needs the directive's object_type. """
+
+    @property
+    def object_type(self):
+        return self["type"]
 
 
 def button_idle_animation_directive(animation, target_gadgets=[]):
     """ returns a SetLight directive, with a 'none' trigger, that can be added to an Alexa skill response """
-    return SetLightDirective(
+    return gadget_controller_directives.SetLightDirective(
         version=1,
         target_gadgets=target_gadgets,
-        parameters=SetLightParameters(
-            trigger_event=TriggerEventType.none,
+        parameters=gadget_controller.SetLightParameters(
+            trigger_event=gadget_controller.TriggerEventType.none,
             trigger_event_time_ms=0,
             animations=[animation]
         )
@@ -38,11 +49,11 @@ def button_idle_animation_directive(animation, target_gadgets=[]):
 
 def button_up_animation_directive(animation, target_gadgets=[]):
     """ returns a SetLight directive, with a 'buttonUp' trigger, that can be added to an Alexa skill response """
-    return SetLightDirective(
+    return gadget_controller_directives.SetLightDirective(
         version=1,
         target_gadgets=target_gadgets,
-        parameters=SetLightParameters(
-            trigger_event=TriggerEventType.buttonUp,
+        parameters=gadget_controller.SetLightParameters(
+            trigger_event=gadget_controller.TriggerEventType.buttonUp,
             trigger_event_time_ms=0,
             animations=[animation]
         )
@@ -51,12 +62,74 @@ def button_up_animation_directive(animation, target_gadgets=[]):
 
 def button_down_animation_directive(animation, target_gadgets=[]):
     """ returns a SetLight directive, with a 'buttonDown' trigger, that can be added to an Alexa skill response """
-    return SetLightDirective(
+    return gadget_controller_directives.SetLightDirective(
         version=1,
         target_gadgets=target_gadgets,
-        parameters=SetLightParameters(
-            trigger_event=TriggerEventType.buttonDown,
+        parameters=gadget_controller.SetLightParameters(
+            trigger_event=gadget_controller.TriggerEventType.buttonDown,
             trigger_event_time_ms=0,
             animations=[animation]
         )
     )
+
+
+@functools.lru_cache(maxsize=DIRECTIVE_CACHE_SIZE)
+def serialized_animation_directive(trigger_event, animation_spec, limit=light_shows.MAX_STEPS):
+    """ returns the serialized SetLight directive for a trigger event name and an animation spec, without
+    target gadgets, with the animation fitted to the limit on steps. The result is shared, so it must not
+    be modified. """
+    directive = serializer.serialize(gadget_controller_directives.SetLightDirective(
+        version=1,
+        target_gadgets=[],
+        parameters=gadget_controller.SetLightParameters(
+            trigger_event=gadget_controller.TriggerEventType(trigger_event),
+            trigger_event_time_ms=0,
+            animations=[]
+        )
+    ))
+    directive["parameters"]["animations"] = light_shows.fit_directive_animations(
+        [animations.serialized_animation(animation_spec)], limit)
+    return directive
+
+
+def cached_animation_directive(trigger_event, animation_spec, target_gadgets=[]):
+    """ returns a serialized SetLight directive, built once per trigger event name and animation spec,
+    with the target gadgets spliced in """
+    target_gadgets = list(target_gadgets)
+    # the SDK enums aren't hashable, so the cache is keyed on the trigger event name
+    directive = serialized_animation_directive(trigger_event, animation_spec)
+    # every target gadget takes steps from the directive, so the animation is fitted again when
+    # there are too many of them for its steps
+    limit = light_shows.max_steps(len(target_gadgets))
+    if limit < 1:
+        raise ValueError("A SetLight directive can target at most {0} gadgets, not {1}".format(
+            light_shows.MAX_TARGET_GADGETS, len(target_gadgets)))
+    if light_shows.directive_steps(directive) > limit:
+        directive = serialized_animation_directive(trigger_event, animation_spec, limit)
+    directive = SerializedDirective(directive)
+    directive["targetGadgets"] = target_gadgets
+    return directive
+
+
+def cached_button_idle_animation_directive(animation_spec, target_gadgets=[]):
+    """ cached equivalent of button_idle_animation_directive, taking an animation spec """
+    return cached_animation_directive("none", animation_spec, target_gadgets)
+
+
+def cached_button_up_animation_directive(animation_spec, target_gadgets=[]):
+    """ cached equivalent of button_up_animation_directive, taking an animation spec """
+    return cached_animation_directive("buttonUp", animation_spec, target_gadgets)
+
+
+def cached_button_down_animation_directive(animation_spec, target_gadgets=[]):
+    """ cached equivalent of button_down_animation_directive, taking an animation spec """
+    return cached_animation_directive("buttonDown", animation_spec, target_gadgets)
+
+
+def cache_info():
+    """ returns the hit, miss and size counters of the animation and directive caches """
+    return {
+        "animations": animations.serialized_animation.cache_info()._asdict(),
+        "directives": serialized_animation_directive.cache_info()._asdict()
+    }
+
@@ -0,0 +1,104 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import functools
+import logging
+import os
+
+from ask_sdk_core.__version__ import __version__
+from ask_sdk_core.utils import RESPONSE_FORMAT_VERSION, user_agent_info
+from ask_sdk_runtime.utils import UserAgentManager
+
+from . import game, gadgets, prompts, session_codec, settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Button presses during play are by far the most frequent requests, and their responses
+# only ever hold a fixed bit of speech. They are answered here, straight from the event,
+# without deserializing the envelope into SDK models or serializing a Response model.
+# Anything else, or anything unusual about a button press, goes through the SDK.
+# Set FAST_PATH=off on the Lambda function to send every request through the SDK.
+FAST_PATH = os.environ.get("FAST_PATH", "on") != "off"
+
+# the same user agent the SDK reports in its responses
+UserAgentManager.register_component(user_agent_info(sdk_version=__version__))
+
+
+# Number of button presses kept with their speech; keyed by button number and shipped locale, so it
+# only fills up with more buttons or locales than a skill has
+MAX_SPEECHES = 256
+
+
+@functools.lru_cache(maxsize=MAX_SPEECHES)
+def button_pressed_output_speech(button_number, locale):
+    # type: (int, str) -> str
+    """ SSML for a button press, joined and wrapped the way the response interceptor and the SDK's speak() do it """
+    speech = " ".join(game.button_pressed_speech(button_number, locale)).strip()
+    return "<speak>" + speech + "</speak>"
+
+
+def respond(event):
+    # type: (Dict[str, object]) -> Dict[str, object]
+    """ returns the response envelope for a plain button press during play, or None if the SDK should handle the request """
+    request = event.get("request") or {}
+    if request.get("type") != "GameEngine.InputHandlerEvent":
+        return None
+    events = request.get("events") or []
+    if len(events) != 1 or events[0].get("name") != "button_down_event":
+        return None
+    input_events = events[0].get("inputEvents") or []
+    session = event.get("session") or {}
+    if not input_events or not session.get("attributes"):
+        return None
+
+    session_attributes = session_codec.codec.decode(dict(session["attributes"]))
+    if session_attributes.get("state") != settings.SKILL_STATES["PLAY_MODE"]:
+        return None
+    if ("current_input_handler_id" not in session_attributes
+            or request.get("originatingRequestId") != session_attributes["current_input_handler_id"]):
+        # stale events are rejected by util/stale_events.py, or game_engine_input_handler
+        return None
+
+    registry = gadgets.GadgetRegistry.from_session(session_attributes)
+    button_number = registry.button_number(input_events[0].get("gadgetId"))
+    logger.info("fast_path.respond: button " + str(button_number) + " pressed")
+
+    return {
+        "version": RESPONSE_FORMAT_VERSION,
+        "sessionAttributes": session_codec.codec.encode(session_attributes),
+        "userAgent": UserAgentManager.get_user_agent(),
+        "response": {
+            "outputSpeech": {
+                "type": "SSML",
+                "ssml": button_pressed_output_speech(button_number, prompts.locale_of(request.get("locale")))
+            }
+        }
+    }
+
+
+def lambda_handler(sdk_handler):
+    # type: (Callable) -> Callable
+    """ wraps the SDK's Lambda handler so that plain button presses take the fast path """
+    if not FAST_PATH:
+        return sdk_handler
+
+    def wrapper(event, context):
+        try:
+            response = respond(event)
+        except Exception:
+            # unexpected events or session attributes; the SDK answers, with the skill's error handler if it must
+            logger.warning("fast_path.respond failed, handing the request to the SDK", exc_info=True)
+            response = None
+        return response or sdk_handler(event, context)
+    return wrapper
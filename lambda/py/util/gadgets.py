@@ -0,0 +1,80 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+
+# Session attribute holding the registered gadget IDs, in the order they checked in
+SESSION_KEY = "gadget_ids"
+# Older sessions kept a "device_ids" list whose first entry was a placeholder
+LEGACY_SESSION_KEY = "device_ids"
+
+
+class GadgetRegistry(object):
+    """ The buttons registered during roll call. Buttons are numbered from 1, in check-in order.
+
+    Only the ordered list of gadget IDs is kept in the session attributes; the lookup from
+    gadget ID to button number is built from it the first time it is needed in a request. """
+
+    def __init__(self, gadget_ids):
+        # this is the list stored in the session attributes, so registrations are saved as they happen
+        self.gadget_ids = gadget_ids
+        self._numbers = None
+
+    @classmethod
+    def from_session(cls, session_attributes):
+        gadget_ids = session_attributes.get(SESSION_KEY)
+        if gadget_ids is None:
+            gadget_ids = list(session_attributes.pop(LEGACY_SESSION_KEY, [None])[1:])
+            session_attributes[SESSION_KEY] = gadget_ids
+        return cls(gadget_ids)
+
+    def _number_index(self):
+        if self._numbers is None:
+            self._numbers = {gadget_id: number for number, gadget_id in enumerate(self.gadget_ids, 1)}
+        return self._numbers
+
+    def register(self, gadget_id):
+        # type: (str) -> int
+        """ registers a gadget, if it isn't already, and returns its button number """
+        numbers = self._number_index()
+        if gadget_id not in numbers:
+            self.gadget_ids.append(gadget_id)
+            numbers[gadget_id] = len(self.gadget_ids)
+        return numbers[gadget_id]
+
+    def button_number(self, gadget_id):
+        # type: (str) -> int
+        """ returns the button number of a registered gadget, or None """
+        return self._number_index().get(gadget_id)
+
+    def clear(self):
+        del self.gadget_ids[:]
+        self._numbers = None
+
+    def __contains__(self, gadget_id):
+        return gadget_id in self._number_index()
+
+    def __len__(self):
+        return len(self.gadget_ids)
+
+    def __iter__(self):
+        return iter(self.gadget_ids)
+
+
+def registry(handler_input):
+    # type: (HandlerInput) -> GadgetRegistry
+    """ returns the gadget registry of the current session, created once per request """
+    ctx = handler_input.attributes_manager.request_attributes
+    if "gadget_registry" not in ctx:
+        ctx["gadget_registry"] = GadgetRegistry.from_session(
+            handler_input.attributes_manager.session_attributes)
+    return ctx["gadget_registry"]
@@ -11,46 +11,48 @@
     or implied. See the License for the specific language governing
     permissions and limitations under the License.
 """
+import functools
 import logging
-from ask_sdk_model.services.game_engine import (
-    Event, EventReportingType, PatternRecognizer, PatternRecognizerAnchorType,
-    Pattern, InputEventActionType, InputEvent
-)
-from ask_sdk_model.interfaces.game_engine import StartInputHandlerDirective
-from . import animations, directives
-from . import animations, directives, settings
-Colors = animations.Colors
+from . import directives, gadgets, persistence, prompts, settings, timeouts
+from .models import game_engine, game_engine_directives
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+
 # Define a recognizer for button down events that will match when any button is pressed down.
 # We'll use this recognizer as trigger source for the "button_down_event" during play
 # see: https://developer.amazon.com/docs/echo-button-skills/define-echo-button-events.html#recognizers
-button_down_recognizer = {
-    "button_down_recognizer": PatternRecognizer(
-        anchor=PatternRecognizerAnchorType.end,
-        fuzzy=False,
-        pattern=[{"action": InputEventActionType.down}]
-    )
-}
+@functools.lru_cache(maxsize=None)
+def button_down_recognizer():
+    return {
+        "button_down_recognizer": game_engine.PatternRecognizer(
+            anchor=game_engine.PatternRecognizerAnchorType.end,
+            fuzzy=False,
+            pattern=[{"action": game_engine.InputEventActionType.down}]
+        )
+    }
+
 
 # Define named events based on the DIRECT_BUTTON_DOWN_RECOGNIZER and the built-in "timed out" recognizer
 # to report back to the skill when either of the two buttons in play was pressed and eventually when the
 # input handler times out
 # see: https://developer.amazon.com/docs/echo-button-skills/define-echo-button-events.html#define
-game_events = {
-    "button_down_event": Event(
-        meets=["button_down_recognizer"],
-        reports=EventReportingType.matches,
-        should_end_input_handler=False
-    ),
-    "timeout": Event(
-        meets=["timed out"],
-        reports=EventReportingType.history,
-        should_end_input_handler=True
-    )
-}
+@functools.lru_cache(maxsize=None)
+def game_events():
+    return {
+        "button_down_event": game_engine.Event(
+            meets=["button_down_recognizer"],
+            reports=game_engine.EventReportingType.matches,
+            should_end_input_handler=False
+        ),
+        "timeout": game_engine.Event(
+            meets=["timed out"],
+            reports=game_engine.EventReportingType.history,
+            should_end_input_handler=True
+        )
+    }
+
 
 # PLAY_MODE Handlers
 # set up handlers for events that are specific to the Play mode
@@ -71,53 +73,47 @@ def color_intent_handler(handler_input):
         user_color = slots["color"].value
     logger.info("User selected color: " + str(user_color))
 
-    if user_color != None and user_color in settings.COLORS_ALLOWED:
+    record = settings.PALETTE.lookup(user_color)
+    if record is not None:
+        user_color = record.name
         session_attributes["user_color"] = user_color
+        persistence.remember(handler_input, user_color=user_color)
 
         # Build Start Input Handler Directive
         ctx["directives"].append(
-            StartInputHandlerDirective(
-                timeout=30000,
+            game_engine_directives.StartInputHandlerDirective(
+                timeout=timeouts.PLAY_TIMEOUT,
                 proxies=None,
-                recognizers=button_down_recognizer,
-                events=game_events
+                recognizers=button_down_recognizer(),
+                events=game_events()
             )
         )
 
         # Save Input Handler Request ID
         session_attributes["current_input_handler_id"] = request_envelope.request.request_id
 
-        device_ids = session_attributes["device_ids"][1:]
-
-        # Build 'idle' breathing animation, based on the users color of choice, that will play immediately
-        color = Colors.get_color(user_color)
-        logger.info("Derived color is: " + str(color))
-        animation_color = settings.BREATH_COLORS.get(color)
-        ctx["directives"].append(directives.button_idle_animation_directive(
-            animations.breathe_animation(30, animation_color, 450), device_ids))
-
-        # Build 'button down' animation, based on the users color of choice, for when the button is pressed
-        ctx["directives"].append(directives.button_down_animation_directive(
-            animations.solid_animation(1, color, 2000), device_ids))
-
-        # build 'button up' animation, based on the users color of choice, for when the button is released
-        ctx["directives"].append(directives.button_up_animation_directive(
-            animations.solid_animation(1, color, 200), device_ids))
-
-        ctx["output_speech"] = ["Ok. " + user_color + " it is."]
-        ctx["output_speech"].append(
-            "When you press a button, it will now turn " + user_color + ".")
-        ctx["output_speech"].append(
-            "Pressing the button will also interrupt me if I'm speaking")
-        ctx["output_speech"].append(
-            "or playing music. I'll keep talking so you can interrupt me.")
-        ctx["output_speech"].append("Go ahead and try it.")
-        ctx["output_speech"].append(settings.WAITING_AUDIO)
+        device_ids = gadgets.registry(handler_input).gadget_ids
+
+        # The animations for the users color of choice come with its palette record
+        logger.info("Derived color is: " + str(record.color))
+        # 'idle' breathing animation, that will play immediately
+        ctx["directives"].append(directives.cached_button_idle_animation_directive(
+            record.idle_animation, device_ids))
+
+        # 'button down' animation, for when the button is pressed
+        ctx["directives"].append(directives.cached_button_down_animation_directive(
+            record.button_down_animation, device_ids))
+
+        # 'button up' animation, for when the button is released
+        ctx["directives"].append(directives.cached_button_up_animation_directive(
+            record.button_up_animation, device_ids))
+
+        ctx["output_speech"] = prompts.render(handler_input, "COLOR_PICKED", color=user_color)
 
         ctx["open_microphone"] = True
     else:
-        ctx["reprompt"] = ["What color was that? Please pick a valid color!"]
-        ctx["output_speech"] = ["Sorry, I didn't get that. " + ctx["reprompt"][0]]
+        ctx["reprompt"] = prompts.render(handler_input, "INVALID_COLOR_REPROMPT")
+        ctx["output_speech"] = prompts.render(handler_input, "INVALID_COLOR")
         ctx["open_microphone"] = True
 
     return handler_input.response_builder.response
@@ -130,21 +126,18 @@ def handle_timeout(handler_input):
     ctx = handler_input.attributes_manager.request_attributes
     session_attributes = handler_input.attributes_manager.session_attributes
 
-    ctx["output_speech"] = ["The input handler has timed out."]
-    ctx["output_speech"].append(
-        "That concludes our test, would you like to quit?")
-    ctx["reprompt"] = ["Would you like to exit?"]
-    ctx["reprompt"].append("Say Yes to exit, or No to keep going")
+    ctx["output_speech"] = prompts.render(handler_input, "PLAY_TIMEOUT")
+    ctx["reprompt"] = prompts.render(handler_input, "PLAY_TIMEOUT_REPROMPT")
 
-    user_color = session_attributes["user_color"]
-    color = Colors.get_color(user_color)
-    device_ids = session_attributes["device_ids"][1:]
+    # a session resumed with remembered buttons is in play mode before the user picks a color
+    record = settings.PALETTE.lookup(session_attributes.get("user_color"), settings.PALETTE.off)
+    device_ids = gadgets.registry(handler_input).gadget_ids
 
-    ctx["directives"].append(directives.button_idle_animation_directive(
-        animations.fade_out_animation(1, color, 2000), device_ids))
-    ctx["directives"].append(directives.button_down_animation_directive(
+    ctx["directives"].append(directives.cached_button_idle_animation_directive(
+        record.fade_out_animation, device_ids))
+    ctx["directives"].append(directives.cached_button_down_animation_directive(
         settings.DEFAULT_ANIMATION_BUTTON_DOWN, device_ids))
-    ctx["directives"].append(directives.button_up_animation_directive(
+    ctx["directives"].append(directives.cached_button_up_animation_directive(
         settings.DEFAULT_ANIMATION_BUTTON_UP, device_ids))
 
     session_attributes["expecting_end_skill_confirmation"] = True
@@ -159,21 +152,20 @@ def handle_button_pressed(handler_input):
     logger.info("game.handle_button_pressed: handling request")
 
     ctx = handler_input.attributes_manager.request_attributes
-    session_attributes = handler_input.attributes_manager.session_attributes
 
-    device_ids = session_attributes["device_ids"]
     game_inputs = ctx["game_input_events"]
     button_id = game_inputs[0].gadget_id
+    button_number = gadgets.registry(handler_input).button_number(button_id)
 
-    if button_id in device_ids:
-        button_index = device_ids.index(button_id)
-        ctx["output_speech"] = ["Button " + str(button_index) + ". "]
-        ctx["output_speech"].append(settings.WAITING_AUDIO)
-    else:
-        ctx["output_speech"] = ["Unregistered button"]
-        ctx["output_speech"].append(
-            "Only buttons registered during roll call are in play.")
-        ctx["output_speech"].append(settings.WAITING_AUDIO)
+    ctx["output_speech"] = button_pressed_speech(button_number, handler_input.request_envelope.request.locale)
 
     ctx["open_microphone"] = False
     return handler_input.response_builder.response
+
+
+def button_pressed_speech(button_number, locale):
+    # type: (int, str) -> List[str]
+    """ speech for a button press; also used by util/fast_path.py, so keep the two in step """
+    if button_number is not None:
+        return prompts.catalog(locale)["BUTTON_PRESSED"].render(number=button_number)
+    return prompts.catalog(locale)["UNREGISTERED_BUTTON"].render()
@@ -0,0 +1,394 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Hosts the skill as an HTTP service, behind a load balancer, instead of on Lambda.
+
+    Usage, from lambda/py: python -m util.http_server [--host HOST] [--port PORT] [--workers N] [--preload]
+"""
+import argparse
+import json
+import logging
+import os
+import select
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# The master process opens the listening socket and forks --workers processes that accept
+# connections from it, each answering its connections on threads of its own, so that keep-alive
+# connections from the load balancer don't wait for each other. Each worker imports the skill, so
+# a reload picks up new code, unless --preload imports it once in the master before forking.
+# SIGHUP reloads: new workers are started and, once they are serving, the old ones stop accepting
+# connections, finish the requests they have and exit; if some new worker doesn't start serving, the
+# new ones are stopped instead and the old ones keep serving. SIGTERM and SIGINT stop the same way.
+# Workers that die are replaced, less and less often while they keep dying.
+# Alexa requires skills hosted as a web service to verify the signature and timestamp of every
+# request; that is left to the load balancer in front of this server.
+
+# Seconds an idle keep-alive connection is kept open
+KEEP_ALIVE_TIMEOUT = float(os.environ.get("HTTP_KEEP_ALIVE_TIMEOUT", "5"))
+# Seconds a stopping worker gets to finish its requests before it is killed
+GRACEFUL_TIMEOUT = float(os.environ.get("HTTP_GRACEFUL_TIMEOUT", "30"))
+# Seconds before workers that keep dying are replaced again; doubled each time, up to the maximum,
+# and reset once no worker has died for that long
+RESPAWN_DELAY = float(os.environ.get("HTTP_RESPAWN_DELAY", "0.5"))
+MAX_RESPAWN_DELAY = float(os.environ.get("HTTP_MAX_RESPAWN_DELAY", "30"))
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = int(os.environ.get("HTTP_MAX_BODY_SIZE", str(1024 * 1024)))
+
+LISTEN_BACKLOG = 1024
+# the path load balancers check the health of a worker on
+HEALTH_CHECK_PATH = "/ping"
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super(BadRequest, self).__init__(message)
+        self.status = status
+
+
+class SkillRequestHandler(BaseHTTPRequestHandler):
+    """ Answers POSTed request envelopes with the skill's Lambda handler, over keep-alive connections """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "ColorChanger"
+    timeout = KEEP_ALIVE_TIMEOUT
+    # the headers and the body of a response are separate writes, which Nagle's algorithm would hold
+    # back until the load balancer's delayed ACK
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connection_opened()
+
+    def finish(self):
+        try:
+            BaseHTTPRequestHandler.finish(self)
+        finally:
+            self.server.connection_closed()
+
+    def read_body(self):
+        # type: () -> bytes
+        """ the request body, read straight off the connection, by Content-Length or chunk by chunk """
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            size = 0
+            while True:
+                chunk_size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if chunk_size == 0:
+                    # the empty line after the last chunk, and any trailers
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(chunks)
+                size += chunk_size
+                if size > MAX_BODY_SIZE:
+                    raise BadRequest(413, "Request body too large")
+                chunks.append(self.rfile.read(chunk_size))
+                self.rfile.readline()
+        length = self.headers.get("Content-Length")
+        if length is None:
+            raise BadRequest(411, "Content-Length required")
+        if int(length) > MAX_BODY_SIZE:
+            raise BadRequest(413, "Request body too large")
+        return self.rfile.read(int(length))
+
+    def send_body(self, status, body, content_type="application/json;charset=UTF-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if self.server.draining:
+            # so that the load balancer opens its next connection to a worker that isn't stopping
+            self.close_connection = True
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        try:
+            try:
+                event = json.loads(self.read_body().decode("utf-8"))
+            except ValueError:
+                raise BadRequest(400, "Request body is not a JSON request envelope")
+            if not isinstance(event, dict):
+                raise BadRequest(400, "Request body is not a JSON request envelope")
+        except BadRequest as error:
+            # the rest of the request may still be on the connection
+            self.close_connection = True
+            self.send_body(error.status, json.dumps({"message": str(error)}).encode("utf-8"))
+            return
+
+        try:
+            response = self.server.lambda_handler(event, None)
+        except Exception:
+            logger.exception("The skill failed to answer the request")
+            self.send_body(500, json.dumps({"message": "Internal server error"}).encode("utf-8"))
+            return
+        self.send_body(200, json.dumps(response, separators=(",", ":")).encode("utf-8"))
+
+    def do_GET(self):
+        if self.path == HEALTH_CHECK_PATH:
+            self.send_body(503 if self.server.draining else 200, b"ok", "text/plain")
+        else:
+            self.send_body(404, json.dumps({"message": "Not found"}).encode("utf-8"))
+
+    def log_message(self, format, *args):
+        logger.debug("%s - " + format, self.address_string(), *args)
+
+
+class WorkerServer(socketserver.ThreadingMixIn, HTTPServer):
+    """ One worker: accepts connections from the listening socket it inherited, one thread each """
+
+    daemon_threads = True
+
+    def __init__(self, listener, lambda_handler):
+        HTTPServer.__init__(self, listener.getsockname()[:2], SkillRequestHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = listener
+        self.server_name = socket.gethostname()
+        self.server_port = listener.getsockname()[1]
+        self.lambda_handler = lambda_handler
+        self.draining = False
+        self.connections = 0
+        self.connections_lock = threading.Lock()
+
+    def connection_opened(self):
+        with self.connections_lock:
+            self.connections += 1
+
+    def connection_closed(self):
+        with self.connections_lock:
+            self.connections -= 1
+
+    def drain(self):
+        """ stops accepting connections, and waits for the open ones to be answered and closed """
+        self.draining = True
+        self.shutdown()
+        deadline = time.time() + GRACEFUL_TIMEOUT
+        while self.connections > 0 and time.time() < deadline:
+            time.sleep(0.05)
+
+
+def load_handler():
+    import color_changer
+    return color_changer.handler
+
+
+def flush_persistence():
+    """ writes the saves the skill's persistence adapter holds back, which os._exit would skip along
+    with the adapter's atexit flush """
+    persistence = sys.modules.get("util.persistence")
+    if persistence is not None and persistence.adapter is not None:
+        persistence.adapter.flush()
+
+
+def run_worker(listener, lambda_handler, ready):
+    # type: (socket.socket, Callable, int) -> None
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server = WorkerServer(listener, lambda_handler or load_handler())
+    stopped = threading.Event()
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever, so it can't be called from the thread running it
+        thread = threading.Thread(target=lambda: (server.drain(), stopped.set()))
+        thread.daemon = True
+        thread.start()
+    signal.signal(signal.SIGTERM, stop)
+
+    logger.info("Worker " + str(os.getpid()) + " serving")
+    os.write(ready, b".")
+    server.serve_forever(poll_interval=0.5)
+    stopped.wait(GRACEFUL_TIMEOUT + 1)
+    logger.info("Worker " + str(os.getpid()) + " stopped")
+
+
+class Master(object):
+    """ Keeps --workers worker processes running on the listening socket, and reloads or stops them """
+
+    def __init__(self, listener, workers, lambda_handler=None):
+        self.listener = listener
+        self.workers = workers
+        self.lambda_handler = lambda_handler
+        # pid -> generation, or None for the workers of a reload that failed
+        self.children = {}
+        self.generation = 0
+        self.respawn_delay = 0.0
+        self.respawned_at = 0.0
+        self.reloading = False
+        self.stopping = False
+        # each worker writes a byte to it once it is serving
+        self.ready, self.ready_write = os.pipe()
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                run_worker(self.listener, self.lambda_handler, self.ready_write)
+            except Exception:
+                logger.exception("Worker failed")
+                status = 1
+            finally:
+                try:
+                    flush_persistence()
+                except Exception:
+                    logger.exception("Could not write persistent attributes")
+                    status = 1
+                logging.shutdown()
+                os._exit(status)
+        self.children[pid] = self.generation
+        return pid
+
+    def signal_workers(self, pids, signum):
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                pass
+
+    def reap(self):
+        """ forgets the workers that exited """
+        while self.children:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except OSError:
+                break
+            if pid == 0:
+                break
+            self.children.pop(pid, None)
+
+    def wait_ready(self, pids, timeout):
+        """ waits for the workers of pids to be serving; returns how many weren't in time, or exited before """
+        count = len(pids)
+        deadline = time.time() + timeout
+        while count > 0:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([self.ready], [], [], min(remaining, 0.1))
+            if readable:
+                count -= len(os.read(self.ready, count))
+                continue
+            self.reap()
+            if sum(1 for pid in pids if pid in self.children) < count:
+                # one that wasn't serving yet exited, say on an import error
+                break
+        return count
+
+    def reload(self):
+        old = list(self.children)
+        self.generation += 1
+        logger.info("Reloading: starting " + str(self.workers) + " workers, then stopping " + str(len(old)))
+        # forgets the workers that were ready before
+        while select.select([self.ready], [], [], 0)[0]:
+            os.read(self.ready, 4096)
+        new = [self.spawn() for _ in range(self.workers)]
+        missing = self.wait_ready(new, GRACEFUL_TIMEOUT)
+        if missing:
+            logger.error(str(missing) + " of " + str(self.workers) +
+                         " new workers didn't start serving; keeping the old ones")
+            for pid in new:
+                if pid in self.children:
+                    self.children[pid] = None
+            self.signal_workers(new, signal.SIGTERM)
+            self.generation -= 1
+            return
+        self.signal_workers(old, signal.SIGTERM)
+
+    def replace_exited(self, now):
+        # type: (float) -> int
+        """ starts workers in place of those of the current generation that exited, unless they keep
+        exiting and the backoff hasn't passed yet; returns how many it started """
+        missing = self.workers - sum(1 for generation in self.children.values() if generation == self.generation)
+        if missing <= 0:
+            if self.respawn_delay and now - self.respawned_at >= MAX_RESPAWN_DELAY:
+                self.respawn_delay = 0.0
+            return 0
+        if now < self.respawned_at + self.respawn_delay:
+            return 0
+        logger.warning("Replacing " + str(missing) + " workers that exited")
+        for _ in range(missing):
+            self.spawn()
+        self.respawn_delay = min(self.respawn_delay * 2, MAX_RESPAWN_DELAY) if self.respawn_delay else RESPAWN_DELAY
+        self.respawned_at = now
+        return missing
+
+    def stop(self):
+        logger.info("Stopping " + str(len(self.children)) + " workers")
+        self.signal_workers(list(self.children), signal.SIGTERM)
+        deadline = time.time() + GRACEFUL_TIMEOUT + 1
+        while self.children and time.time() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        self.signal_workers(list(self.children), signal.SIGKILL)
+        self.reap()
+
+    def run(self):
+        def on_reload(signum, frame):
+            self.reloading = True
+
+        def on_stop(signum, frame):
+            self.stopping = True
+        signal.signal(signal.SIGHUP, on_reload)
+        signal.signal(signal.SIGTERM, on_stop)
+        signal.signal(signal.SIGINT, on_stop)
+
+        for _ in range(self.workers):
+            self.spawn()
+        while not self.stopping:
+            if self.reloading:
+                self.reloading = False
+                self.reload()
+            self.reap()
+            self.replace_exited(time.time())
+            time.sleep(0.1)
+        self.stop()
+
+
+def listen(host, port):
+    # type: (str, int) -> socket.socket
+    listener = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(LISTEN_BACKLOG)
+    return listener
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hosts the color changer skill as an HTTP service")
+    parser.add_argument("--host", default=os.environ.get("HTTP_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("HTTP_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("HTTP_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--preload", action="store_true",
+                        help="import the skill once, before forking the workers; reloads then keep the old code")
+    parser.add_argument("--log-level", default=os.environ.get("HTTP_LOG_LEVEL", "INFO"))
+    args = parser.parse_args()
+
+    logging.basicConfig(stream=sys.stderr, format="%(asctime)s %(process)d %(name)s %(levelname)s %(message)s")
+    logging.getLogger().handlers[0].setLevel(args.log_level.upper())
+
+    listener = listen(args.host, args.port)
+    logger.info("Listening on " + args.host + ":" + str(listener.getsockname()[1]) +
+                " with " + str(args.workers) + " workers")
+    Master(listener, args.workers, load_handler() if args.preload else None).run()
+
+
+if __name__ == "__main__":
+    main()
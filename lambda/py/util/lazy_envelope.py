@@ -0,0 +1,148 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import json
+import os
+
+from ask_sdk_model import Context, Request, RequestEnvelope, Session
+
+# the Game Engine models are loaded with the first input handler event, not on import
+from .models import game_engine
+
+# The SDK dumps every event back to JSON and builds a model for each part of it before the skill
+# runs, which for an input handler event reporting its whole history means one InputEvent per
+# button press, most of which no handler reads. For input handler events the envelope is built
+# here instead: the session and the routing fields of the request up front, the context and the
+# input events of each event only when a handler touches them.
+# Roll call timeouts gain nothing: timeouts.observe reads every input event of their history, to
+# learn the user's pace, so all of them are deserialized anyway, only later.
+# Set LAZY_ENVELOPE=off on the Lambda function to let the SDK deserialize every envelope.
+LAZY_ENVELOPE = os.environ.get("LAZY_ENVELOPE", "on") != "off"
+
+INPUT_HANDLER_EVENT = "GameEngine.InputHandlerEvent"
+
+
+class LazyModelList(list):
+    """ A list of models kept in their serialized form until each item is read """
+
+    def __init__(self, items, obj_type, serializer):
+        super(LazyModelList, self).__init__(items)
+        self.obj_type = obj_type
+        self.serializer = serializer
+
+    def _model(self, index):
+        item = list.__getitem__(self, index)
+        if isinstance(item, dict):
+            item = self.serializer.deserialize(payload=json.dumps(item), obj_type=self.obj_type)
+            list.__setitem__(self, index, item)
+        return item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._model(position) for position in range(*index.indices(len(self)))]
+        return self._model(index)
+
+    def _models(self):
+        """ deserializes every item still in its serialized form, at once """
+        pending = [index for index in range(len(self)) if isinstance(list.__getitem__(self, index), dict)]
+        if pending:
+            models = self.serializer.deserialize(
+                payload=json.dumps([list.__getitem__(self, index) for index in pending]),
+                obj_type="list[{0}.{1}]".format(self.obj_type.__module__, self.obj_type.__name__))
+            for index, model in zip(pending, models):
+                list.__setitem__(self, index, model)
+
+    def __iter__(self):
+        self._models()
+        return list.__iter__(self)
+
+    def __reversed__(self):
+        self._models()
+        return list.__reversed__(self)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def _models_first(method):
+    def read(self, *args, **kwargs):
+        self._models()
+        return method(self, *args, **kwargs)
+    read.__name__ = method.__name__
+    read.__doc__ = method.__doc__
+    return read
+
+
+# the list methods that read items, or hand them out, see the models rather than their serialized form
+for _name in ("__contains__", "__add__", "__mul__", "__rmul__", "__repr__", "__lt__", "__le__", "__gt__", "__ge__",
+              "__reduce_ex__", "copy", "count", "index", "pop", "remove", "sort"):
+    setattr(LazyModelList, _name, _models_first(getattr(list, _name)))
+
+
+class LazyRequestEnvelope(RequestEnvelope):
+    """ A request envelope whose context is deserialized the first time it is read """
+
+    def __init__(self, serializer, version=None, session=None, context=None, request=None):
+        self._serializer = serializer
+        self._serialized_context = context
+        super(LazyRequestEnvelope, self).__init__(version=version, session=session, request=request)
+
+    @property
+    def context(self):
+        if self._context is None and self._serialized_context is not None:
+            self._context = self._serializer.deserialize(
+                payload=json.dumps(self._serialized_context), obj_type=Context)
+            self._serialized_context = None
+        return self._context
+
+    @context.setter
+    def context(self, context):
+        self._context = context
+
+    def __eq__(self, other):
+        if not isinstance(other, RequestEnvelope):
+            return False
+        return all(getattr(self, name) == getattr(other, name) for name in self.deserialized_types)
+
+
+def deserialize(serializer, event):
+    # type: (Serializer, Dict[str, object]) -> RequestEnvelope
+    """ builds the request envelope of a Lambda event, as the SDK would """
+    request = event.get("request") or {}
+    if request.get("type") != INPUT_HANDLER_EVENT:
+        return serializer.deserialize(payload=json.dumps(event), obj_type=RequestEnvelope)
+
+    session = event.get("session")
+    input_handler_event_request = serializer.deserialize(payload=json.dumps(
+        dict((key, value) for key, value in request.items() if key != "events")), obj_type=Request)
+    if request.get("events") is not None:
+        input_handler_event_request.events = [
+            game_engine.InputHandlerEvent(
+                name=evt.get("name"), input_events=None if evt.get("inputEvents") is None
+                else LazyModelList(evt["inputEvents"], game_engine.InputEvent, serializer))
+            for evt in request["events"]]
+    return LazyRequestEnvelope(
+        serializer,
+        version=event.get("version"),
+        session=None if session is None else serializer.deserialize(payload=json.dumps(session), obj_type=Session),
+        context=event.get("context"),
+        request=input_handler_event_request)
+
+
+def deserializer():
+    # type: () -> Callable
+    """ the deserialization step for metrics.sdk_lambda_handler, or None to use the SDK's """
+    return deserialize if LAZY_ENVELOPE else None
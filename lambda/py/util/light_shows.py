@@ -0,0 +1,171 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+
+    Procedural light shows: gradients and rainbows computed step by step, then fitted
+    to what an Echo Button accepts. The builders return animations in their serialized
+    form, and take hashable arguments, so they can be used in animation specs, e.g.
+    (light_shows.rainbow_animation, 1, 6000, 120) in place of (animations.breathe_animation, ...).
+"""
+import colorsys
+from enum import Enum
+
+# Echo Button limits, see:
+# https://developer.amazon.com/docs/gadget-skills/gadgetcontroller-interface-reference.html#setlight-directive
+# A SetLight directive holds at most 38 steps, less 3 for every gadget it targets.
+MAX_STEPS = 38
+STEPS_PER_TARGET_GADGET = 3
+# the most gadgets a directive can target and still hold a step
+MAX_TARGET_GADGETS = (MAX_STEPS - 1) // STEPS_PER_TARGET_GADGET
+MAX_STEP_DURATION_MS = 65535
+MAX_REPEAT = 255
+
+_HEX = ["{0:02x}".format(value) for value in range(256)]
+
+
+def max_steps(target_gadget_count=0):
+    """ the number of steps a SetLight directive targeting that many gadgets can hold, 0 if it targets
+    too many to hold any """
+    if target_gadget_count < 0:
+        raise ValueError("A directive targets at least 0 gadgets, not {0}".format(target_gadget_count))
+    return max(MAX_STEPS - STEPS_PER_TARGET_GADGET * target_gadget_count, 0)
+
+
+def directive_steps(directive):
+    """ the number of steps of the animations of a serialized SetLight directive """
+    return sum(len(animation["sequence"]) for animation in directive["parameters"]["animations"])
+
+
+def fit_directive_animations(animations, limit):
+    """ returns serialized animations with their steps fitted, each to an equal share of the limit """
+    share = limit // max(len(animations), 1)
+    fitted = []
+    for animation in animations:
+        if len(animation["sequence"]) > share:
+            steps = [(step["durationMs"], step["color"], step["blend"]) for step in animation["sequence"]]
+            animation = dict(animation, sequence=[{"durationMs": duration, "color": color, "blend": blend}
+                                                  for duration, color, blend in fit(steps, share)])
+        fitted.append(animation)
+    return fitted
+
+
+def _rgb(color):
+    """ (r, g, b) floats between 0 and 1, for a Colors member or a hex string """
+    value = color.value if isinstance(color, Enum) else color
+    return tuple(int(value[index:index + 2], 16) / 255.0 for index in (0, 2, 4))
+
+
+def _hex(red, green, blue):
+    return _HEX[int(red * 255 + 0.5)] + _HEX[int(green * 255 + 0.5)] + _HEX[int(blue * 255 + 0.5)]
+
+
+def _durations(total_ms, count):
+    """ splits a duration into count whole-millisecond steps of at least 1 ms that add up to it, so
+    count is at most the duration in ms """
+    if not 1 <= count <= total_ms:
+        raise ValueError("Can't split {0} ms into {1} steps of at least 1 ms".format(total_ms, count))
+    bounds = [(total_ms * index + count // 2) // count for index in range(count + 1)]
+    return [max(1, end - start) for start, end in zip(bounds, bounds[1:])]
+
+
+def interpolate(colors, steps, space="rgb"):
+    """ returns steps hex colors going evenly through the color stops, interpolated in RGB or HSV """
+    stops = [_rgb(color) for color in colors]
+    if space == "hsv":
+        stops = [colorsys.rgb_to_hsv(*stop) for stop in stops]
+    if len(stops) == 1 or steps == 1:
+        positions = [0.0] * steps
+    else:
+        scale = (len(stops) - 1) / float(steps - 1)
+        positions = [index * scale for index in range(steps)]
+
+    last = len(stops) - 2
+    segments = [min(int(position), last) for position in positions]
+    fractions = [position - segment for position, segment in zip(positions, segments)]
+    channels = [
+        [stops[segment][channel] + (stops[segment + 1][channel] - stops[segment][channel]) * fraction
+         if segment >= 0 else stops[0][channel]
+         for segment, fraction in zip(segments, fractions)]
+        for channel in range(3)
+    ]
+    if space == "hsv":
+        return [_hex(*colorsys.hsv_to_rgb(hue, saturation, value))
+                for hue, saturation, value in zip(*channels)]
+    return [_hex(red, green, blue) for red, green, blue in zip(*channels)]
+
+
+def compress(steps):
+    """ merges consecutive steps with the same color and blend into one longer step, and splits steps
+    longer than an Echo Button accepts """
+    compressed = []
+    for duration, color, blend in steps:
+        if compressed and compressed[-1][1] == color and compressed[-1][2] == blend:
+            duration += compressed.pop()[0]
+        while duration > MAX_STEP_DURATION_MS:
+            compressed.append((MAX_STEP_DURATION_MS, color, blend))
+            duration -= MAX_STEP_DURATION_MS
+        compressed.append((duration, color, blend))
+    return compressed
+
+
+def fit(steps, limit=MAX_STEPS):
+    """ resamples a sequence with more steps than the limit to evenly spaced steps, keeping its
+    total duration: each kept step lasts until the next one starts """
+    if len(steps) <= limit:
+        return steps
+    total = sum(step[0] for step in steps)
+    # the fewest steps the total duration can be split into
+    needed = max(-(-total // MAX_STEP_DURATION_MS), 1)
+    if needed > limit:
+        raise ValueError("A sequence of {0} ms needs {1} steps, more than the limit of {2}".format(
+            total, needed, limit))
+    count = limit
+    while True:
+        kept = [(index * len(steps)) // count for index in range(count)] + [len(steps)]
+        fitted = compress([(sum(step[0] for step in steps[start:end]), steps[start][1], steps[start][2])
+                           for start, end in zip(kept, kept[1:])])
+        if len(fitted) <= limit:
+            return fitted
+        # splitting very long steps took us over the limit; resample to fewer steps, down to a
+        # single one, which the check above guarantees fits once split
+        count = max(count - (len(fitted) - limit), 1)
+
+
+def sequence_animation(cycles, steps, limit=MAX_STEPS):
+    """ returns the serialized animation for a sequence of (duration ms, hex color, blend) steps,
+    compressed and fitted to the step limit. The limit defaults to that of a directive without target
+    gadgets; directives.cached_animation_directive fits the animation again to the gadgets it targets. """
+    if not 0 <= cycles <= MAX_REPEAT:
+        raise ValueError("An animation repeats between 0 and {0} times, not {1}".format(MAX_REPEAT, cycles))
+    return {
+        "repeat": cycles,
+        "targetLights": ["1"],
+        "sequence": [{"durationMs": duration, "color": color, "blend": blend}
+                     for duration, color, blend in fit(compress(steps), limit)]
+    }
+
+
+def gradient_animation(cycles, colors, duration, steps=MAX_STEPS, space="rgb", limit=MAX_STEPS):
+    """ blends through the colors, a tuple of Colors members or hex strings, in as many steps """
+    # a button can't show more steps than the limit, so we don't compute them, and a step lasts at least 1 ms
+    steps = min(steps, limit, duration)
+    return sequence_animation(cycles, list(zip(
+        _durations(duration, steps), interpolate(colors, steps, space), [True] * steps)), limit)
+
+
+def rainbow_animation(cycles, duration, steps=MAX_STEPS, saturation=1.0, value=1.0, limit=MAX_STEPS):
+    """ goes once around the color wheel, from red back to red """
+    steps = min(steps, limit, duration)
+    hues = [index / float(steps) for index in range(steps)]
+    colors = [_hex(*colorsys.hsv_to_rgb(hue, saturation, value)) for hue in hues]
+    return sequence_animation(cycles, list(zip(
+        _durations(duration, steps), colors, [True] * steps)), limit)
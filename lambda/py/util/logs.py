@@ -0,0 +1,107 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import json
+import logging
+import os
+
+from ask_sdk_core.serialize import DefaultSerializer
+
+# Request and response payloads are logged on their own logger, at DEBUG level, so
+# that they can be switched on for a deployment without touching the handler logs.
+# Set PAYLOAD_LOG_LEVEL=DEBUG on the Lambda function to see them, and
+# PAYLOAD_LOG_SAMPLE_RATE to a value between 0 and 1 to only log some invocations.
+payload_logger = logging.getLogger("color_changer.payloads")
+payload_logger.setLevel(os.environ.get("PAYLOAD_LOG_LEVEL", "INFO").upper())
+
+SAMPLE_RATE = float(os.environ.get("PAYLOAD_LOG_SAMPLE_RATE", "1.0"))
+
+# Requests that arrive on every button press; we never build payload dumps for these.
+HOT_PATH_REQUEST_TYPES = frozenset(["GameEngine.InputHandlerEvent"])
+
+# Keys, in the serialized payloads and in the session attributes, that hold gadget IDs.
+# "g" holds them in the compact session attributes of the request envelope.
+REDACTED_KEYS = frozenset(["gadgetId", "targetGadgets", "gadget_ids", "device_ids", "g"])
+
+serializer = DefaultSerializer()
+
+
+def redact_gadget_id(gadget_id):
+    # type: (str) -> str
+    """ returns a short, stable stand-in for a gadget ID so log lines can still be correlated """
+    import hashlib
+    return "gadget-" + hashlib.sha1(gadget_id.encode("utf-8")).hexdigest()[:8]
+
+
+def redact(payload):
+    """ returns a copy of a serialized payload with every gadget ID replaced """
+    if isinstance(payload, dict):
+        redacted = {}
+        for key, value in payload.items():
+            if key in REDACTED_KEYS:
+                redacted[key] = _redact_value(value)
+            else:
+                redacted[key] = redact(value)
+        return redacted
+    if isinstance(payload, list):
+        return [redact(item) for item in payload]
+    return payload
+
+
+def _redact_value(value):
+    if isinstance(value, str):
+        return redact_gadget_id(value)
+    if isinstance(value, list):
+        return [_redact_value(item) for item in value]
+    return redact(value)
+
+
+class LazyJson(object):
+    """ Defers building and dumping a payload until the log record is actually formatted """
+
+    def __init__(self, build):
+        self.build = build
+
+    def __str__(self):
+        return json.dumps(redact(self.build()), separators=(",", ":"))
+
+
+def should_log_payloads(handler_input):
+    # type: (HandlerInput) -> bool
+    """ decides, once per invocation, whether the request and response payloads get logged """
+    if not payload_logger.isEnabledFor(logging.DEBUG):
+        return False
+    if handler_input.request_envelope.request.object_type in HOT_PATH_REQUEST_TYPES:
+        return False
+    if SAMPLE_RATE >= 1.0:
+        return True
+    import random
+    return random.random() < SAMPLE_RATE
+
+
+def log_request(handler_input):
+    # type: (HandlerInput) -> None
+    session_attributes = handler_input.attributes_manager.session_attributes
+    payload_logger.debug("request %s", LazyJson(
+        lambda: serializer.serialize(handler_input.request_envelope)))
+    payload_logger.debug("session_attributes %s", LazyJson(
+        lambda: session_attributes))
+
+
+def log_response(handler_input, response):
+    # type: (HandlerInput, Response) -> None
+    session_attributes = handler_input.attributes_manager.session_attributes
+    payload_logger.debug("response %s", LazyJson(
+        lambda: serializer.serialize(response)))
+    payload_logger.debug("session_attributes %s", LazyJson(
+        lambda: session_attributes))
@@ -0,0 +1,217 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Latency metrics are off unless METRICS_FLUSH_EVERY is set on the Lambda function. They are then
+# kept per stage of an invocation (interceptors, handlers, transitions, deserialization and
+# serialization of the envelope) and written to stdout every METRICS_FLUSH_EVERY invocations,
+# as one line in the CloudWatch embedded metric format.
+# When metrics are off nothing is wrapped or timed, so they cost nothing.
+METRICS_FLUSH_EVERY = int(os.environ.get("METRICS_FLUSH_EVERY", "0"))
+ENABLED = METRICS_FLUSH_EVERY > 0
+
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "ColorChanger")
+SERVICE = "color_changer"
+
+# Values are kept in buckets as wide as 1/16 of their power of two, so percentiles are
+# within about 6% of the recorded values
+SUB_BUCKET_BITS = 4
+
+# CloudWatch accepts at most this many metrics in one embedded metric format line
+MAX_METRICS_PER_LINE = 100
+
+
+class Histogram(object):
+    """ Log-linear histogram of latencies in microseconds, in the style of HdrHistogram """
+
+    __slots__ = ("counts", "count", "max")
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.max = 0
+
+    def record(self, microseconds):
+        value = int(microseconds)
+        shift = max(0, value.bit_length() - SUB_BUCKET_BITS - 1)
+        bucket = (value >> shift) << shift
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """ highest value in the bucket holding the given fraction of the recorded values """
+        rank = max(1, int(fraction * self.count + 0.999999))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                shift = max(0, bucket.bit_length() - SUB_BUCKET_BITS - 1)
+                return min(bucket + (1 << shift) - 1, self.max)
+        return self.max
+
+
+histograms = {}
+counters = {}
+invocations = [0]
+# guards the metrics above, as util/http_server.py handles requests on several threads
+_lock = threading.Lock()
+
+
+def record(stage, seconds):
+    with _lock:
+        histogram = histograms.get(stage)
+        if histogram is None:
+            histogram = histograms[stage] = Histogram()
+        histogram.record(seconds * 1e6)
+
+
+def count(name, value=1):
+    """ adds to a counter, reported as is rather than as percentiles; a no-op when metrics are off """
+    if ENABLED:
+        with _lock:
+            counters[name] = counters.get(name, 0) + value
+
+
+def timed(stage=None):
+    """ decorator timing every call of a function as a stage; a no-op when metrics are off.
+    The stage is named after the function by default. """
+    def wrapper(func):
+        if not ENABLED:
+            return func
+        name = stage or func.__name__
+
+        @functools.wraps(func)
+        def timed_func(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return timed_func
+    return wrapper
+
+
+def sdk_lambda_handler(skill_builder, deserialize=None):
+    # type: (SkillBuilder, Callable) -> Callable
+    """ the skill builder's Lambda handler, timing deserialization, the skill and serialization separately.
+    deserialize(serializer, event), if given, builds the request envelope in place of the SDK """
+    if not ENABLED and deserialize is None:
+        return skill_builder.lambda_handler()
+
+    from ask_sdk_core.skill import CustomSkill
+    from ask_sdk_model import RequestEnvelope
+
+    if deserialize is None:
+        def deserialize(serializer, event):
+            return serializer.deserialize(payload=json.dumps(event), obj_type=RequestEnvelope)
+
+    # the same steps as SkillBuilder.lambda_handler
+    def wrapper(event, context):
+        timer = time.perf_counter
+        start = timer()
+        skill = CustomSkill(skill_configuration=skill_builder.skill_configuration)
+        request_envelope = deserialize(skill.serializer, event)
+        deserialized = timer()
+        response_envelope = skill.invoke(
+            request_envelope=request_envelope, context=context)
+        invoked = timer()
+        response = skill.serializer.serialize(response_envelope)
+        if ENABLED:
+            record("deserialize", deserialized - start)
+            record("skill", invoked - deserialized)
+            record("serialize", timer() - invoked)
+        return response
+    return wrapper
+
+
+def lambda_handler(handler):
+    # type: (Callable) -> Callable
+    """ wraps the outermost Lambda handler, to time whole invocations and flush the metrics """
+    if not ENABLED:
+        return handler
+
+    def wrapper(event, context):
+        start = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            record("invocation", time.perf_counter() - start)
+            with _lock:
+                invocations[0] += 1
+                due = invocations[0] >= METRICS_FLUSH_EVERY
+            if due:
+                flush()
+    return wrapper
+
+
+def take():
+    """ returns the histograms and counters recorded since the last flush, and starts over """
+    with _lock:
+        taken = dict(histograms), dict(counters)
+        histograms.clear()
+        counters.clear()
+        invocations[0] = 0
+    return taken
+
+
+def emf_lines(recorded):
+    """ returns recorded (histograms, counters), as taken by take(), as embedded metric format documents """
+    recorded_histograms, recorded_counters = recorded
+    values = {}
+    definitions = []
+    for stage, histogram in sorted(recorded_histograms.items()):
+        for suffix, value in (("p50", histogram.percentile(0.50)),
+                              ("p99", histogram.percentile(0.99)),
+                              ("count", histogram.count)):
+            name = stage + "." + suffix
+            values[name] = value
+            definitions.append({"Name": name, "Unit": "Count" if suffix == "count" else "Microseconds"})
+    for name, value in sorted(recorded_counters.items()):
+        values[name] = value
+        definitions.append({"Name": name, "Unit": "Count"})
+
+    lines = []
+    timestamp = int(time.time() * 1000)
+    for index in range(0, len(definitions), MAX_METRICS_PER_LINE):
+        chunk = definitions[index:index + MAX_METRICS_PER_LINE]
+        document = {
+            "_aws": {
+                "Timestamp": timestamp,
+                "CloudWatchMetrics": [{
+                    "Namespace": NAMESPACE,
+                    "Dimensions": [["Service"]],
+                    "Metrics": chunk
+                }]
+            },
+            "Service": SERVICE
+        }
+        for definition in chunk:
+            document[definition["Name"]] = values[definition["Name"]]
+        lines.append(json.dumps(document, separators=(",", ":")))
+    return lines
+
+
+def flush():
+    """ writes the recorded metrics to stdout, where Lambda ships them to CloudWatch, and starts over """
+    lines = emf_lines(take())
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
@@ -0,0 +1,48 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import importlib
+import time
+
+# Seconds spent importing each lazily loaded module, in load order
+load_times = {}
+
+
+class LazyModule(object):
+    """ Stands in for a module, and imports it the first time one of its attributes is used.
+    Attributes are copied onto the stand-in as they are used, so later lookups are direct. """
+
+    def __init__(self, name):
+        self._lazy_name = name
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        start = time.perf_counter()
+        module = importlib.import_module(self._lazy_name)
+        load_times.setdefault(self._lazy_name, time.perf_counter() - start)
+        value = getattr(module, attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        return "<lazy module '{0}'>".format(self._lazy_name)
+
+
+# The Echo Button model packages are only needed once a handler builds a directive,
+# so they are loaded on first use rather than when the Lambda container starts.
+game_engine = LazyModule("ask_sdk_model.services.game_engine")
+game_engine_directives = LazyModule("ask_sdk_model.interfaces.game_engine")
+gadget_controller = LazyModule("ask_sdk_model.services.gadget_controller")
+gadget_controller_directives = LazyModule(
+    "ask_sdk_model.interfaces.gadget_controller")
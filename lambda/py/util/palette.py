@@ -0,0 +1,91 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import collections
+import types
+
+from . import animations
+Colors = animations.Colors
+
+# A color that isn't one of the Colors, for custom palettes. Like the Colors members it has
+# a name and a hex value, so the animation builders take it as it is.
+CustomColor = collections.namedtuple("CustomColor", ["name", "value"])
+
+# Everything the skill needs to know about a color the user can pick, worked out once
+ColorRecord = collections.namedtuple("ColorRecord", [
+    "name",                   # the name the skill says, and keeps in the session attributes
+    "color",                  # the Colors member, or CustomColor
+    "hex",                    # "ff0000"
+    "rgb",                    # (255, 0, 0)
+    "breath",                 # the dimmer color the buttons breathe while idle
+    "idle_animation",         # animation specs, see directives.cached_animation_directive
+    "button_down_animation",
+    "button_up_animation",
+    "fade_out_animation",
+])
+
+
+def _color(color, name):
+    if isinstance(color, str):
+        return CustomColor(name, color.lower())
+    return color
+
+
+def color_record(name, color, breath):
+    # type: (str, Colors, Colors) -> ColorRecord
+    color = _color(color, name)
+    breath = _color(breath, name + "_breath")
+    return ColorRecord(
+        name=name,
+        color=color,
+        hex=color.value,
+        rgb=tuple(int(color.value[index:index + 2], 16) for index in (0, 2, 4)),
+        breath=breath,
+        idle_animation=(animations.breathe_animation, 30, breath, 450),
+        button_down_animation=(animations.solid_animation, 1, color, 2000),
+        button_up_animation=(animations.solid_animation, 1, color, 200),
+        fade_out_animation=(animations.fade_out_animation, 1, color, 2000),
+    )
+
+
+class Palette(object):
+    """ The colors the user can pick, indexed by every name and synonym they can say, so that
+    resolving a spoken color is a single dict lookup.
+
+    Entries are (name, color, breath color, synonyms) tuples; colors are Colors members or hex
+    strings. The order of the entries is the order in which the colors are offered. """
+
+    def __init__(self, entries):
+        records = []
+        index = {}
+        for name, color, breath, synonyms in entries:
+            record = color_record(name, color, breath)
+            records.append(record)
+            for spoken in (name,) + tuple(synonyms):
+                spoken = spoken.lower()
+                if spoken in index and index[spoken] is not record:
+                    raise ValueError("'" + spoken + "' names two colors in the palette")
+                index[spoken] = record
+        self.records = tuple(records)
+        self.names = tuple(record.name for record in records)
+        self.index = types.MappingProxyType(index)
+        # what the buttons show for a color we don't know: nothing
+        self.off = color_record("black", Colors.black, Colors.black)
+
+    def lookup(self, spoken, default=None):
+        # type: (str, ColorRecord) -> ColorRecord
+        """ returns the color record for a spoken color name or synonym, in lower case """
+        return self.index.get(spoken, default)
+
+    def __contains__(self, spoken):
+        return spoken in self.index
@@ -0,0 +1,252 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import atexit
+import collections
+import copy
+import json
+import logging
+import os
+import threading
+import time
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Persistence is optional. When it is on, the skill remembers the buttons each user registered,
+# and the color they last picked, so that returning users can skip roll call.
+# Set PERSISTENCE_BACKEND=sqlite or PERSISTENCE_BACKEND=file on the Lambda function to switch it on,
+# and PERSISTENCE_PATH to choose where the attributes are stored.
+PERSISTENCE_BACKEND = os.environ.get("PERSISTENCE_BACKEND", "")
+PERSISTENCE_PATH = os.environ.get("PERSISTENCE_PATH", "/tmp/color_changer")
+
+# Number of users whose attributes are kept in memory by each container
+CACHE_SIZE = int(os.environ.get("PERSISTENCE_CACHE_SIZE", "1024"))
+# Seconds the writer waits after a save, so that saves close together are written in one batch
+FLUSH_DELAY = float(os.environ.get("PERSISTENCE_FLUSH_DELAY", "0.05"))
+
+
+class SqliteBackend(object):
+    """ Stores the attributes of each user as one JSON row in a SQLite database """
+
+    def __init__(self, path):
+        import sqlite3
+        self.connection = sqlite3.connect(path + ".sqlite3", check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS attributes (id TEXT PRIMARY KEY, attributes TEXT NOT NULL)")
+
+    def get(self, key):
+        # type: (str) -> Dict[str, object]
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT attributes FROM attributes WHERE id = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def write(self, batch):
+        # type: (Dict[str, Dict[str, object]]) -> None
+        """ saves every entry of the batch in one transaction; None deletes the entry """
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO attributes (id, attributes) VALUES (?, ?)",
+                [(key, json.dumps(attributes)) for key, attributes in batch.items()
+                 if attributes is not None])
+            self.connection.executemany(
+                "DELETE FROM attributes WHERE id = ?",
+                [(key,) for key, attributes in batch.items() if attributes is None])
+
+
+class FileBackend(object):
+    """ Stores the attributes of each user in a JSON file of their own """
+
+    def __init__(self, path):
+        self.directory = path
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def filename(self, key):
+        import hashlib
+        return os.path.join(
+            self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key):
+        # type: (str) -> Dict[str, object]
+        try:
+            with open(self.filename(key)) as attributes_file:
+                return json.load(attributes_file)
+        except (IOError, OSError):
+            return None
+
+    def write(self, batch):
+        # type: (Dict[str, Dict[str, object]]) -> None
+        """ saves every entry of the batch; None deletes the entry """
+        for key, attributes in batch.items():
+            filename = self.filename(key)
+            if attributes is None:
+                if os.path.exists(filename):
+                    os.remove(filename)
+                continue
+            # write to a temporary file first, so a reader never sees half of the attributes
+            with open(filename + ".tmp", "w") as attributes_file:
+                json.dump(attributes, attributes_file)
+            os.replace(filename + ".tmp", filename)
+
+
+BACKENDS = {
+    "sqlite": SqliteBackend,
+    "file": FileBackend,
+}
+
+
+class CachedPersistenceAdapter(AbstractPersistenceAdapter):
+    """ Persistence adapter that keeps the most recently used attributes in memory and writes
+    saved attributes to its backend from a background thread, so that neither reads of returning
+    users nor saves hold up the response.
+
+    Any object with get(key) and write(batch) methods can be used as the backend. Attributes are
+    keyed by user ID. Saves that haven't been written yet are written when the process exits;
+    a container that is shut down while frozen can lose them, so only keep attributes here that
+    the skill can do without. """
+
+    def __init__(self, backend, cache_size=CACHE_SIZE, flush_delay=FLUSH_DELAY):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.flush_delay = flush_delay
+        self.cache = collections.OrderedDict()
+        self.pending = {}
+        self.writing = {}
+        self.lock = threading.Lock()
+        # held by one flush at a time, from the swap of the pending saves until they are written,
+        # so that the writer thread and the atexit flush write their batches in order
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.writer = None
+        self.hits = 0
+        self.misses = 0
+        atexit.register(self.flush)
+
+    @staticmethod
+    def key(request_envelope):
+        # type: (RequestEnvelope) -> str
+        return request_envelope.context.system.user.user_id
+
+    def get_attributes(self, request_envelope):
+        # type: (RequestEnvelope) -> Dict[str, object]
+        key = self.key(request_envelope)
+        with self.lock:
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return copy.deepcopy(self.cache[key])
+            self.misses += 1
+            unwritten = self.pending if key in self.pending else self.writing
+            if key in unwritten:
+                # evicted from the cache before the writer was done with it
+                attributes = unwritten[key] or {}
+                self._remember(key, attributes)
+                return copy.deepcopy(attributes)
+        attributes = self.backend.get(key) or {}
+        with self.lock:
+            # a save may have happened while we were reading the backend
+            if key in self.cache:
+                return copy.deepcopy(self.cache[key])
+            self._remember(key, attributes)
+        return copy.deepcopy(attributes)
+
+    def save_attributes(self, request_envelope, attributes):
+        # type: (RequestEnvelope, Dict[str, object]) -> None
+        key = self.key(request_envelope)
+        attributes = copy.deepcopy(attributes)
+        with self.lock:
+            self._remember(key, attributes)
+            self.pending[key] = attributes
+        self._write_behind()
+
+    def delete_attributes(self, request_envelope):
+        # type: (RequestEnvelope) -> None
+        key = self.key(request_envelope)
+        with self.lock:
+            self._remember(key, {})
+            self.pending[key] = None
+        self._write_behind()
+
+    def _remember(self, key, attributes):
+        self.cache[key] = attributes
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _write_behind(self):
+        if self.writer is None:
+            self.writer = threading.Thread(
+                target=self._run_writer, name="persistence-writer")
+            self.writer.daemon = True
+            self.writer.start()
+        self.wake.set()
+
+    def _run_writer(self):
+        while True:
+            self.wake.wait()
+            time.sleep(self.flush_delay)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.error("Could not write persistent attributes", exc_info=True)
+
+    def flush(self):
+        """ writes every pending save to the backend, in one batch """
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                self.writing = batch
+            if batch:
+                try:
+                    self.backend.write(batch)
+                finally:
+                    with self.lock:
+                        self.writing = {}
+                logger.info("Wrote persistent attributes of " + str(len(batch)) + " users")
+
+
+def create_adapter(backend_name=PERSISTENCE_BACKEND, path=PERSISTENCE_PATH):
+    # type: (str, str) -> CachedPersistenceAdapter
+    """ returns the persistence adapter for the configured backend, or None when persistence is off """
+    if not backend_name:
+        return None
+    return CachedPersistenceAdapter(BACKENDS[backend_name](path))
+
+
+adapter = create_adapter()
+
+
+def remembered(handler_input):
+    # type: (HandlerInput) -> Dict[str, object]
+    """ returns what we remember about the user from earlier sessions """
+    if adapter is None:
+        return {}
+    return handler_input.attributes_manager.persistent_attributes
+
+
+def remember(handler_input, **values):
+    # type: (HandlerInput, ...) -> None
+    """ updates what we remember about the user; saved only when something changed """
+    if adapter is None:
+        return
+    attributes = handler_input.attributes_manager.persistent_attributes
+    if any(attributes.get(key) != value for key, value in values.items()):
+        attributes.update(values)
+        handler_input.attributes_manager.save_persistent_attributes()
@@ -0,0 +1,196 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import functools
+import json
+import logging
+import os
+import re
+import string
+import sys
+import threading
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# The prompts of each locale live in a data file in lambda/py/locales, by message id, each a list
+# of the parts the response interceptor joins with spaces. A locale's file is loaded, and its prompts
+# compiled, the first time a request in that locale needs one, and kept for the container's lifetime,
+# so shipping more locales costs neither cold starts nor requests in other locales anything.
+# Messages a locale's file leaves out, and locales without a file, use the DEFAULT_LOCALE prompts;
+# the catalogs are kept by the locales of the files only, whatever locales requests come in.
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "locales")
+DEFAULT_LOCALE = "en-US"
+LOCALE_PATTERN = re.compile(r"^[a-z]{2}-[A-Z]{2}$")
+
+# Values the data files refer to as {name}, filled in when a locale is loaded; other {names} are
+# slots of the prompt, filled in by Prompt.render
+CONSTANTS = {
+    "button_count": settings.BUTTON_COUNT_SPOKEN,
+    "next_button": settings.NEXT_BUTTON_SPOKEN,
+    "waiting_audio": settings.WAITING_AUDIO,
+}
+
+# Alexa's limits on the speech of one response, output speech and reprompt alike
+# see: https://developer.amazon.com/docs/custom-skills/speech-synthesis-markup-language-ssml-reference.html
+MAX_SPEECH_LENGTH = 8000
+MAX_AUDIO_CLIPS = 5
+
+# what response_builder.speak and ask wrap the speech in
+SPEAK_TAGS_LENGTH = len("<speak></speak>")
+
+# Number of slot values kept, per prompt, with the speech rendered for them
+MAX_RENDERED = 256
+
+_formatter = string.Formatter()
+
+
+def audio_clips(speech):
+    # type: (str) -> int
+    return speech.count("<audio")
+
+
+def speech_length(parts):
+    # type: (List[str]) -> int
+    """ the length of the SSML the response interceptor builds from speech parts """
+    return sum(len(part) for part in parts) + max(len(parts) - 1, 0) + SPEAK_TAGS_LENGTH
+
+
+class Prompt(object):
+    """ Speech compiled once, when its locale is loaded, from the parts the response interceptor joins with spaces.
+
+    Parts may hold slots, such as {color}, that render fills in. The waiting audio stays a part of
+    its own, so that coalesced events can keep just the last one, see game_engine_input_handler. """
+
+    __slots__ = ("name", "segments", "slots", "_rendered", "_lock")
+
+    def __init__(self, name, *parts):
+        self.name = name
+        segments = []
+        text = []
+        for part in parts:
+            if part == settings.WAITING_AUDIO:
+                if text:
+                    segments.append(" ".join(text))
+                    text = []
+                segments.append(part)
+            else:
+                text.append(part)
+        if text:
+            segments.append(" ".join(text))
+        self.segments = tuple(sys.intern(segment) for segment in segments)
+        self.slots = frozenset(field for segment in self.segments
+                               for _, field, _, _ in _formatter.parse(segment) if field)
+        self._rendered = {}
+        self._lock = threading.Lock()
+        self.validate()
+
+    def validate(self):
+        """ checks the speech without its slots against Alexa's limits """
+        static = [segment.format(**dict((slot, "") for slot in self.slots)) for segment in self.segments]
+        if speech_length(static) > MAX_SPEECH_LENGTH:
+            raise ValueError("Prompt " + self.name + " is longer than " + str(MAX_SPEECH_LENGTH) + " characters")
+        if sum(audio_clips(segment) for segment in static) > MAX_AUDIO_CLIPS:
+            raise ValueError("Prompt " + self.name + " has more than " + str(MAX_AUDIO_CLIPS) + " audio clips")
+
+    def render(self, **slots):
+        # type: (**object) -> List[str]
+        """ the speech parts of the prompt, with its slots filled in; the strings are shared by every request """
+        if not self.slots:
+            return list(self.segments)
+        key = tuple(sorted(slots.items()))
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            rendered = tuple(sys.intern(segment.format(**slots)) for segment in self.segments)
+            with self._lock:
+                if len(self._rendered) >= MAX_RENDERED:
+                    self._rendered.clear()
+                self._rendered[key] = rendered
+        return list(rendered)
+
+
+def budget(parts):
+    # type: (List[str]) -> List[str]
+    """ the speech parts of a response, without the earliest ones if all of them would go over Alexa's limits """
+    length = speech_length(parts)
+    clips = sum(audio_clips(part) for part in parts)
+    start = 0
+    while (length > MAX_SPEECH_LENGTH or clips > MAX_AUDIO_CLIPS) and start < len(parts) - 1:
+        length -= len(parts[start]) + 1
+        clips -= audio_clips(parts[start])
+        start += 1
+    if start:
+        logger.warning("Dropped " + str(start) + " speech parts over the speech budget")
+        return parts[start:]
+    return parts
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def _fill(part):
+    for name, value in CONSTANTS.items():
+        part = part.replace("{" + name + "}", value)
+    return part
+
+
+@functools.lru_cache(maxsize=None)
+def shipped_locales():
+    # type: () -> FrozenSet[str]
+    """ the locales with a data file, listed the first time a request needs a catalog """
+    return frozenset(name[:-len(".json")] for name in os.listdir(LOCALES_DIR)
+                     if name.endswith(".json") and LOCALE_PATTERN.match(name[:-len(".json")]))
+
+
+def locale_of(locale):
+    # type: (str) -> str
+    """ the locale whose prompts a request in locale gets: its own if it has a data file, else DEFAULT_LOCALE """
+    return locale if locale in shipped_locales() else DEFAULT_LOCALE
+
+
+def _load(locale):
+    # type: (str) -> Dict[str, Prompt]
+    default = None if locale == DEFAULT_LOCALE else catalog(DEFAULT_LOCALE)
+    with _catalogs_lock:
+        prompts = _catalogs.get(locale)
+        if prompts is not None:
+            return prompts
+        with open(os.path.join(LOCALES_DIR, locale + ".json")) as data_file:
+            messages = json.load(data_file)
+        prompts = dict(default or {})
+        for message_id, parts in messages.items():
+            prompt = Prompt(locale + "/" + message_id, *[_fill(part) for part in parts])
+            if default is not None and message_id in default and prompt.slots != default[message_id].slots:
+                raise ValueError("Prompt " + prompt.name + " has other slots than in " + DEFAULT_LOCALE)
+            prompts[message_id] = prompt
+        logger.info("Loaded " + str(len(messages)) + " prompts for locale " + locale)
+        _catalogs[locale] = prompts
+    return prompts
+
+
+def catalog(locale):
+    # type: (str) -> Dict[str, Prompt]
+    """ the prompts of a locale, by message id """
+    prompts = _catalogs.get(locale)
+    if prompts is None:
+        prompts = _load(locale_of(locale))
+    return prompts
+
+
+def render(handler_input, message_id, **slots):
+    # type: (HandlerInput, str, **object) -> List[str]
+    """ the speech parts of a prompt, in the locale of the request """
+    return catalog(handler_input.request_envelope.request.locale)[message_id].render(**slots)
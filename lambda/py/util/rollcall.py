@@ -11,13 +11,10 @@
     or implied. See the License for the specific language governing
     permissions and limitations under the License.
 """
+import functools
 import logging
-from ask_sdk_model.services.game_engine import (
-    Event, EventReportingType, PatternRecognizer, PatternRecognizerAnchorType,
-    Pattern, InputEventActionType, InputEvent
-)
-from ask_sdk_model.interfaces.game_engine import StartInputHandlerDirective
-from . import animations, directives, settings
+from . import animations, directives, gadgets, persistence, prompts, settings, timeouts
+from .models import game_engine, game_engine_directives
 Colors = animations.Colors
 
 logger = logging.getLogger(__name__)
@@ -26,58 +23,77 @@ logger.setLevel(logging.INFO)
 # Define some animations that we'll use during roll call, to be played in various situations,
 # such as when buttons "check in" during roll call, or after both buttons were detected.
 # See: https://developer.amazon.com/docs/gadget-skills/control-echo-buttons.html#animate
-roll_call_complete_animation = animations.fade_in_animation(
-    1, Colors.green, 5000)
-button_check_in_idle_animation = animations.solid_animation(
-    1, Colors.green, 8000)
-button_check_in_down_animation = animations.solid_animation(
-    1, Colors.green, 1000)
-button_check_in_up_animation = animations.solid_animation(
-    1, Colors.white, 4000)
-timeout_animation = animations.fade_animation(1, Colors.black, 1000)
-
-# Define two recognizers that will capture the first time each of two arbitrary buttons is pressed.
-#  We'll use proxies to refer to the two different buttons because we don't know ahead of time
-#  which two buttons will be used (see: https://developer.amazon.com/docs/gadget-skills/define-echo-button-events.html#proxies)
-# The two recogniziers will be used as triggers for two input handler events, used during roll call.
+roll_call_complete_animation = (animations.fade_in_animation, 1, Colors.green, 5000)
+button_check_in_idle_animation = (animations.solid_animation, 1, Colors.green, 8000)
+button_check_in_down_animation = (animations.solid_animation, 1, Colors.green, 1000)
+button_check_in_up_animation = (animations.solid_animation, 1, Colors.white, 4000)
+timeout_animation = (animations.fade_animation, 1, Colors.black, 1000)
+
+# Check-in events are named after the number of the button that checked in, e.g. "button_3_checked_in"
+CHECK_IN_EVENT_SUFFIX = "_checked_in"
+
+
+def check_in_event_name(number):
+    return "button_{0}{1}".format(number, CHECK_IN_EVENT_SUFFIX)
+
+
+# Define one proxy per button. We use proxies to refer to the different buttons because we don't
+# know ahead of time which buttons will be used
+# (see: https://developer.amazon.com/docs/gadget-skills/define-echo-button-events.html#proxies)
+# The proxies, recognizers and events for a number of buttons are built once, on first use,
+# and then shared by every request.
+@functools.lru_cache(maxsize=None)
+def roll_call_proxies(button_count):
+    return ["button_{0}".format(number) for number in range(1, button_count + 1)]
+
+
+# Define one recognizer per button, that captures the first time that button is pressed after the
+# buttons before it. The recognizers are used as triggers for the input handler events of roll call.
 # see: https://developer.amazon.com/docs/gadget-skills/define-echo-button-events.html#recognizers
-roll_call_recognizers = {
-    "roll_call_first_button_recognizer": PatternRecognizer(
-        anchor=PatternRecognizerAnchorType.end,
-        fuzzy=False,
-        pattern=[Pattern(gadget_ids=["first_button"],
-                         action=InputEventActionType.down)]
-    ),
-    "roll_call_second_button_recognizer": PatternRecognizer(
-        anchor=PatternRecognizerAnchorType.end,
-        fuzzy=True,
-        pattern=[Pattern(gadget_ids=["first_button"], action=InputEventActionType.down), Pattern(
-            gadget_ids=["second_button"], action=InputEventActionType.down)]
-    )}
-
-# Define named events based on the ROLL_CALL_RECOGNIZERS and the built-in "timed out" recognizer
-# to report back to the skill when the first button checks in, when the second button checks in,
-# as well as then the input handler times out, if this happens before two buttons checked in.
+@functools.lru_cache(maxsize=None)
+def roll_call_recognizers(button_count):
+    proxies = roll_call_proxies(button_count)
+    return {
+        "roll_call_button_{0}_recognizer".format(number): game_engine.PatternRecognizer(
+            anchor=game_engine.PatternRecognizerAnchorType.end,
+            fuzzy=number > 1,
+            pattern=[game_engine.Pattern(gadget_ids=[proxy], action=game_engine.InputEventActionType.down)
+                     for proxy in proxies[:number]]
+        )
+        for number in range(1, button_count + 1)
+    }
+
+
+# Define named events based on the roll call recognizers and the built-in "timed out" recognizer
+# to report back to the skill when each button checks in, as well as when the input handler
+# times out, if this happens before all buttons checked in. The last check-in ends the input handler.
 # see: https://developer.amazon.com/docs/gadget-skills/define-echo-button-events.html#define
-roll_call_events = {
-    "first_button_checked_in": Event(
-        meets=["roll_call_first_button_recognizer"],
-        reports=EventReportingType.matches,
-        should_end_input_handler=False,
-        maximum_invocations=1
-    ),
-    "second_button_checked_in": Event(
-        meets=["roll_call_second_button_recognizer"],
-        reports=EventReportingType.matches,
-        should_end_input_handler=True,
-        maximum_invocations=1
-    ),
-    "timeout": Event(
+@functools.lru_cache(maxsize=None)
+def roll_call_events(button_count):
+    events = {
+        check_in_event_name(number): game_engine.Event(
+            meets=["roll_call_button_{0}_recognizer".format(number)],
+            reports=game_engine.EventReportingType.matches,
+            should_end_input_handler=number == button_count,
+            maximum_invocations=1
+        )
+        for number in range(1, button_count + 1)
+    }
+    events["timeout"] = game_engine.Event(
         meets=["timed out"],
-        reports=EventReportingType.history,
+        reports=game_engine.EventReportingType.history,
         should_end_input_handler=True
     )
-}
+    return events
+
+
+def spoken_numbers(numbers):
+    """ returns "1", "1 and 2", "1, 2 and 3", ... """
+    words = [str(number) for number in numbers]
+    if len(words) == 1:
+        return words[0]
+    return ", ".join(words[:-1]) + " and " + words[-1]
+
 
 # ROLL_CALL_MODE Handlers
 # set up handlers for events that are specific to the Roll Call mode
@@ -87,29 +103,54 @@ def new_session(handler_input):
     # type: (HandlerInput) -> Response
     logger.info("rollcall.new_session: handling request")
 
+    remembered = persistence.remembered(handler_input)
+    if len(remembered.get("gadget_ids") or []) == settings.BUTTON_COUNT:
+        return resume_session(handler_input, remembered)
+
     ctx = handler_input.attributes_manager.request_attributes
-    ctx["output_speech"] = ["Welcome to the Color Changer skill."]
-    ctx["output_speech"].append(
-        "This skill provides a brief introduction to the core")
-    ctx["output_speech"].append(
-        "functionality that every Echo Button skill should have.")
-    ctx["output_speech"].append(
-        "We'll cover roll call, starting and stopping the Input Handler,")
-    ctx["output_speech"].append(
-        "button events and Input Handler timeout events. ")
-    ctx["output_speech"].append("Let's get started with roll call. ")
-    ctx["output_speech"].append("Roll call wakes up the buttons to make sure")
-    ctx["output_speech"].append("they're connected and ready for play. ")
-    ctx["output_speech"].append(
-        "Ok. Press the first button and wait for confirmation")
-    ctx["output_speech"].append("before pressing the second button.")
-    ctx["output_speech"].append(settings.WAITING_AUDIO)
-
-    ctx["timeout"] = 50000
+    ctx["output_speech"] = prompts.render(handler_input, "WELCOME")
+
+    ctx["timeout"] = timeouts.ROLL_CALL_TIMEOUT
 
     return start_roll_call(handler_input)
 
 
+def resume_session(handler_input, remembered):
+    # type: (HandlerInput, Dict[str, object]) -> Response
+    logger.info("rollcall.resume_session: handling request")
+
+    ctx = handler_input.attributes_manager.request_attributes
+    session_attributes = handler_input.attributes_manager.session_attributes
+    registry = gadgets.registry(handler_input)
+
+    # we already know this user's buttons, so we skip roll call and go straight to picking a color
+    registry.clear()
+    for gadget_id in remembered["gadget_ids"]:
+        registry.register(gadget_id)
+    session_attributes["button_count"] = len(registry)
+
+    ctx["reprompt"] = prompts.render(handler_input, "PICK_COLOR_REPROMPT")
+    if remembered.get("user_color") in settings.PALETTE:
+        ctx["output_speech"] = prompts.render(handler_input, "WELCOME_BACK_WITH_COLOR", color=remembered["user_color"])
+    else:
+        ctx["output_speech"] = prompts.render(handler_input, "WELCOME_BACK")
+
+    device_ids = registry.gadget_ids
+    ctx["directives"].append(directives.cached_button_idle_animation_directive(
+        roll_call_complete_animation, device_ids))
+    ctx["directives"].append(directives.cached_button_up_animation_directive(
+        settings.DEFAULT_ANIMATION_BUTTON_UP, device_ids))
+    ctx["directives"].append(directives.cached_button_down_animation_directive(
+        settings.DEFAULT_ANIMATION_BUTTON_DOWN, device_ids))
+
+    session_attributes["is_roll_call_complete"] = True
+    session_attributes["expecting_skill_confirmation"] = False
+    session_attributes["state"] = settings.SKILL_STATES["PLAY_MODE"]
+
+    ctx["open_microphone"] = True
+    return handler_input.response_builder.response
+
+
 def start_roll_call(handler_input):
     # type: (HandlerInput) -> Response
     logger.info("rollcall.start_roll_call: handling request")
@@ -118,25 +159,25 @@ def start_roll_call(handler_input):
     session_attributes = handler_input.attributes_manager.session_attributes
 
     ctx["directives"].append(
-        StartInputHandlerDirective(
+        game_engine_directives.StartInputHandlerDirective(
             timeout=ctx["timeout"],
-            proxies=["first_button", "second_button"],
-            recognizers=roll_call_recognizers,
-            events=roll_call_events
+            proxies=roll_call_proxies(settings.BUTTON_COUNT),
+            recognizers=roll_call_recognizers(settings.BUTTON_COUNT),
+            events=roll_call_events(settings.BUTTON_COUNT)
         )
     )
-    ctx["directives"].append(directives.button_down_animation_directive(
+    ctx["directives"].append(directives.cached_button_down_animation_directive(
         button_check_in_down_animation))
     ctx["directives"].append(
-        directives.button_up_animation_directive(button_check_in_up_animation))
+        directives.cached_button_up_animation_directive(button_check_in_up_animation))
 
     # start keeping track of some state
     # see: https://developer.amazon.com/docs/gadget-skills/save-state-echo-button-skill.html
     session_attributes["button_count"] = 0
     session_attributes["is_roll_call_complete"] = False
     session_attributes["expecting_skill_confirmation"] = False
-    # setup an array of DeviceIDs to hold IDs of buttons that will be used in the skill
-    session_attributes["device_ids"] = ["Device ID Listings"]
+    # start an empty registry to hold the IDs of the buttons that will be used in the skill
+    gadgets.registry(handler_input).clear()
     # Save Start Input Request ID
     session_attributes["current_input_handler_id"] = handler_input.request_envelope.request.request_id
 
@@ -144,83 +185,75 @@ def start_roll_call(handler_input):
     return handler_input.response_builder.response
 
 
-def handle_first_button_check_in(handler_input):
+def handle_button_check_in(handler_input):
     # type: (HandlerInput) -> Response
-    logger.info("rollcall.handle_first_button_check_in: handling request")
+    logger.info("rollcall.handle_button_check_in: handling request")
 
     ctx = handler_input.attributes_manager.request_attributes
     session_attributes = handler_input.attributes_manager.session_attributes
+    registry = gadgets.registry(handler_input)
 
-    # just in case we ever get this event, after the `second_button_checked_in` event
-    # was already handled, we check the make sure the `buttonCount` attribute is set to 0;
-    # if not, we will silently ignore the event
-    if "button_count" in session_attributes and session_attributes["button_count"] == 0:
-        # Say something when we first encounter a button
-        ctx["output_speech"] = ["Hello, button 1."]
-        ctx["output_speech"].append(settings.WAITING_AUDIO)
+    # A check-in event reports the down events of every button checked in so far;
+    # register the ones we haven't seen yet, in order.
+    new_button_ids = []
+    for input_event in ctx["game_input_events"]:
+        if input_event.gadget_id not in registry:
+            registry.register(input_event.gadget_id)
+            new_button_ids.append(input_event.gadget_id)
+    session_attributes["button_count"] = len(registry)
+    timeouts.observe(handler_input, ctx["game_input_events"])
 
-        first_button_id = ctx["game_input_events"][0].gadget_id
-        ctx["directives"].append(directives.button_idle_animation_directive(
-            button_check_in_idle_animation, [first_button_id]))
+    if len(registry) < settings.BUTTON_COUNT:
+        # just in case we get a check-in again after it was already handled,
+        # we silently ignore events that don't register a new button
+        if new_button_ids:
+            # Say something when we first encounter a button
+            ctx["output_speech"] = prompts.render(handler_input, "BUTTON_CHECKED_IN", buttons=spoken_numbers(
+                registry.button_number(button_id) for button_id in new_button_ids))
 
-        session_attributes["device_ids"].append(first_button_id)
-        session_attributes["button_count"] = 1
+            ctx["directives"].append(directives.cached_button_idle_animation_directive(
+                button_check_in_idle_animation, new_button_ids))
 
-    ctx["open_microphone"] = False
-    return handler_input.response_builder.response
+        ctx["open_microphone"] = False
+        return handler_input.response_builder.response
 
+    return complete_roll_call(handler_input, new_button_ids)
 
-def handle_second_button_check_in(handler_input):
-    # type: (HandlerInput) -> Response
-    logger.info("rollcall.handle_second_button_check_in: handling request")
+
+def complete_roll_call(handler_input, new_button_ids):
+    # type: (HandlerInput, List[str]) -> Response
+    logger.info("rollcall.complete_roll_call: handling request")
 
     ctx = handler_input.attributes_manager.request_attributes
     session_attributes = handler_input.attributes_manager.session_attributes
+    registry = gadgets.registry(handler_input)
 
-    ctx["reprompt"] = ["Please pick a color: green, red, or blue"]
-    ctx["output_speech"] = []
-
-    if "button_count" in session_attributes and session_attributes["button_count"] == 0:
-        ctx["output_speech"].append("hello buttons 1 and 2")
-        ctx["output_speech"].append("<break time='1s'/>")
-        ctx["output_speech"].append("Awesome!")
+    ctx["reprompt"] = prompts.render(handler_input, "PICK_COLOR_REPROMPT")
 
-        session_attributes["device_ids"].append(
-            ctx["game_input_events"][0].gadget_id)
-        session_attributes["device_ids"].append(
-            ctx["game_input_events"][1].gadget_id)
+    # greet the new buttons, and ask use to pick a color for the next stage of the skill
+    new_numbers = spoken_numbers(registry.button_number(button_id) for button_id in new_button_ids)
+    if len(new_button_ids) == len(registry):
+        ctx["output_speech"] = prompts.render(handler_input, "ALL_BUTTONS_CHECKED_IN", buttons=new_numbers)
     else:
-        ctx["output_speech"].append("hello, button 2")
-        ctx["output_speech"].append("<break time='1s'/>")
-        ctx["output_speech"].append("Awesome. I've registered two buttons.")
-
-        if ctx["game_input_events"][0].gadget_id in session_attributes["device_ids"]:
-            session_attributes["device_ids"].append(
-                ctx["game_input_events"][1].gadget_id)
-        else:
-            session_attributes["device_ids"].append(
-                ctx["game_input_events"][0].gadget_id)
-
-    session_attributes["button_count"] = 2
-
-    # .. and ask use to pick a color for the next stage of the skill
-    ctx["output_speech"].append("Now let's learn about button events.")
-    ctx["output_speech"].append(
-        "Please select one of the following colors: red, blue, or green.")
+        ctx["output_speech"] = prompts.render(handler_input, "LAST_BUTTON_CHECKED_IN", buttons=new_numbers)
 
-    device_ids = session_attributes["device_ids"][1:]
+    device_ids = registry.gadget_ids
 
     # send an idle animation to registered buttons
-    ctx["directives"].append(directives.button_idle_animation_directive(
+    ctx["directives"].append(directives.cached_button_idle_animation_directive(
         roll_call_complete_animation, device_ids))
     # reset button press animations until the user chooses a color
-    ctx["directives"].append(directives.button_up_animation_directive(
+    ctx["directives"].append(directives.cached_button_up_animation_directive(
         settings.DEFAULT_ANIMATION_BUTTON_UP, device_ids))
-    ctx["directives"].append(directives.button_down_animation_directive(
+    ctx["directives"].append(directives.cached_button_down_animation_directive(
         settings.DEFAULT_ANIMATION_BUTTON_DOWN, device_ids))
 
     session_attributes["is_roll_call_complete"] = True
     session_attributes["state"] = settings.SKILL_STATES["PLAY_MODE"]
+    # the user's pace only sizes roll calls, so it doesn't need to travel with button presses
+    session_attributes.pop(timeouts.SESSION_KEY, None)
+    # remember the buttons, so that the user can skip roll call next time
+    persistence.remember(handler_input, gadget_ids=list(device_ids))
 
     ctx["open_microphone"] = True
     return handler_input.response_builder.response
@@ -232,21 +265,21 @@ def handle_timeout(handler_input):
 
     ctx = handler_input.attributes_manager.request_attributes
     session_attributes = handler_input.attributes_manager.session_attributes
+    # the history of the input handler tells us how fast the user got to the buttons they pressed
+    timeouts.observe(handler_input, ctx.get("game_input_events"))
 
-    ctx["output_speech"] = ["For this skill we need two buttons."]
-    ctx["output_speech"].append(
-        "Would you like more time to press the buttons?")
-    ctx["reprompt"] = ["Say yes to go back and add buttons, or no to exit now."]
+    ctx["output_speech"] = prompts.render(handler_input, "ROLL_CALL_TIMEOUT")
+    ctx["reprompt"] = prompts.render(handler_input, "ROLL_CALL_TIMEOUT_REPROMPT")
 
-    device_ids = session_attributes["device_ids"][1:]
+    device_ids = gadgets.registry(handler_input).gadget_ids
 
     # send an idle animation for timeout
     ctx["directives"].append(
-        directives.button_idle_animation_directive(timeout_animation, device_ids))
+        directives.cached_button_idle_animation_directive(timeout_animation, device_ids))
     # reset button press animations
-    ctx["directives"].append(directives.button_up_animation_directive(
+    ctx["directives"].append(directives.cached_button_up_animation_directive(
         settings.DEFAULT_ANIMATION_BUTTON_UP, device_ids))
-    ctx["directives"].append(directives.button_down_animation_directive(
+    ctx["directives"].append(directives.cached_button_down_animation_directive(
         settings.DEFAULT_ANIMATION_BUTTON_DOWN, device_ids))
 
     ctx["open_microphone"] = True
@@ -0,0 +1,103 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import logging
+from ask_sdk_core.dispatch_components import AbstractRequestHandler
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Routes registered without a state match the request in every skill state
+ANY_STATE = None
+
+
+class RoutingTable(object):
+    """ Indexes handler functions by (request type, intent name, skill state) so that
+    each request is routed with a dict lookup instead of walking a chain of can_handle
+    predicates. Requests that match no route go to the fallback handler. """
+
+    def __init__(self, states):
+        self.states = list(states)
+        self.routes = {}
+        self.table = {}
+        self.fallback_handler = None
+
+    def route(self, request_type, intent_name=None, state=ANY_STATE):
+        """ decorator registering a handler for a request type, and optionally an intent and a state """
+        def wrapper(handle_func):
+            key = (request_type, intent_name, state)
+            if key in self.routes:
+                raise ValueError("Duplicate route {0} for {1}".format(
+                    key, handle_func.__name__))
+            self.routes[key] = handle_func
+            self.compile()
+            return handle_func
+        return wrapper
+
+    def fallback(self, handle_func):
+        """ decorator registering the handler for requests that match no route """
+        self.fallback_handler = handle_func
+        return handle_func
+
+    def wrap(self, decorator):
+        """ applies a decorator, such as a timer, to every registered handler """
+        self.routes = {key: decorator(handle_func) for key, handle_func in self.routes.items()}
+        if self.fallback_handler is not None:
+            self.fallback_handler = decorator(self.fallback_handler)
+        self.compile()
+
+    def compile(self):
+        """ expands the state wildcards so that routing a known state is a single lookup """
+        table = {}
+        for (request_type, intent_name, state), handle_func in self.routes.items():
+            if state is ANY_STATE:
+                for known_state in self.states:
+                    table.setdefault(
+                        (request_type, intent_name, known_state), handle_func)
+        for (request_type, intent_name, state), handle_func in self.routes.items():
+            if state is not ANY_STATE:
+                table[(request_type, intent_name, state)] = handle_func
+        self.table = table
+
+    def resolve(self, handler_input):
+        # type: (HandlerInput) -> Callable
+        request = handler_input.request_envelope.request
+        request_type = request.object_type
+        intent_name = request.intent.name if request_type == "IntentRequest" else None
+        state = handler_input.attributes_manager.session_attributes.get("state")
+
+        handle_func = self.table.get((request_type, intent_name, state))
+        if handle_func is None:
+            # states we don't know about only match the wildcard routes
+            handle_func = self.routes.get(
+                (request_type, intent_name, ANY_STATE), self.fallback_handler)
+        return handle_func
+
+    def request_handler(self):
+        """ returns a request handler, to be added to the SkillBuilder, that dispatches through this table """
+        return RoutingRequestHandler(self)
+
+
+class RoutingRequestHandler(AbstractRequestHandler):
+    """ Single request handler that handles every request by looking up its route """
+
+    def __init__(self, routing_table):
+        self.routing_table = routing_table
+
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return True
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+        return self.routing_table.resolve(handler_input)(handler_input)
@@ -0,0 +1,162 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import json
+import logging
+import os
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Session attributes travel with every request and response, including every button event,
+# so they are packed into a compact form before they are sent back to Alexa.
+# Set SESSION_CODEC=json on the Lambda function to send them as they are.
+SESSION_CODEC = os.environ.get("SESSION_CODEC", "compact")
+
+# Key marking session attributes in the compact form, and holding its version
+VERSION_KEY = "~"
+
+REQUEST_ID_PREFIX = "amzn1.echo-api.request."
+GADGET_ID_PREFIX = "amzn1.ask.gadget."
+
+
+class JsonSessionCodec(object):
+    """ Sends the session attributes as they are """
+
+    def encode(self, attributes):
+        return attributes
+
+    def decode(self, attributes):
+        return attributes
+
+
+class CompactSessionCodec(object):
+    """ Packs the skill's session attributes under one-letter keys: the state and colors become
+    indexes, the booleans become bit flags, and the common prefixes of request and gadget IDs are
+    dropped. The animations on the buttons, see util/animation_compiler.py, and the user's pace, see
+    util/timeouts.py, are kept as they are.
+    Attributes it doesn't know about are carried over unchanged. Decoding accepts both the
+    compact and the plain form, so sessions started before the codec was switched on keep working. """
+
+    version = 1
+
+    states = list(settings.SKILL_STATES.values())
+    colors = list(settings.COLORS_ALLOWED)
+    flags = ["is_roll_call_complete", "expecting_skill_confirmation",
+             "expecting_end_skill_confirmation"]
+
+    def encode(self, attributes):
+        compact = {VERSION_KEY: self.version}
+        extra = {}
+        flag_bits = 0
+        for key, value in attributes.items():
+            if key == "state" and value in self.states:
+                compact["s"] = self.states.index(value)
+            elif key == "user_color" and value in self.colors:
+                compact["c"] = self.colors.index(value)
+            elif key in self.flags and isinstance(value, bool):
+                # two bits per flag: whether it is set, and its value
+                bit = 2 * self.flags.index(key)
+                flag_bits |= (1 | int(value) << 1) << bit
+            elif key == "current_input_handler_id" and isinstance(value, str):
+                compact["h"] = _strip(value, REQUEST_ID_PREFIX)
+            elif key == "gadget_ids" and isinstance(value, list):
+                compact["g"] = [_strip(gadget_id, GADGET_ID_PREFIX) for gadget_id in value]
+            elif key == "button_count" and isinstance(value, int):
+                compact["n"] = value
+            elif key == "lights" and isinstance(value, dict):
+                compact["l"] = value
+            elif key == "press_interval" and isinstance(value, int):
+                compact["p"] = value
+            else:
+                extra[key] = value
+        if flag_bits:
+            compact["f"] = flag_bits
+        if extra:
+            compact["x"] = extra
+        return compact
+
+    def decode(self, compact):
+        if compact.get(VERSION_KEY) != self.version:
+            return compact
+        attributes = {}
+        if "s" in compact:
+            attributes["state"] = self.states[compact["s"]]
+        if "c" in compact:
+            attributes["user_color"] = self.colors[compact["c"]]
+        flag_bits = compact.get("f", 0)
+        for index, key in enumerate(self.flags):
+            bits = flag_bits >> (2 * index)
+            if bits & 1:
+                attributes[key] = bool(bits & 2)
+        if "h" in compact:
+            attributes["current_input_handler_id"] = _restore(compact["h"], REQUEST_ID_PREFIX)
+        if "g" in compact:
+            attributes["gadget_ids"] = [_restore(gadget_id, GADGET_ID_PREFIX) for gadget_id in compact["g"]]
+        if "n" in compact:
+            attributes["button_count"] = compact["n"]
+        if "l" in compact:
+            attributes["lights"] = compact["l"]
+        if "p" in compact:
+            attributes["press_interval"] = compact["p"]
+        attributes.update(compact.get("x", {}))
+        return attributes
+
+
+def _strip(value, prefix):
+    # IDs without the usual prefix are marked with a leading "!" so they come back unchanged
+    if value.startswith(prefix):
+        return value[len(prefix):]
+    return "!" + value
+
+
+def _restore(value, prefix):
+    if value.startswith("!"):
+        return value[1:]
+    return prefix + value
+
+
+CODECS = {
+    "json": JsonSessionCodec,
+    "compact": CompactSessionCodec,
+}
+
+codec = CODECS[SESSION_CODEC]()
+
+
+def encoded_size(attributes):
+    """ size in bytes of the session attributes as they appear in the JSON envelope """
+    return len(json.dumps(attributes, separators=(",", ":")))
+
+
+def decode(handler_input):
+    # type: (HandlerInput) -> None
+    """ replaces the session attributes of the request with their decoded form """
+    attributes_manager = handler_input.attributes_manager
+    if attributes_manager.session_attributes:
+        attributes_manager.session_attributes = codec.decode(
+            attributes_manager.session_attributes)
+
+
+def encode(handler_input):
+    # type: (HandlerInput) -> None
+    """ replaces the session attributes of the response with their encoded form """
+    attributes_manager = handler_input.attributes_manager
+    attributes = attributes_manager.session_attributes
+    encoded = codec.encode(attributes)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Session attributes: {0} bytes, {1} bytes encoded".format(
+            encoded_size(attributes), encoded_size(encoded)))
+    attributes_manager.session_attributes = encoded
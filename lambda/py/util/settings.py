@@ -11,8 +11,9 @@
     or implied. See the License for the specific language governing
     permissions and limitations under the License.
 """
+import os
 
-from . import animations, directives
+from . import animations, directives, light_shows, palette
 Colors = animations.Colors
 
 # The skill states are the different parts of the skill.
@@ -26,18 +27,37 @@ SKILL_STATES = {
     "EXIT_MODE": "_EXIT_MODE"
 }
 
+# The number of Echo Buttons to register during roll call. Party setups can set BUTTON_COUNT
+# on the Lambda function to play with more buttons.
+BUTTON_COUNT = int(os.environ.get("BUTTON_COUNT", "2"))
+if BUTTON_COUNT > light_shows.MAX_TARGET_GADGETS:
+    # the directives lighting up every registered button would have no room for a single step
+    raise ValueError("BUTTON_COUNT is {0}, but the skill can light up at most {1} buttons".format(
+        BUTTON_COUNT, light_shows.MAX_TARGET_GADGETS))
+NUMBER_WORDS = ["zero", "one", "two", "three", "four", "five",
+                "six", "seven", "eight", "nine", "ten"]
+BUTTON_COUNT_SPOKEN = NUMBER_WORDS[BUTTON_COUNT] if BUTTON_COUNT < len(
+    NUMBER_WORDS) else str(BUTTON_COUNT)
+# How prompts refer to the buttons that should be pressed after the first one
+NEXT_BUTTON_SPOKEN = "second button" if BUTTON_COUNT == 2 else "next button"
+
 # We'll use an audio sample of a ticking clock to play whenever the skill is waiting for button presses
 #  This is an audio file from the ASK Soundbank: https://developer.amazon.com/docs/custom-skills/foley-sounds.html
 WAITING_AUDIO = "<audio src=\"https://s3.amazonaws.com/ask-soundlibrary/foley/amzn_sfx_rhythmic_ticking_30s_01.mp3\"/>"
 
-# The following are going to be the colors we allow in the skill
-COLORS_ALLOWED = [Colors.blue.name, Colors.green.name, Colors.red.name]
-BREATH_COLORS = {Colors.blue: Colors.light_blue,
-                 Colors.green: Colors.light_green, Colors.red: Colors.light_red}
+# The following are going to be the colors we allow in the skill, with the dimmer colors the buttons
+# breathe while idle, and any synonyms of their names. See util/palette.py.
+PALETTE = palette.Palette([
+    ("blue", Colors.blue, Colors.light_blue, ()),
+    ("green", Colors.green, Colors.light_green, ()),
+    ("red", Colors.red, Colors.light_red, ()),
+])
+# session attributes refer to the colors by their index in this list, so only ever append to it
+COLORS_ALLOWED = list(PALETTE.names)
 
 # Define animations to be played on button down and button up that are like the default animations on the buttons
 # We'll use these animations when resetting play state
 # See: https://developer.amazon.com/docs/echo-button-skills/control-echo-buttons.html#animate
-DEFAULT_ANIMATION_BUTTON_DOWN = animations.fade_out_animation(
-    1, Colors.blue, 200)
-DEFAULT_ANIMATION_BUTTON_UP = animations.solid_animation(1, Colors.black, 100)
+# These are animation specs - (builder, *args) tuples - so their serialized form can be cached.
+DEFAULT_ANIMATION_BUTTON_DOWN = (animations.fade_out_animation, 1, Colors.blue, 200)
+DEFAULT_ANIMATION_BUTTON_UP = (animations.solid_animation, 1, Colors.black, 100)
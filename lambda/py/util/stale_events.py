@@ -0,0 +1,139 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import collections
+import logging
+import os
+import threading
+
+from ask_sdk_core.utils import RESPONSE_FORMAT_VERSION
+from ask_sdk_runtime.utils import UserAgentManager
+
+from . import metrics, session_codec
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# When users press buttons quickly, events keep arriving from input handlers the skill has already
+# replaced, and game_engine_input_handler ignores them. They are rejected here instead, straight from
+# the event and before the SDK and the interceptors see the request, with the same empty response.
+# Input handler events this container has already answered, which Alexa may deliver again, get the
+# response of their first delivery again, so that the session carries on from where that left it.
+# Set STALE_EVENTS=off on the Lambda function to send every event through the SDK.
+STALE_EVENTS = os.environ.get("STALE_EVENTS", "on") != "off"
+
+# Number of responses to input handler events kept, by request ID, to answer duplicates with
+DUPLICATE_WINDOW = int(os.environ.get("STALE_EVENTS_DUPLICATE_WINDOW", "1024"))
+
+INPUT_HANDLER_EVENT = "GameEngine.InputHandlerEvent"
+
+# input handler events seen by this container, by outcome; also reported as metrics
+counts = {"accepted": 0, "stale": 0, "duplicate": 0}
+
+_answered = collections.OrderedDict()
+_lock = threading.Lock()
+
+
+def _count(outcome):
+    with _lock:
+        counts[outcome] += 1
+    metrics.count("input_handler_event." + outcome)
+
+
+def rejection_rate():
+    """ the fraction of input handler events rejected as stale or duplicate so far """
+    with _lock:
+        seen = dict(counts)
+    total = sum(seen.values())
+    return (seen["stale"] + seen["duplicate"]) / float(total) if total else 0.0
+
+
+def empty_response(session_attributes):
+    # type: (Dict[str, object]) -> Dict[str, object]
+    """ the response envelope the SDK builds when game_engine_input_handler ignores an event """
+    return {
+        "version": RESPONSE_FORMAT_VERSION,
+        "sessionAttributes": session_codec.codec.encode(session_attributes),
+        "userAgent": UserAgentManager.get_user_agent(),
+        "response": {}
+    }
+
+
+def classify(event):
+    # type: (Dict[str, object]) -> Tuple[str, Dict[str, object]]
+    """ returns "stale" or "duplicate" and the response for an event to reject,
+    or (None, None) if the event should be handled """
+    request = event.get("request") or {}
+    if request.get("type") != INPUT_HANDLER_EVENT:
+        return None, None
+
+    with _lock:
+        first_response = _answered.get(request.get("requestId"))
+    if first_response is not None:
+        logger.warning("Duplicate input received -> " + str(request.get("requestId")))
+        return "duplicate", first_response
+
+    session = event.get("session") or {}
+    if not session.get("attributes"):
+        return None, None
+    session_attributes = session_codec.codec.decode(dict(session["attributes"]))
+    if session_attributes.get("state") is None:
+        # the request interceptor would assign a state, so the SDK has to answer
+        return None, None
+    if ("current_input_handler_id" in session_attributes
+            and request.get("originatingRequestId") != session_attributes["current_input_handler_id"]):
+        logger.warning("Stale input received -> received event from " + str(request.get("originatingRequestId")) +
+                      "(was expecting " + session_attributes["current_input_handler_id"] + ")")
+        return "stale", empty_response(session_attributes)
+    return None, None
+
+
+def reject(event):
+    # type: (Dict[str, object]) -> Dict[str, object]
+    """ returns the response for a stale or duplicate input handler event, or None if the event should be handled """
+    return classify(event)[1]
+
+
+def answered(event, response):
+    # type: (Dict[str, object], Dict[str, object]) -> None
+    """ remembers the response to an input handler event the skill answered, for its duplicates """
+    request = event.get("request") or {}
+    if request.get("type") != INPUT_HANDLER_EVENT:
+        return
+    _count("accepted")
+    with _lock:
+        _answered[request.get("requestId")] = response
+        if len(_answered) > DUPLICATE_WINDOW:
+            _answered.popitem(last=False)
+
+
+def lambda_handler(handler):
+    # type: (Callable) -> Callable
+    """ wraps a Lambda handler so that stale and duplicate input handler events are rejected before it """
+    if not STALE_EVENTS:
+        return handler
+
+    def wrapper(event, context):
+        try:
+            outcome, response = classify(event)
+        except Exception:
+            # unexpected events or session attributes; the SDK answers, with the skill's error handler if it must
+            logger.warning("stale_events.classify failed, handing the request on", exc_info=True)
+            outcome, response = None, None
+        if outcome is not None:
+            _count(outcome)
+            return response
+        response = handler(event, context)
+        answered(event, response)
+        return response
+    return wrapper
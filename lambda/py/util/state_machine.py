@@ -0,0 +1,140 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Transitions declared with ANY match every skill state, or both values of the confirmation flag
+ANY = None
+
+# Transitions to IGNORE leave the event unhandled in that state
+IGNORE = None
+
+
+class StateMachine(object):
+    """ Maps (event, skill state, expecting end skill confirmation) to the function handling the
+    event, from a declarative list of transitions.
+
+    The transitions are compiled once into a table holding every combination of event, state and
+    confirmation flag, so dispatching an event is a single lookup. Compiling fails when a
+    combination is not covered, or is covered by two transitions that are equally specific.
+    The machine also counts how often each transition runs, and how long it takes. """
+
+    def __init__(self, states, events, transitions):
+        # type: (Iterable[str], Iterable[str], List[Tuple[str, str, bool, Callable]]) -> None
+        self.states = list(states)
+        self.events = list(events)
+        self.transitions = list(transitions)
+        self.table = self.compile()
+        # [number of runs, total seconds] per transition, updated by requests on every thread
+        self.timings = {key: [0, 0.0] for key in self.table}
+        self.timings_lock = threading.Lock()
+
+    def compile(self):
+        """ expands the wildcards of the transitions and checks that they cover every case """
+        declared = {}
+        for event, state, confirming, handle_func in self.transitions:
+            if event not in self.events:
+                raise ValueError("Transition for unknown event " + repr(event))
+            if state is not ANY and state not in self.states:
+                raise ValueError("Transition for unknown state " + repr(state))
+            if handle_func is not IGNORE and not callable(handle_func):
+                raise ValueError("Transition handler for {0} is not callable".format(
+                    (event, state, confirming)))
+            key = (event, state, confirming)
+            if key in declared:
+                raise ValueError("Duplicate transition " + str(key))
+            declared[key] = handle_func
+
+        table = {}
+        for event in self.events:
+            for state in self.states:
+                for confirming in (False, True):
+                    table[(event, state, confirming)] = self._most_specific(
+                        declared, event, state, confirming)
+            # states we don't know about only match the transitions declared for ANY state
+            for confirming in (False, True):
+                if (event, ANY, confirming) in declared or (event, ANY, ANY) in declared:
+                    table[(event, ANY, confirming)] = self._most_specific(
+                        declared, event, ANY, confirming)
+        return table
+
+    @staticmethod
+    def _most_specific(declared, event, state, confirming):
+        candidates = []
+        for state_match in (state, ANY):
+            for confirming_match in (confirming, ANY):
+                key = (event, state_match, confirming_match)
+                if key in declared:
+                    wildcards = (state_match is ANY) + (confirming_match is ANY)
+                    candidates.append((wildcards, key))
+        if not candidates:
+            raise ValueError("No transition for event {0} in state {1} (confirming: {2})".format(
+                repr(event), repr(state), confirming))
+        candidates.sort(key=lambda candidate: candidate[0])
+        if (len(candidates) > 1 and candidates[0][0] == candidates[1][0]
+                and declared[candidates[0][1]] is not declared[candidates[1][1]]):
+            raise ValueError("Ambiguous transitions {0} and {1}".format(
+                candidates[0][1], candidates[1][1]))
+        return declared[candidates[0][1]]
+
+    def wrap(self, decorator):
+        """ applies a decorator, such as a timer, to the handler of every transition """
+        self.table = {key: handle_func if handle_func is IGNORE else decorator(handle_func)
+                      for key, handle_func in self.table.items()}
+
+    def dispatch(self, handler_input, event):
+        # type: (HandlerInput, str) -> Tuple[bool, Response]
+        """ runs the transition for the event in the current state; returns whether the event
+        was handled, and the handler's response """
+        session_attributes = handler_input.attributes_manager.session_attributes
+        key = (event, session_attributes.get("state"),
+               bool(session_attributes.get("expecting_end_skill_confirmation")))
+        if key not in self.table:
+            key = (event, ANY, key[2])
+        handle_func = self.table[key]
+        if handle_func is IGNORE:
+            return False, None
+
+        start = time.perf_counter()
+        try:
+            return True, handle_func(handler_input)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.timings_lock:
+                timing = self.timings[key]
+                timing[0] += 1
+                timing[1] += elapsed
+
+    def report(self):
+        """ returns the transitions that ran, the ones that took the most time first """
+        with self.timings_lock:
+            timings = [(key, tuple(timing)) for key, timing in self.timings.items()]
+        rows = []
+        for (event, state, confirming), (count, seconds) in timings:
+            if count:
+                rows.append({
+                    "event": event,
+                    "state": state,
+                    "confirming": confirming,
+                    "handler": self.table[(event, state, confirming)].__name__,
+                    "count": count,
+                    "total_ms": round(seconds * 1000, 3),
+                    "mean_us": round(seconds / count * 1e6, 1),
+                })
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows
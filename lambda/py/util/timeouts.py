@@ -0,0 +1,90 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import calendar
+import datetime
+import logging
+import os
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# How long input handlers wait for button presses, in milliseconds.
+# When a roll call times out, the user is asked whether they want more time, which costs a timeout
+# event and a yes/no answer. So the retry is sized to the pace at which the user pressed the buttons
+# so far in the session, instead of a fixed 30 seconds.
+# Set ADAPTIVE_TIMEOUTS=off on the Lambda function to always use the fixed timeouts.
+ADAPTIVE_TIMEOUTS = os.environ.get("ADAPTIVE_TIMEOUTS", "on") != "off"
+
+ROLL_CALL_TIMEOUT = 50000
+ROLL_CALL_RETRY_TIMEOUT = 30000
+PLAY_TIMEOUT = 30000
+
+# The Game Engine accepts input handlers of up to 90 seconds
+MIN_TIMEOUT = 15000
+MAX_TIMEOUT = 90000
+# time for Alexa to ask for the buttons again, and for the user to get to the first one
+RETRY_ALLOWANCE_MS = 8000
+# how much slower than their pace so far we allow the user to be
+PACE_MARGIN = 2.0
+# weight of the latest observation in the pace
+SMOOTHING = 0.5
+
+# Session attribute holding the user's pace: milliseconds between pressing one button and the next
+SESSION_KEY = "press_interval"
+
+
+def timestamp_ms(timestamp):
+    # type: (str) -> int
+    """ milliseconds since the epoch for an input event timestamp such as 2018-06-18T05:56:20.519Z """
+    seconds, _, fraction = timestamp.rstrip("Z").partition(".")
+    moment = datetime.datetime.strptime(seconds, "%Y-%m-%dT%H:%M:%S")
+    return calendar.timegm(moment.timetuple()) * 1000 + int((fraction + "000")[:3])
+
+
+def observe(handler_input, input_events):
+    # type: (HandlerInput, List[InputEvent]) -> None
+    """ learns the user's pace from the first time each button was pressed in the input events """
+    first_presses = {}
+    for input_event in input_events or []:
+        if input_event.action is not None and input_event.action.value == "down":
+            pressed = timestamp_ms(input_event.timestamp)
+            if pressed < first_presses.get(input_event.gadget_id, pressed + 1):
+                first_presses[input_event.gadget_id] = pressed
+    if len(first_presses) < 2:
+        return
+
+    presses = sorted(first_presses.values())
+    interval = (presses[-1] - presses[0]) / float(len(presses) - 1)
+    session_attributes = handler_input.attributes_manager.session_attributes
+    previous = session_attributes.get(SESSION_KEY)
+    if previous is not None:
+        interval = previous + (interval - previous) * SMOOTHING
+    session_attributes[SESSION_KEY] = int(interval)
+
+
+def roll_call_retry_timeout(handler_input):
+    # type: (HandlerInput) -> int
+    """ timeout for a roll call started again after the previous one timed out """
+    if not ADAPTIVE_TIMEOUTS:
+        return ROLL_CALL_RETRY_TIMEOUT
+    interval = handler_input.attributes_manager.session_attributes.get(SESSION_KEY)
+    if interval is None:
+        # the user didn't get to a second button last time, so we give them as long as we can
+        return MAX_TIMEOUT
+    timeout = int(RETRY_ALLOWANCE_MS + settings.BUTTON_COUNT * interval * PACE_MARGIN)
+    timeout = max(MIN_TIMEOUT, min(MAX_TIMEOUT, timeout))
+    logger.info("Roll call timeout for a press every " + str(interval) + " ms: " + str(timeout) + " ms")
+    return timeout
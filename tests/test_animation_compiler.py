@@ -0,0 +1,87 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import envelopes
+
+from util import animation_compiler, animations, directives, gadgets, settings
+Colors = animations.Colors
+
+RED = (animations.solid_animation, 1, Colors.red, 2000)
+BLUE = (animations.solid_animation, 1, Colors.blue, 2000)
+
+
+def down(spec, target_gadgets):
+    return directives.cached_button_down_animation_directive(spec, target_gadgets)
+
+
+def targets(directive_list):
+    return [(directive["parameters"]["triggerEvent"], directive["targetGadgets"]) for directive in directive_list]
+
+
+def test_drop_overridden():
+    directive_list = [
+        down(RED, ["g1", "g2"]),
+        directives.cached_button_idle_animation_directive(RED, ["g1"]),
+        down(BLUE, ["g2"]),
+    ]
+    compiled = animation_compiler.drop_overridden(directive_list)
+    assert targets(compiled) == [("buttonDown", ["g1"]), ("none", ["g1"]), ("buttonDown", ["g2"])]
+    # the directives given are shared by the cache, so they aren't changed
+    assert directive_list[0]["targetGadgets"] == ["g1", "g2"]
+
+
+def test_drop_overridden_by_every_gadget():
+    compiled = animation_compiler.drop_overridden([down(RED, ["g1"]), down(BLUE, [])])
+    assert targets(compiled) == [("buttonDown", [])]
+
+
+def test_drop_redundant_keeps_track_of_the_lights():
+    registry = gadgets.GadgetRegistry(["g1", "g2"])
+    lights = {}
+    first = animation_compiler.drop_redundant([down(RED, ["g1", "g2"])], lights, registry)
+    assert targets(first) == [("buttonDown", ["g1", "g2"])]
+    red = animation_compiler.fingerprint(first[0]["parameters"])
+    assert lights == {"buttonDown": {"1": red, "2": red}}
+
+    # the buttons already have it
+    assert animation_compiler.drop_redundant([down(RED, ["g1", "g2"])], lights, registry) == []
+    # only the button that changes gets the new one, and unregistered buttons always do
+    second = animation_compiler.drop_redundant([down(BLUE, ["g1"]), down(RED, ["g2", "g3"])], lights, registry)
+    assert targets(second) == [("buttonDown", ["g1"]), ("buttonDown", ["g3"])]
+
+
+def test_drop_redundant_always_sends_idle_animations():
+    registry = gadgets.GadgetRegistry(["g1"])
+    idle = [directives.cached_button_idle_animation_directive(RED, ["g1"])]
+    lights = {}
+    assert animation_compiler.drop_redundant(idle, lights, registry) == idle
+    assert animation_compiler.drop_redundant(idle, lights, registry) == idle
+    assert lights == {}
+
+
+def test_merge_identical():
+    compiled = animation_compiler.merge_identical([down(RED, ["g1"]), down(BLUE, ["g2"]), down(RED, ["g3"])])
+    assert targets(compiled) == [("buttonDown", ["g1", "g3"]), ("buttonDown", ["g2"])]
+
+
+def test_compile_directives_of_a_response():
+    event = envelopes.envelope(envelopes.launch_request(envelopes.new_request_id()),
+                               {"state": settings.SKILL_STATES["PLAY_MODE"], "gadget_ids": ["g1", "g2"]})
+    handler_input = envelopes.handler_input(event)
+    directive_list = [down(RED, ["g1"]), down(RED, ["g2"]), down(BLUE, ["g1"]),
+                      directives.cached_button_up_animation_directive(BLUE, ["g1", "g2"])]
+    compiled = animation_compiler.compile_directives(handler_input, directive_list)
+    assert targets(compiled) == [("buttonDown", ["g2"]), ("buttonDown", ["g1"]), ("buttonUp", ["g1", "g2"])]
+    assert set(handler_input.attributes_manager.session_attributes["lights"]) == {"buttonDown", "buttonUp"}
+    # the same directives again change nothing on the buttons
+    assert animation_compiler.compile_directives(handler_input, directive_list) == []
@@ -0,0 +1,51 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import importlib
+import os
+import subprocess
+import sys
+import sysconfig
+
+import pytest
+
+import envelopes
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hooks"))
+import bundle  # noqa: E402
+
+PATHS = [envelopes.SKILL_DIR, sysconfig.get_paths()["purelib"]]
+
+
+def test_skill_modules():
+    modules = bundle.skill_modules(envelopes.SKILL_DIR)
+    assert modules[:2] == ["color_changer", "util"]
+    # imported only with PERSISTENCE_BACKEND set, or by the HTTP server
+    assert "util.persistence" in modules and "util.http_server" in modules
+
+
+@pytest.mark.parametrize("name", bundle.KEPT_MODULES)
+def test_kept_modules_exist(name):
+    importlib.import_module(name)
+
+
+def test_probe_reports_the_modules_it_kept():
+    keep = ("util.http_server", "ask_sdk_core.api_client")
+    modules = bundle.run_probe(PATHS, 1, keep, bundle.PROBE_ENVIRONMENTS[0])["modules"]
+    assert set(keep) <= set(modules)
+    assert "sqlite3" in modules
+
+
+def test_probe_fails_on_a_missing_module():
+    with pytest.raises(subprocess.CalledProcessError):
+        bundle.run_probe(PATHS, 1, ("util.no_such_module",))
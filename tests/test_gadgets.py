@@ -0,0 +1,53 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+from util import gadgets
+
+
+def test_register_numbers_buttons_in_check_in_order():
+    registry = gadgets.GadgetRegistry([])
+    assert registry.register("g1") == 1
+    assert registry.register("g2") == 2
+    assert registry.register("g1") == 1
+    assert registry.gadget_ids == ["g1", "g2"]
+    assert registry.button_number("g2") == 2
+    assert registry.button_number("unknown") is None
+    assert "g1" in registry and "unknown" not in registry
+    assert len(registry) == 2 and list(registry) == ["g1", "g2"]
+
+
+def test_registrations_are_saved_in_the_session():
+    session_attributes = {}
+    registry = gadgets.GadgetRegistry.from_session(session_attributes)
+    registry.register("g1")
+    assert session_attributes[gadgets.SESSION_KEY] == ["g1"]
+    registry.clear()
+    assert session_attributes[gadgets.SESSION_KEY] == []
+    assert registry.button_number("g1") is None
+
+
+def test_legacy_device_ids_are_migrated():
+    session_attributes = {gadgets.LEGACY_SESSION_KEY: [None, "g1", "g2"], "state": ""}
+    registry = gadgets.GadgetRegistry.from_session(session_attributes)
+    assert session_attributes == {gadgets.SESSION_KEY: ["g1", "g2"], "state": ""}
+    assert registry.button_number("g1") == 1
+    assert registry.button_number("g2") == 2
+    assert registry.register("g3") == 3
+    assert session_attributes[gadgets.SESSION_KEY] == ["g1", "g2", "g3"]
+
+
+def test_session_without_gadgets():
+    session_attributes = {}
+    registry = gadgets.GadgetRegistry.from_session(session_attributes)
+    assert len(registry) == 0
+    assert session_attributes == {gadgets.SESSION_KEY: []}
@@ -0,0 +1,124 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import http.client
+import json
+import os
+import time
+
+import pytest
+
+from util import http_server, persistence
+
+
+def answer(event, context):
+    return {"version": "1.0", "response": {}}
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    # a worker that exited but wasn't reaped yet
+    return os.waitpid(pid, os.WNOHANG)[0] == 0
+
+
+@pytest.fixture
+def master():
+    listener = http_server.listen("127.0.0.1", 0)
+    master = http_server.Master(listener, 2, answer)
+    yield master
+    master.stop()
+    listener.close()
+
+
+def test_reload_replaces_the_workers(master):
+    old = [master.spawn() for _ in range(master.workers)]
+    assert master.wait_ready(old, 10) == 0
+    master.reload()
+    assert master.generation == 1
+    new = [pid for pid, generation in master.children.items() if generation == 1]
+    assert len(new) == master.workers and not set(new) & set(old)
+
+
+def test_failed_reload_keeps_the_old_workers(master, monkeypatch):
+    old = [master.spawn() for _ in range(master.workers)]
+    assert master.wait_ready(old, 10) == 0
+
+    def broken_handler():
+        raise ImportError("broken skill")
+    # the new workers import the skill, which fails
+    monkeypatch.setattr(http_server, "load_handler", broken_handler)
+    master.lambda_handler = None
+    started = time.time()
+    master.reload()
+    assert time.time() - started < http_server.GRACEFUL_TIMEOUT
+    assert master.generation == 0
+    assert all(alive(pid) for pid in old)
+    assert [pid for pid, generation in master.children.items() if generation == 0] == old
+    # nor are the workers of the failed reload counted as the current ones
+    assert master.replace_exited(time.time()) == 0
+
+
+def test_workers_that_keep_exiting_are_replaced_less_often(master, monkeypatch):
+    spawned = []
+    monkeypatch.setattr(master, "spawn", lambda: spawned.append(1))
+    now = 1000.0
+    delays = []
+    for _ in range(20):
+        # the workers exit as soon as they are started
+        while not master.replace_exited(now):
+            now += 0.1
+        delays.append(master.respawn_delay)
+    assert delays[:3] == [http_server.RESPAWN_DELAY, http_server.RESPAWN_DELAY * 2, http_server.RESPAWN_DELAY * 4]
+    assert max(delays) == http_server.MAX_RESPAWN_DELAY
+    assert len(spawned) == 20 * master.workers
+
+    # workers that stay up reset the backoff
+    master.children = dict((pid, master.generation) for pid in range(master.workers))
+    master.replace_exited(now + http_server.MAX_RESPAWN_DELAY)
+    # not processes the fixture should stop
+    master.children = {}
+    assert master.respawn_delay == 0
+
+
+class Envelope(object):
+    """ the parts of a request envelope the persistence adapter reads """
+
+    def __init__(self, user_id):
+        self.context = self
+        self.system = self
+        self.user = self
+        self.user_id = user_id
+
+
+def test_stopped_workers_write_the_saves_they_held_back(master, monkeypatch, tmp_path):
+    backend = persistence.FileBackend(str(tmp_path))
+    # the writer thread would wait longer than the test
+    monkeypatch.setattr(persistence, "adapter", persistence.CachedPersistenceAdapter(backend, flush_delay=60))
+
+    def remembering(event, context):
+        persistence.adapter.save_attributes(Envelope("user"), {"user_color": "red"})
+        return answer(event, context)
+    master.lambda_handler = remembering
+    master.workers = 1
+    pid = master.spawn()
+    assert master.wait_ready([pid], 10) == 0
+
+    connection = http.client.HTTPConnection("127.0.0.1", master.listener.getsockname()[1], timeout=10)
+    connection.request("POST", "/", json.dumps({"request": {}}), {"Content-Type": "application/json"})
+    assert connection.getresponse().status == 200
+    connection.close()
+    master.stop()
+    assert backend.get("user") == {"user_color": "red"}
@@ -0,0 +1,92 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import copy
+import json
+import random
+import subprocess
+import sys
+
+import envelopes
+
+import color_changer
+from ask_sdk_core.serialize import DefaultSerializer
+from ask_sdk_model import RequestEnvelope
+from util import lazy_envelope, models
+
+serializer = DefaultSerializer()
+
+
+def test_import_leaves_the_lazy_models_unloaded():
+    # in a fresh process, as this one may have loaded them already
+    lazy = [module._lazy_name for module in (models.game_engine, models.game_engine_directives,
+                                             models.gadget_controller, models.gadget_controller_directives)]
+    script = "import sys; sys.path.insert(0, {0!r}); import color_changer; print([name for name in {1!r} if name in sys.modules])"
+    output = subprocess.check_output([sys.executable, "-c", script.format(envelopes.SKILL_DIR, lazy)],
+                                     stderr=subprocess.DEVNULL)
+    assert output.decode("utf-8").strip() == "[]"
+
+
+def test_envelopes_are_the_same_as_the_sdk_builds():
+    checked = 0
+    for seed in range(5):
+        for _, event, _ in envelopes.replay(color_changer.handler, envelopes.button_session(random.Random(seed))):
+            expected = serializer.deserialize(payload=json.dumps(event), obj_type=RequestEnvelope)
+            actual = lazy_envelope.deserialize(serializer, event)
+            assert actual == expected
+            if isinstance(actual, lazy_envelope.LazyRequestEnvelope):
+                assert serializer.serialize(actual) == serializer.serialize(expected)
+                checked += 1
+    assert checked > 0
+
+
+def test_input_events_are_deserialized_when_read():
+    event = envelopes.envelope(envelopes.input_handler_event_request("r2", "r1", [
+        ("timeout", [envelopes.input_event("g1"), envelopes.input_event("g2", "up")])]))
+    envelope = lazy_envelope.deserialize(serializer, event)
+    input_events = envelope.request.events[0].input_events
+    assert isinstance(list.__getitem__(input_events, 0), dict)
+    assert input_events[1].gadget_id == "g2"
+    assert isinstance(list.__getitem__(input_events, 0), dict)
+    assert [input_event.gadget_id for input_event in input_events] == ["g1", "g2"]
+    assert envelope.context.system.device.device_id == "amzn1.ask.device.benchmark"
+
+
+
+def lazy_input_events():
+    event = envelopes.envelope(envelopes.input_handler_event_request("r2", "r1", [
+        ("timeout", [envelopes.input_event("g1"), envelopes.input_event("g2", "up"), envelopes.input_event("g3")])]))
+    return lazy_envelope.deserialize(serializer, event).request.events[0].input_events
+
+
+def gadget_ids(items):
+    return [item.gadget_id for item in items]
+
+
+def test_every_list_method_hands_out_models():
+    assert gadget_ids(lazy_input_events()[1:]) == ["g2", "g3"]
+    assert gadget_ids(lazy_input_events().copy()) == ["g1", "g2", "g3"]
+    assert gadget_ids(copy.copy(lazy_input_events())) == ["g1", "g2", "g3"]
+    assert gadget_ids(copy.deepcopy(lazy_input_events())) == ["g1", "g2", "g3"]
+    assert gadget_ids(lazy_input_events() + []) == ["g1", "g2", "g3"]
+    assert gadget_ids(lazy_input_events() * 2) == ["g1", "g2", "g3"] * 2
+    assert gadget_ids(list(reversed(lazy_input_events()))) == ["g3", "g2", "g1"]
+    assert lazy_input_events().pop().gadget_id == "g3"
+    assert "gadgetId" not in repr(lazy_input_events())
+
+    input_events = lazy_input_events()
+    first = input_events[0]
+    assert first in input_events
+    assert input_events.index(first) == 0 and input_events.count(first) == 1
+    input_events.remove(first)
+    assert gadget_ids(input_events) == ["g2", "g3"]
@@ -0,0 +1,122 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+import envelopes
+
+from util import animation_compiler, animations, directives, light_shows
+Colors = animations.Colors
+
+RAINBOW = (light_shows.rainbow_animation, 1, 6000, 500)
+
+
+def total_ms(sequence):
+    return sum(step["durationMs"] for step in sequence)
+
+
+def fits(sequence, limit):
+    return len(sequence) <= limit and all(
+        1 <= step["durationMs"] <= light_shows.MAX_STEP_DURATION_MS for step in sequence)
+
+
+def test_max_steps():
+    assert light_shows.max_steps() == light_shows.MAX_STEPS
+    assert light_shows.max_steps(2) == light_shows.MAX_STEPS - 2 * light_shows.STEPS_PER_TARGET_GADGET
+    assert light_shows.max_steps(13) == 0
+    with pytest.raises(ValueError):
+        light_shows.max_steps(-1)
+
+
+@pytest.mark.parametrize("total, count", [(10, 10), (6000, 38), (100, 7), (65535 * 3, 2)])
+def test_durations_add_up(total, count):
+    durations = light_shows._durations(total, count)
+    assert len(durations) == count
+    assert sum(durations) == total
+    assert min(durations) >= 1
+
+
+def test_durations_of_more_steps_than_milliseconds():
+    with pytest.raises(ValueError):
+        light_shows._durations(10, 38)
+
+
+def test_short_gradient_keeps_its_duration():
+    sequence = light_shows.gradient_animation(1, (Colors.red, Colors.blue), 10)["sequence"]
+    assert len(sequence) == 10
+    assert total_ms(sequence) == 10
+    assert sequence[0]["color"] == "ff0000" and sequence[-1]["color"] == "0000ff"
+
+
+@pytest.mark.parametrize("limit", [light_shows.MAX_STEPS, light_shows.max_steps(4), 5, 1])
+def test_long_sequence_is_fitted(limit):
+    steps = [(40, "{0:06x}".format(index * 0x010101 % 0x1000000), True) for index in range(600)]
+    sequence = light_shows.sequence_animation(1, steps, limit)["sequence"]
+    assert fits(sequence, limit)
+    assert total_ms(sequence) == 600 * 40
+
+
+def test_fit_resamples_when_long_steps_are_split():
+    steps = [(100000, "aa0000", True), (1, "bb0000", True), (1, "cc0000", True), (1, "dd0000", True)]
+    sequence = light_shows.sequence_animation(1, steps, 3)["sequence"]
+    assert fits(sequence, 3)
+    assert total_ms(sequence) == 100003
+
+
+def test_fit_of_a_duration_the_limit_cannot_hold():
+    # 200 seconds take 4 steps of at most 65535 ms
+    with pytest.raises(ValueError):
+        light_shows.sequence_animation(1, [(100000, "ff0000", True), (100000, "00ff00", True)], limit=2)
+    sequence = light_shows.sequence_animation(1, [(100000, "ff0000", True), (100000, "00ff00", True)], 4)
+    assert fits(sequence["sequence"], 4)
+
+
+@pytest.mark.parametrize("gadget_count", [0, 1, 2, 4, 12])
+def test_cached_directive_fits_its_target_gadgets(gadget_count):
+    target_gadgets = ["gadget{0}".format(number) for number in range(gadget_count)]
+    directive = directives.cached_button_idle_animation_directive(RAINBOW, target_gadgets)
+    assert directive["targetGadgets"] == target_gadgets
+    assert light_shows.directive_steps(directive) <= light_shows.max_steps(gadget_count)
+    assert total_ms(directive["parameters"]["animations"][0]["sequence"]) == 6000
+
+
+def test_cached_directive_for_too_many_gadgets():
+    assert light_shows.max_steps(light_shows.MAX_TARGET_GADGETS) >= 1
+    target_gadgets = ["gadget{0}".format(number) for number in range(light_shows.MAX_TARGET_GADGETS + 1)]
+    with pytest.raises(ValueError, match="at most 12 gadgets, not 13"):
+        directives.cached_button_idle_animation_directive(RAINBOW, target_gadgets)
+
+
+@pytest.mark.parametrize("button_count, error", [("12", ""), ("13", "can light up at most 12 buttons")])
+def test_button_count_the_directives_can_target(button_count, error):
+    # in a fresh process, as settings reads BUTTON_COUNT when it is imported
+    result = subprocess.run([sys.executable, "-c", "import sys; sys.path.insert(0, {0!r}); import color_changer".format(
+        envelopes.SKILL_DIR)], env=dict(os.environ, BUTTON_COUNT=button_count), stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE)
+    assert (result.returncode != 0) == bool(error)
+    assert error in result.stderr.decode("utf-8")
+
+
+def test_merge_identical_stays_within_the_step_limit():
+    spec = (light_shows.gradient_animation, 1, (Colors.red, Colors.blue), 3000, light_shows.max_steps(2))
+    directive_list = [directives.cached_button_down_animation_directive(spec, ["gadget{0}".format(number)])
+                      for number in range(4)]
+    merged = animation_compiler.merge_identical(directive_list)
+    # the animation has the steps of a directive for 2 gadgets, so each merged directive targets 2
+    assert [directive["targetGadgets"] for directive in merged] == [["gadget0", "gadget1"], ["gadget2", "gadget3"]]
+    for directive in merged:
+        assert light_shows.directive_steps(directive) <= light_shows.max_steps(len(directive["targetGadgets"]))
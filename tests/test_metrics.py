@@ -0,0 +1,76 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import json
+import threading
+
+from util import metrics
+
+THREADS = 8
+PER_THREAD = 2000
+
+
+def run_threads(target):
+    threads = [threading.Thread(target=target) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_histogram_percentiles():
+    histogram = metrics.Histogram()
+    for microseconds in range(1, 1001):
+        histogram.record(microseconds)
+    assert histogram.count == 1000
+    assert histogram.max == 1000
+    assert abs(histogram.percentile(0.50) - 500) <= 500 / 16.0
+    assert histogram.percentile(1.0) == 1000
+
+
+def test_emf_lines():
+    histogram = metrics.Histogram()
+    histogram.record(120)
+    lines = metrics.emf_lines(({"invocation": histogram}, {"input_handler_event.stale": 3}))
+    document = json.loads(lines[0])
+    assert document["invocation.count"] == 1
+    assert document["input_handler_event.stale"] == 3
+    assert document["_aws"]["CloudWatchMetrics"][0]["Namespace"] == metrics.NAMESPACE
+
+
+def test_no_metrics_lost_to_concurrent_flushes(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.take()
+    taken = []
+    done = threading.Event()
+
+    def requests():
+        for _ in range(PER_THREAD):
+            metrics.record("stage", 0.0001)
+            metrics.count("counter")
+
+    def flushes():
+        while not done.is_set():
+            taken.append(metrics.take())
+            metrics.emf_lines(taken[-1])
+
+    flusher = threading.Thread(target=flushes)
+    flusher.start()
+    run_threads(requests)
+    done.set()
+    flusher.join()
+    taken.append(metrics.take())
+
+    assert sum(histograms["stage"].count for histograms, _ in taken if "stage" in histograms) == THREADS * PER_THREAD
+    assert sum(counters.get("counter", 0) for _, counters in taken) == THREADS * PER_THREAD
+
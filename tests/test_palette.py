@@ -0,0 +1,62 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import pytest
+
+from util import animations, palette, settings
+Colors = animations.Colors
+
+
+def test_lookup_by_name():
+    record = settings.PALETTE.lookup("red")
+    assert record.name == "red"
+    assert record.hex == Colors.red.value
+    assert record.rgb == (255, 0, 0)
+    assert record.breath is Colors.light_red
+
+
+def test_lookup_of_an_unknown_color():
+    assert settings.PALETTE.lookup("purple") is None
+    assert settings.PALETTE.lookup(None, settings.PALETTE.off) is settings.PALETTE.off
+    assert "purple" not in settings.PALETTE and "blue" in settings.PALETTE
+
+
+def test_colors_are_offered_in_order():
+    assert settings.PALETTE.names == ("blue", "green", "red")
+    assert settings.COLORS_ALLOWED == ["blue", "green", "red"]
+
+
+def test_synonyms_and_custom_colors():
+    custom = palette.Palette([
+        ("red", Colors.red, Colors.light_red, ("Crimson", "scarlet")),
+        ("teal", "008080", "004040", ()),
+    ])
+    assert custom.lookup("crimson") is custom.lookup("red")
+    assert custom.lookup("scarlet").name == "red"
+    teal = custom.lookup("teal")
+    assert teal.color == palette.CustomColor("teal", "008080")
+    assert teal.rgb == (0, 128, 128)
+    assert teal.idle_animation == (animations.breathe_animation, 30, palette.CustomColor("teal_breath", "004040"), 450)
+
+
+def test_a_name_for_two_colors():
+    with pytest.raises(ValueError):
+        palette.Palette([
+            ("red", Colors.red, Colors.light_red, ("warm",)),
+            ("yellow", Colors.yellow, Colors.yellow, ("warm",)),
+        ])
+
+
+def test_palette_is_read_only():
+    with pytest.raises(TypeError):
+        settings.PALETTE.index["purple"] = settings.PALETTE.off
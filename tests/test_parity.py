@@ -0,0 +1,119 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import json
+import random
+
+import pytest
+
+import envelopes
+
+import color_changer
+from util import fast_path, session_codec, stale_events
+
+# the skill as the SDK alone answers it, without the fast path and the early rejection of stale events
+sdk_handler = color_changer.sb.lambda_handler()
+
+
+def replayed_events(sessions=10):
+    rng = random.Random(2018)
+    for _ in range(sessions):
+        for kind, event, _ in envelopes.replay(color_changer.handler, envelopes.button_session(rng)):
+            yield kind, event
+
+
+def sdk_response(event):
+    return json.dumps(sdk_handler(json.loads(json.dumps(event)), None))
+
+
+def test_fast_path_parity():
+    checked = 0
+    for _, event in replayed_events():
+        response = fast_path.respond(event)
+        if response is not None:
+            assert json.dumps(response) == sdk_response(event)
+            checked += 1
+    assert checked > 0
+
+
+@pytest.mark.parametrize("variant", ["plain", "legacy", "unregistered", "no prefix"])
+def test_fast_path_parity_of_edge_cases(variant):
+    event = next(event for kind, event in replayed_events(1) if kind == "button_down_event")
+    event = json.loads(json.dumps(event))
+    attributes = session_codec.codec.decode(dict(event["session"]["attributes"]))
+    if variant == "plain":
+        event["session"]["attributes"] = attributes
+    elif variant == "legacy":
+        attributes["device_ids"] = [None] + attributes.pop("gadget_ids")
+        event["session"]["attributes"] = attributes
+    else:
+        event["request"]["events"][0]["inputEvents"][0]["gadgetId"] = (
+            "amzn1.ask.gadget.unknown" if variant == "unregistered" else "G1")
+    assert json.dumps(fast_path.respond(event)) == sdk_response(event)
+
+
+@pytest.mark.parametrize("gadget_ids", [5, [["not", "an", "id"]]])
+def test_malformed_attributes_get_the_skill_error_response(gadget_ids):
+    event = next(event for kind, event in replayed_events(1) if kind == "button_down_event")
+    event = json.loads(json.dumps(event))
+    attributes = session_codec.codec.decode(dict(event["session"]["attributes"]))
+    attributes["gadget_ids"] = gadget_ids
+    event["session"]["attributes"] = attributes
+    # not a duplicate of the event the session was replayed with
+    event["request"]["requestId"] = envelopes.new_request_id()
+    with pytest.raises(Exception):
+        fast_path.respond(json.loads(json.dumps(event)))
+    assert color_changer.handler(json.loads(json.dumps(event)), None) == json.loads(sdk_response(event))
+
+
+def test_undecodable_attributes_get_the_skill_error_response():
+    event = next(event for kind, event in replayed_events(1) if kind == "button_down_event")
+    event = json.loads(json.dumps(event))
+    # a state the compact codec has no index for
+    event["session"]["attributes"]["s"] = 99
+    event["request"]["requestId"] = envelopes.new_request_id()
+    with pytest.raises(Exception):
+        stale_events.classify(json.loads(json.dumps(event)))
+    response = color_changer.handler(json.loads(json.dumps(event)), None)
+    assert "Sorry, there was some problem" in response["response"]["outputSpeech"]["ssml"]
+
+
+def test_stale_event_parity():
+    checked = 0
+    for kind, event in replayed_events():
+        if kind == "stale_event":
+            assert json.dumps(stale_events.reject(event)) == sdk_response(event)
+            checked += 1
+    assert checked > 0
+
+
+def test_duplicate_events_get_the_first_response_again():
+    rng = random.Random(2018)
+    checked = 0
+    for _ in range(2):
+        for _, event, response in envelopes.replay(color_changer.handler, envelopes.button_session(rng)):
+            if event["request"]["type"] == "GameEngine.InputHandlerEvent" and response["response"]:
+                # not an empty response that would roll the session back to before the first delivery
+                assert color_changer.handler(json.loads(json.dumps(event)), None) == response
+                checked += 1
+    assert checked > 0
+
+
+def test_button_press_speech_is_cached_by_shipped_locale():
+    fast_path.button_pressed_output_speech.cache_clear()
+    event = next(event for kind, event in replayed_events(1) if kind == "button_down_event")
+    for number in range(50):
+        event = json.loads(json.dumps(event))
+        event["request"]["locale"] = "x{0}-ZZ".format(number)
+        assert json.dumps(fast_path.respond(event)) == sdk_response(event)
+    assert fast_path.button_pressed_output_speech.cache_info().currsize == 1
@@ -0,0 +1,76 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import threading
+import time
+
+from util import persistence
+
+
+class Envelope(object):
+    """ the parts of a request envelope the adapter reads """
+
+    def __init__(self, user_id):
+        self.context = self
+        self.system = self
+        self.user = self
+        self.user_id = user_id
+
+
+class SlowBackend(object):
+    def __init__(self):
+        self.stored = {}
+        self.batches = []
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+    def get(self, key):
+        return self.stored.get(key)
+
+    def write(self, batch):
+        self.concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        time.sleep(0.05)
+        self.batches.append(dict(batch))
+        self.stored.update(batch)
+        self.concurrent -= 1
+
+
+def test_flushes_write_one_batch_at_a_time_in_order():
+    backend = SlowBackend()
+    # the writer thread waits long enough to leave the flushes to the test
+    adapter = persistence.CachedPersistenceAdapter(backend, flush_delay=60)
+    adapter.save_attributes(Envelope("user"), {"user_color": "red"})
+    first = threading.Thread(target=adapter.flush)
+    first.start()
+    time.sleep(0.01)
+    # saved while the first batch is being written, and flushed at exit
+    adapter.save_attributes(Envelope("user"), {"user_color": "blue"})
+    adapter.flush()
+    first.join()
+
+    assert backend.max_concurrent == 1
+    assert [batch["user"]["user_color"] for batch in backend.batches] == ["red", "blue"]
+    assert adapter.writing == {}
+
+
+def test_attributes_being_written_are_read_back():
+    backend = SlowBackend()
+    adapter = persistence.CachedPersistenceAdapter(backend, cache_size=0, flush_delay=60)
+    adapter.save_attributes(Envelope("user"), {"user_color": "red"})
+    flushing = threading.Thread(target=adapter.flush)
+    flushing.start()
+    time.sleep(0.01)
+    assert adapter.get_attributes(Envelope("user")) == {"user_color": "red"}
+    flushing.join()
+    assert backend.stored == {"user": {"user_color": "red"}}
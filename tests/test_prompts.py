@@ -0,0 +1,29 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+from util import prompts
+
+
+def test_unknown_locales_use_the_default_catalog():
+    default = prompts.catalog(prompts.DEFAULT_LOCALE)
+    for locale in ("de-DE", "xx-YY", "../en-US", "", None):
+        assert prompts.locale_of(locale) == prompts.DEFAULT_LOCALE
+        assert prompts.catalog(locale) is default
+
+
+def test_catalogs_are_kept_by_shipped_locale_only():
+    for number in range(100):
+        prompts.catalog("x{0}-ZZ".format(number % 10) + str(number))
+    prompts.catalog("en-GB")
+    assert set(prompts._catalogs) <= prompts.shipped_locales()
+    assert prompts.catalog("en-GB") is not prompts.catalog(prompts.DEFAULT_LOCALE)
@@ -0,0 +1,67 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import random
+
+import pytest
+
+import envelopes
+
+import color_changer
+from util import persistence, prompts, session_codec, settings
+
+
+@pytest.fixture
+def remembered_buttons(monkeypatch):
+    """ a returning user, whose buttons persistence remembers but not a color """
+    rng = random.Random(2018)
+    gadget_ids = [envelopes.gadget_id(rng) for _ in range(settings.BUTTON_COUNT)]
+    monkeypatch.setattr(persistence, "remembered", lambda handler_input: {"gadget_ids": gadget_ids})
+    return gadget_ids
+
+
+def send(request, session_attributes=None, new=False):
+    response = color_changer.handler(envelopes.envelope(request, session_attributes, new=new), None)
+    return response, session_codec.codec.decode(dict(response["sessionAttributes"]))
+
+
+def speech(response):
+    return response["response"]["outputSpeech"]["ssml"]
+
+
+def test_resume_session_skips_roll_call(remembered_buttons):
+    launch_id = envelopes.new_request_id()
+    response, attributes = send(envelopes.launch_request(launch_id), new=True)
+
+    assert attributes["state"] == settings.SKILL_STATES["PLAY_MODE"]
+    assert attributes["is_roll_call_complete"] is True
+    assert attributes["gadget_ids"] == remembered_buttons
+    assert "user_color" not in attributes
+    assert response["response"]["shouldEndSession"] is False
+
+
+def test_play_timeout_before_a_color_is_picked(remembered_buttons):
+    launch_id = envelopes.new_request_id()
+    response, attributes = send(envelopes.launch_request(launch_id), new=True)
+
+    timeout = envelopes.input_handler_event_request(envelopes.new_request_id(), launch_id, [("timeout", [])])
+    response, attributes = send(timeout, response["sessionAttributes"])
+
+    assert attributes["state"] == settings.SKILL_STATES["EXIT_MODE"]
+    assert attributes["expecting_end_skill_confirmation"] is True
+    assert speech(response) == "<speak>" + " ".join(prompts.catalog("en-US")["PLAY_TIMEOUT"].render()) + "</speak>"
+    # the buttons fade out from black, as no color was picked
+    idle = response["response"]["directives"][0]
+    assert idle["targetGadgets"] == remembered_buttons
+    assert all(step["color"] == "000000"
+               for step in idle["parameters"]["animations"][0]["sequence"])
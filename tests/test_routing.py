@@ -0,0 +1,74 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import pytest
+
+import envelopes
+import routing as routing_benchmark
+
+import color_changer
+from util import routing, settings
+
+REQUESTS = {
+    "LaunchRequest": envelopes.launch_request("r1"),
+    "InputHandlerEvent": envelopes.input_handler_event_request(
+        "r2", "r1", [("button_down_event", [envelopes.input_event("gadget-1")])]),
+    "AMAZON.HelpIntent": envelopes.intent_request("r3", "AMAZON.HelpIntent"),
+    "AMAZON.StopIntent": envelopes.intent_request("r4", "AMAZON.StopIntent"),
+    "AMAZON.CancelIntent": envelopes.intent_request("r5", "AMAZON.CancelIntent"),
+    "AMAZON.YesIntent": envelopes.intent_request("r6", "AMAZON.YesIntent"),
+    "AMAZON.NoIntent": envelopes.intent_request("r7", "AMAZON.NoIntent"),
+    "colorIntent": envelopes.color_intent_request("r8", "red"),
+    "SessionEndedRequest": envelopes.session_ended_request("r9"),
+}
+
+
+def unwrapped(handle_func):
+    while hasattr(handle_func, "__wrapped__"):
+        handle_func = handle_func.__wrapped__
+    return handle_func
+
+
+@pytest.mark.parametrize("state", list(settings.SKILL_STATES.values()) + ["_UNKNOWN_MODE"])
+@pytest.mark.parametrize("name", sorted(REQUESTS))
+def test_routing_table_matches_the_predicate_chain(name, state):
+    handler_input = envelopes.handler_input(envelopes.envelope(REQUESTS[name], {"state": state}))
+    expected = routing_benchmark.resolve_with_chain(handler_input)
+    assert unwrapped(color_changer.routes.resolve(handler_input)) is unwrapped(expected)
+
+
+def test_routes_by_state():
+    table = routing.RoutingTable(["", "_PLAY_MODE"])
+
+    @table.route("LaunchRequest")
+    def anywhere(handler_input):
+        pass
+
+    @table.route("LaunchRequest", state="_PLAY_MODE")
+    def playing(handler_input):
+        pass
+
+    @table.fallback
+    def fallback(handler_input):
+        pass
+
+    def resolve(request, state):
+        return table.resolve(envelopes.handler_input(envelopes.envelope(request, {"state": state})))
+
+    assert resolve(REQUESTS["LaunchRequest"], "") is anywhere
+    assert resolve(REQUESTS["LaunchRequest"], "_PLAY_MODE") is playing
+    assert resolve(REQUESTS["LaunchRequest"], "_UNKNOWN_MODE") is anywhere
+    assert resolve(REQUESTS["AMAZON.HelpIntent"], "") is fallback
+
+    with pytest.raises(ValueError):
+        table.route("LaunchRequest")(anywhere)
@@ -0,0 +1,77 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import random
+
+import pytest
+
+import envelopes
+
+import color_changer
+from util import session_codec, settings
+
+ATTRIBUTES = {
+    "state": settings.SKILL_STATES["PLAY_MODE"],
+    "user_color": "red",
+    "is_roll_call_complete": True,
+    "expecting_skill_confirmation": False,
+    "current_input_handler_id": "amzn1.echo-api.request.1234",
+    "gadget_ids": ["amzn1.ask.gadget.ABCD", "G2"],
+    "button_count": 2,
+    "lights": {"buttonDown": {"*": "0badf00d"}},
+    "press_interval": 850,
+    "something_else": [1, "two"],
+}
+
+
+def test_compact_round_trip():
+    codec = session_codec.CompactSessionCodec()
+    encoded = codec.encode(ATTRIBUTES)
+    assert encoded[session_codec.VERSION_KEY] == codec.version
+    assert encoded["x"] == {"something_else": [1, "two"]}
+    assert codec.decode(encoded) == ATTRIBUTES
+
+
+def test_compact_is_smaller():
+    codec = session_codec.CompactSessionCodec()
+    assert session_codec.encoded_size(codec.encode(ATTRIBUTES)) < session_codec.encoded_size(ATTRIBUTES)
+
+
+@pytest.mark.parametrize("attributes", [
+    {},
+    {"state": "", "expecting_end_skill_confirmation": True},
+    # values the codec has no compact form for are carried over as they are
+    {"state": "_UNKNOWN_MODE", "user_color": "purple", "button_count": "2", "is_roll_call_complete": "yes"},
+])
+def test_compact_round_trip_of_unusual_attributes(attributes):
+    codec = session_codec.CompactSessionCodec()
+    assert codec.decode(codec.encode(attributes)) == attributes
+
+
+def test_compact_decodes_plain_attributes():
+    # sessions started before the codec was switched on
+    assert session_codec.CompactSessionCodec().decode(dict(ATTRIBUTES)) == ATTRIBUTES
+
+
+def test_json_codec_sends_attributes_as_they_are():
+    codec = session_codec.JsonSessionCodec()
+    assert codec.encode(ATTRIBUTES) is ATTRIBUTES
+    assert codec.decode(ATTRIBUTES) is ATTRIBUTES
+
+
+def test_round_trip_of_replayed_sessions():
+    codec = session_codec.CompactSessionCodec()
+    for seed in range(5):
+        for _, _, response in envelopes.replay(color_changer.handler, envelopes.button_session(random.Random(seed))):
+            attributes = codec.decode(dict(response["sessionAttributes"]))
+            assert codec.decode(codec.encode(attributes)) == attributes
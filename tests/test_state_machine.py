@@ -0,0 +1,106 @@
+"""
+    Copyright 2018 Amazon.com, Inc. and its affiliates. All Rights Reserved.
+    Licensed under the Amazon Software License (the "License").
+    You may not use this file except in compliance with the License.
+    A copy of the License is located at
+
+      http://aws.amazon.com/asl/
+
+    or in the "license" file accompanying this file. This file is distributed
+    on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+    or implied. See the License for the specific language governing
+    permissions and limitations under the License.
+"""
+import threading
+
+import pytest
+
+import color_changer
+from util import state_machine
+ANY = state_machine.ANY
+
+STATES = ["", "_PLAY_MODE"]
+EVENTS = ["yes", "timeout"]
+
+
+class FakeAttributesManager(object):
+    def __init__(self, session_attributes):
+        self.session_attributes = session_attributes
+
+
+class FakeHandlerInput(object):
+    def __init__(self, **session_attributes):
+        self.attributes_manager = FakeAttributesManager(session_attributes)
+
+
+def handler(name):
+    def handle(handler_input):
+        return name
+    handle.__name__ = name
+    return handle
+
+
+def test_most_specific_transition_wins():
+    default, play, play_confirming = handler("default"), handler("play"), handler("play_confirming")
+    machine = state_machine.StateMachine(STATES, EVENTS, [
+        ("yes", ANY, ANY, default),
+        ("yes", "_PLAY_MODE", ANY, play),
+        ("yes", "_PLAY_MODE", True, play_confirming),
+        ("timeout", ANY, ANY, state_machine.IGNORE),
+    ])
+    assert machine.table[("yes", "", False)] is default
+    assert machine.table[("yes", "_PLAY_MODE", False)] is play
+    assert machine.table[("yes", "_PLAY_MODE", True)] is play_confirming
+
+    assert machine.dispatch(FakeHandlerInput(state="_PLAY_MODE"), "yes") == (True, "play")
+    assert machine.dispatch(FakeHandlerInput(state="_PLAY_MODE", expecting_end_skill_confirmation=True),
+                            "yes") == (True, "play_confirming")
+    # states the machine doesn't know fall back to the transitions for ANY state
+    assert machine.dispatch(FakeHandlerInput(state="_OTHER"), "yes") == (True, "default")
+    assert machine.dispatch(FakeHandlerInput(state=""), "timeout") == (False, None)
+    assert sorted((row["handler"], row["count"]) for row in machine.report()) == [
+        ("default", 1), ("play", 1), ("play_confirming", 1)]
+
+
+@pytest.mark.parametrize("transitions", [
+    # unknown event
+    [("no", ANY, ANY, handler("a")), ("yes", ANY, ANY, handler("a")), ("timeout", ANY, ANY, handler("a"))],
+    # unknown state
+    [("yes", "_EXIT_MODE", ANY, handler("a")), ("yes", ANY, ANY, handler("a")), ("timeout", ANY, ANY, handler("a"))],
+    # handler not callable
+    [("yes", ANY, ANY, "a"), ("timeout", ANY, ANY, handler("a"))],
+    # duplicate
+    [("yes", ANY, ANY, handler("a")), ("yes", ANY, ANY, handler("b")), ("timeout", ANY, ANY, handler("a"))],
+    # gap: no timeout in roll call mode
+    [("yes", ANY, ANY, handler("a")), ("timeout", "_PLAY_MODE", ANY, handler("a"))],
+    # ambiguous: as specific as each other, with different handlers
+    [("yes", "", ANY, handler("a")), ("yes", ANY, False, handler("b")), ("yes", ANY, ANY, handler("c")),
+     ("timeout", ANY, ANY, handler("a"))],
+])
+def test_invalid_tables_do_not_compile(transitions):
+    with pytest.raises(ValueError):
+        state_machine.StateMachine(STATES, EVENTS, transitions)
+
+
+def test_skill_table_covers_every_case():
+    machine = color_changer.transitions
+    for event in machine.events:
+        for state in machine.states:
+            for confirming in (False, True):
+                assert (event, state, confirming) in machine.table
+
+
+def test_transition_timings_from_several_threads():
+    # the HTTP server dispatches requests on a thread per connection
+    machine = state_machine.StateMachine([""], ["yes"], [("yes", ANY, ANY, handler("yes"))])
+
+    def requests():
+        for _ in range(2000):
+            machine.dispatch(FakeHandlerInput(state=""), "yes")
+
+    threads = [threading.Thread(target=requests) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [row["count"] for row in machine.report()] == [8 * 2000]